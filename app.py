@@ -1,16 +1,45 @@
-from flask import Flask, render_template, Response, jsonify, request, redirect, url_for, session
+from flask import Flask, render_template, Response, jsonify, request, redirect, url_for, session, stream_with_context, g, send_from_directory
+from flask_socketio import SocketIO, join_room, leave_room, emit
 import requests as pyrequests
 import os
 from datetime import datetime, timezone, timedelta
 from bson import ObjectId
-from pymongo import MongoClient, ASCENDING, DESCENDING
+from pymongo import MongoClient, ASCENDING, DESCENDING, ReturnDocument, UpdateOne, InsertOne, monitoring
+from pymongo.errors import BulkWriteError, ConnectionFailure, DuplicateKeyError, OperationFailure, PyMongoError
 from dotenv import load_dotenv
 import csv
-from io import StringIO
+import codecs
 from werkzeug.utils import secure_filename  # ok disisakan walau tak dipakai
+from werkzeug.security import safe_join
 from collections import defaultdict
 import re
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+import threading
+import time
+import json
+import hashlib
+import hmac
+import unicodedata
+import bisect
+import itertools
+import heapq
+import mmap
+import atexit
+import base64
+import gzip
+from collections import deque, OrderedDict
+from contextlib import contextmanager
+
+try:  # opsional: kompresi br kalau paket brotli terpasang, selain itu gzip saja
+    import brotli
+except ImportError:
+    brotli = None
+try:  # opsional: tag audio selain ID3 (m4a/flac/ogg); tanpa ini pakai pembaca ID3 minimal
+    import mutagen
+except ImportError:
+    mutagen = None
 
 # ====== Load .env ======
 load_dotenv()
@@ -19,11 +48,254 @@ load_dotenv()
 app = Flask(__name__)
 app.secret_key = os.getenv("FLASK_SECRET_KEY", "dev-secret-change-me")
 
+# ====== Socket.IO (push realtime; endpoint polling tetap ada sebagai cadangan) ======
+# threading untuk dev server biasa; server produksi bisa pakai eventlet
+SOCKETIO_ASYNC_MODE = os.getenv("SOCKETIO_ASYNC_MODE", "threading")
+SOCKETIO_CORS = os.getenv("SOCKETIO_CORS_ORIGINS", "")  # kosong = hanya origin sendiri
+# Lebih dari satu worker: emit dari satu proses hanya sampai ke client proses itu,
+# kecuali semua worker berbagi message queue (mis. redis://localhost:6379/0, butuh paket redis).
+SOCKETIO_MESSAGE_QUEUE = os.getenv("SOCKETIO_MESSAGE_QUEUE", "") or None
+socketio = SocketIO(
+    app,
+    async_mode=SOCKETIO_ASYNC_MODE,
+    message_queue=SOCKETIO_MESSAGE_QUEUE,
+    cors_allowed_origins=([o.strip() for o in SOCKETIO_CORS.split(",") if o.strip()] or None)
+                         if SOCKETIO_CORS != "*" else "*",
+)
+
+# Klien browser: 4.x = protokol Socket.IO v5 (Flask-SocketIO 5.x). Kalau static/js/socket.io.min.js
+# ada (`flask --app app vendor-socketio`), template memakainya; kalau belum, CDN dengan hash SRI.
+SOCKETIO_CLIENT_VERSION = "4.7.5"
+SOCKETIO_CLIENT_SRI = os.getenv("SOCKETIO_CLIENT_SRI",
+                                "sha384-2huaZvOR9iDzHqslqwpR87isEmrfxqyWOF7hr7BY6KG0+hVKLoEXMPUJw3ynWuhO")
+SOCKETIO_CLIENT_FILE = "js/socket.io.min.js"
+SOCKETIO_CLIENT_CDN = f"https://cdn.socket.io/{SOCKETIO_CLIENT_VERSION}/socket.io.min.js"
+
+@app.context_processor
+def _socketio_client():
+    if os.path.exists(os.path.join(app.static_folder, SOCKETIO_CLIENT_FILE)):
+        src = url_for("static", filename=SOCKETIO_CLIENT_FILE)
+    else:
+        src = SOCKETIO_CLIENT_CDN
+    return {"socketio_client": {"src": src, "integrity": SOCKETIO_CLIENT_SRI}}
+
+@app.cli.command("vendor-socketio")
+def vendor_socketio_command():
+    """Unduh klien Socket.IO (versi terkunci) ke static/js, hanya kalau hash SRI-nya cocok."""
+    r = pyrequests.get(SOCKETIO_CLIENT_CDN, timeout=30)
+    r.raise_for_status()
+    algo, want = SOCKETIO_CLIENT_SRI.split("-", 1)
+    got = base64.b64encode(hashlib.new(algo, r.content).digest()).decode("ascii")
+    if got != want:
+        raise SystemExit(f"Hash klien Socket.IO tidak cocok ({algo}-{got}); file tidak ditulis.")
+    path = os.path.join(app.static_folder, SOCKETIO_CLIENT_FILE)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(r.content)
+    print(f"Klien Socket.IO {SOCKETIO_CLIENT_VERSION} disimpan di {path}.")
+
+CHAT_RING_SIZE = int(os.getenv("CHAT_RING_SIZE", "200"))  # pesan awal untuk event chat:init
+SCHEDULE_PUSH_S = float(os.getenv("SCHEDULE_PUSH_SECONDS", "30"))
+SCHEDULE_INDEX_REFRESH_S = float(os.getenv("SCHEDULE_INDEX_REFRESH_SECONDS", "300"))  # reload penuh (multi-worker)
+NEW_COUNT_RECONCILE_S = float(os.getenv("NEW_COUNT_RECONCILE_SECONDS", "60"))
+
+# ====== Metrics (format teks Prometheus, GET /metrics) ======
+# Registry kecil buatan sendiri: tiap metric punya lock sendiri dan observe()
+# hanya dict lookup + bisect, jadi murah dipanggil di jalur panas.
+# /metrics hanya untuk admin yang login atau scraper dengan METRICS_TOKEN
+# (Authorization: Bearer <token> atau ?token=). METRICS_PUBLIC=1 membukanya untuk umum.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+METRICS_PUBLIC = os.getenv("METRICS_PUBLIC", "0") == "1"
+_DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _fmt_labels(names, values, extra: str = "") -> str:
+    parts = []
+    for n, v in zip(names, values):
+        v = str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{n}="{v}"')
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames=()):
+        self.name, self.help, self.labelnames = name, help_text, tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [(self.name + _fmt_labels(self.labelnames, k), v) for k, v in items]
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames=(), buckets=_DEFAULT_BUCKETS):
+        self.name, self.help, self.labelnames = name, help_text, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [counts per bucket (+Inf terakhir), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                s = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            s[0][i] += 1
+            s[1] += value
+
+    def samples(self):
+        with self._lock:
+            items = [(k, list(c), total) for k, (c, total) in self._series.items()]
+        out = []
+        for labels, counts, total in items:
+            acc = 0
+            for le, c in zip(self.buckets + (float("inf"),), counts):
+                acc += c
+                le_s = "+Inf" if le == float("inf") else repr(le)
+                out.append((self.name + "_bucket" + _fmt_labels(self.labelnames, labels, f'le="{le_s}"'), acc))
+            out.append((self.name + "_sum" + _fmt_labels(self.labelnames, labels), total))
+            out.append((self.name + "_count" + _fmt_labels(self.labelnames, labels), acc))
+        return out
+
+class GaugeFn:
+    """Gauge yang nilainya dibaca saat scrape (tanpa biaya di jalur panas)."""
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, fn):
+        self.name, self.help, self.fn = name, help_text, fn
+
+    def samples(self):
+        try:
+            return [(self.name, float(self.fn()))]
+        except Exception:
+            return []
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for m in self._metrics:
+            lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            for key, value in m.samples():
+                lines.append(f"{key} {value:.6g}" if isinstance(value, float) else f"{key} {value}")
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+HTTP_REQUESTS = metrics.register(Counter(
+    "haloradio_http_requests_total", "Jumlah request HTTP per endpoint, method dan status.",
+    ("endpoint", "method", "status")))
+HTTP_LATENCY = metrics.register(Histogram(
+    "haloradio_http_request_duration_seconds", "Waktu sampai respon siap (streaming: sampai header).",
+    ("endpoint", "method")))
+MONGO_LATENCY = metrics.register(Histogram(
+    "haloradio_mongo_command_duration_seconds", "Durasi command MongoDB (command monitoring).",
+    ("command",), buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)))
+MONGO_FAILURES = metrics.register(Counter(
+    "haloradio_mongo_command_failures_total", "Command MongoDB yang gagal.", ("command",)))
+UPSTREAM_LATENCY = metrics.register(Histogram(
+    "haloradio_upstream_request_duration_seconds", "Durasi request ke upstream HTTP.", ("upstream",)))
+UPSTREAM_ERRORS = metrics.register(Counter(
+    "haloradio_upstream_errors_total", "Error request ke upstream HTTP.", ("upstream", "kind")))
+STREAM_BYTES_IN = metrics.register(Counter(
+    "haloradio_stream_upstream_bytes_total", "Byte audio yang diterima relay dari Icecast."))
+STREAM_BYTES_OUT = metrics.register(Counter(
+    "haloradio_stream_sent_bytes_total", "Byte audio yang dikirim relay ke semua listener."))
+STREAM_ICY_TITLES = metrics.register(Counter(
+    "haloradio_stream_icy_title_changes_total", "Pergantian StreamTitle dari metadata ICY relay."))
+
+def _upstream_error_kind(e: Exception) -> str:
+    if isinstance(e, pyrequests.exceptions.Timeout):
+        return "timeout"
+    if isinstance(e, pyrequests.exceptions.HTTPError):
+        return "http"
+    if isinstance(e, pyrequests.exceptions.ConnectionError):
+        return "connect"
+    return "other"
+
+@contextmanager
+def upstream_timer(name: str):
+    """Ukur satu panggilan ke upstream (icecast / deezer / youtube); error dihitung lalu diteruskan."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        UPSTREAM_ERRORS.inc(name, _upstream_error_kind(e))
+        raise
+    finally:
+        UPSTREAM_LATENCY.observe(time.perf_counter() - t0, name)
+
+class _MongoCommandMetrics(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_LATENCY.observe(event.duration_micros / 1e6, event.command_name)
+
+    def failed(self, event):
+        MONGO_LATENCY.observe(event.duration_micros / 1e6, event.command_name)
+        MONGO_FAILURES.inc(event.command_name)
+
+@app.before_request
+def _metrics_start():
+    g._metrics_t0 = time.perf_counter()
+
+@app.after_request
+def _metrics_record(resp):
+    t0 = g.pop("_metrics_t0", None)
+    if t0 is not None:
+        endpoint = request.endpoint or "unmatched"
+        HTTP_LATENCY.observe(time.perf_counter() - t0, endpoint, request.method)
+        HTTP_REQUESTS.inc(endpoint, request.method, str(resp.status_code))
+    return resp
+
+@app.route("/metrics")
+def metrics_endpoint():
+    if not METRICS_PUBLIC and not is_admin():
+        auth = request.headers.get("Authorization", "")
+        token = auth[7:] if auth.startswith("Bearer ") else request.args.get("token", "")
+        if not METRICS_TOKEN or not hmac.compare_digest(token.encode("utf-8"), METRICS_TOKEN.encode("utf-8")):
+            return Response("unauthorized\n", status=401, mimetype="text/plain")
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4",
+                    headers={"Cache-Control": "no-store"})
+
 # ====== Konfigurasi Icecast / Mixxx ======
 ICECAST_HOST = os.getenv("ICECAST_HOST", "http://localhost:8000")
 MOUNT = os.getenv("ICECAST_MOUNT", "/stream")
 ICECAST_URL = f"{ICECAST_HOST}{MOUNT}"
 
+# ====== Konfigurasi Relay /stream ======
+# relay  : satu koneksi ke Icecast, dibagi ke semua listener (default)
+# direct : tiap listener buka koneksi sendiri ke Icecast (cara lama)
+STREAM_MODE = os.getenv("STREAM_MODE", "relay").strip().lower()
+STREAM_CHUNK_BYTES = int(os.getenv("STREAM_CHUNK_BYTES", "4096"))
+STREAM_BUFFER_BYTES = int(os.getenv("STREAM_BUFFER_BYTES", str(512 * 1024)))   # ring buffer bersama
+STREAM_BURST_BYTES = int(os.getenv("STREAM_BURST_BYTES", str(64 * 1024)))      # dikirim langsung saat connect
+STREAM_CONNECT_WAIT_S = float(os.getenv("STREAM_CONNECT_WAIT_SECONDS", "5"))
+STREAM_CLIENT_TIMEOUT_S = float(os.getenv("STREAM_CLIENT_TIMEOUT_SECONDS", "15"))
+STREAM_IDLE_S = float(os.getenv("STREAM_IDLE_SECONDS", "30"))  # upstream ditutup kalau sepi selama ini
+STREAM_ICY_METADATA = os.getenv("STREAM_ICY_METADATA", "1") == "1"  # minta judul in-band dari Icecast
+
+# ====== Konfigurasi cache /stats ======
+STATS_POLL_S = float(os.getenv("STATS_POLL_SECONDS", "5"))
+STATS_STALE_S = float(os.getenv("STATS_STALE_SECONDS", "30"))  # lewat dari ini tanpa data baru → dianggap offline
+STATS_POLL_ICY_S = float(os.getenv("STATS_POLL_ICY_SECONDS", "30"))  # judul sudah dari ICY → poll cuma untuk listener
+
 # ====== Konfigurasi Admin sederhana ======
 ADMIN_USER = os.getenv("ADMIN_USER", "adminsebayu")
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "admin123")  # ganti di .env
@@ -35,96 +307,141 @@ MONGODB_COLL = os.getenv("MONGODB_COLL", "song_requests")
 MONGODB_SCHEDULE_COLL = os.getenv("MONGODB_SCHEDULE_COLL", "schedules")
 MONGODB_CHAT_COLL = os.getenv("MONGODB_CHAT_COLL", "chat_messages")
 MONGODB_CHATRL_COLL = os.getenv("MONGODB_CHATRL_COLL", "chat_rate_limiter")
+MONGODB_CHAT_ARCHIVE_COLL = os.getenv("MONGODB_CHAT_ARCHIVE_COLL", "chat_archive")
 MONGODB_PLAYLIST_COLL = os.getenv("MONGODB_PLAYLIST_COLL", "playlist_admin")
 
-mongo_client = MongoClient(MONGODB_URI)
+MONGODB_META_COLL = os.getenv("MONGODB_META_COLL", "app_meta")
+MONGODB_LISTENER_COLL = os.getenv("MONGODB_LISTENER_COLL", "listener_stats")
+MONGODB_RELAY_COLL = os.getenv("MONGODB_RELAY_COLL", "stream_relays")
+
+# connect=False: tidak ada koneksi / thread monitor sampai query pertama, jadi
+# import app tetap instan (dan aman di-fork) walau Mongo lambat atau mati.
+# Timeout dibuat pendek supaya request yang butuh Mongo gagal cepat (503),
+# bukan menggantung 30 detik (default pymongo).
+mongo_client = MongoClient(
+    MONGODB_URI,
+    connect=False,
+    maxPoolSize=int(os.getenv("MONGODB_MAX_POOL_SIZE", "50")),
+    minPoolSize=int(os.getenv("MONGODB_MIN_POOL_SIZE", "0")),
+    serverSelectionTimeoutMS=int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "3000")),
+    connectTimeoutMS=int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", "3000")),
+    socketTimeoutMS=int(os.getenv("MONGODB_SOCKET_TIMEOUT_MS", "20000")),
+    waitQueueTimeoutMS=int(os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS", "2000")),
+    event_listeners=[_MongoCommandMetrics()],
+)
 db = mongo_client[MONGODB_DBNAME]
 
 col_requests   = db[MONGODB_COLL]
 col_schedules  = db[MONGODB_SCHEDULE_COLL]
 col_chat       = db[MONGODB_CHAT_COLL]
 col_chat_rl    = db[MONGODB_CHATRL_COLL]
+col_chat_arch  = db[MONGODB_CHAT_ARCHIVE_COLL]
 col_playlist   = db[MONGODB_PLAYLIST_COLL]
+col_meta       = db[MONGODB_META_COLL]
+col_listeners  = db[MONGODB_LISTENER_COLL]
+col_relays     = db[MONGODB_RELAY_COLL]
 
 # ====== Indexes ======
-col_requests.create_index([("created_at", DESCENDING)])
-col_requests.create_index([("status", ASCENDING), ("created_at", DESCENDING)])
-col_requests.create_index([("phone", ASCENDING)])  # opsional
+# Tidak lagi dibuat saat import: ensure_indexes() jalan sekali di background
+# (MONGODB_INDEX_BOOTSTRAP=background) atau manual lewat `flask --app app ensure-indexes`.
+# Penanda versi di col_meta membuat worker berikutnya langsung skip.
+# Naikkan INDEX_VERSION setiap kali daftar index di bawah berubah.
+INDEX_VERSION = 3
+MONGODB_INDEX_BOOTSTRAP = os.getenv("MONGODB_INDEX_BOOTSTRAP", "background").lower()  # background | off
 
-col_schedules.create_index([("start_time", ASCENDING)])
-col_schedules.create_index([("end_time", ASCENDING)])
+INDEX_CONFLICT_CODES = (85, 86)  # IndexOptionsConflict / IndexKeySpecsConflict: tidak sembuh dengan retry
 
-col_chat.create_index([("ts", DESCENDING)])
-col_chat.create_index([("ts", DESCENDING), ("name", ASCENDING)])
-col_chat_rl.create_index([("ip", ASCENDING), ("ts", DESCENDING)])
+def _ensure_ttl_index(col, keys: list, seconds: int):
+    """TTL index; kalau sudah ada dengan expireAfterSeconds lain, ubah di tempat lewat collMod."""
+    try:
+        col.create_index(keys, expireAfterSeconds=seconds)
+    except OperationFailure as e:
+        if e.code not in INDEX_CONFLICT_CODES:
+            raise
+        col.database.command("collMod", col.name,
+                             index={"keyPattern": dict(keys), "expireAfterSeconds": seconds})
 
 # Playlist: urutkan per-hari dengan kunci urutan kustom
-col_playlist.create_index([("day", ASCENDING), ("sort_key", ASCENDING), ("start_hhmm", ASCENDING)])
+def _ensure_playlist_indexes(col):
+    col.create_index([("day", ASCENDING), ("sort_key", ASCENDING), ("start_hhmm", ASCENDING)])
 
+def _create_indexes():
+    col_requests.create_index([("created_at", DESCENDING), ("_id", DESCENDING)])
+    col_requests.create_index([("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)])
+    col_requests.create_index([("updated_at", ASCENDING)])
+    col_requests.create_index([("phone", ASCENDING)])  # opsional
 
-YOUTUBE_UA = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                  "AppleWebKit/537.36 (KHTML, like Gecko) "
-                  "Chrome/124.0 Safari/537.36"
-}
+    col_schedules.create_index([("start_time", ASCENDING)])
+    col_schedules.create_index([("end_time", ASCENDING)])
 
-def _extract_first_video_id_from_html(html_text: str) -> str | None:
-    """
-    Coba 2 cara:
-    1) JSON initialData: "videoId":"XXXXXXXXXXX"
-    2) Fallback: watch?v=XXXXXXXXXXX
-    """
-    # 1) Cari pola videoId di blob JSON
-    m = re.findall(r'"videoId":"([a-zA-Z0-9_-]{11})"', html_text)
-    if m:
-        # Prefer non-shorts dulu kalau bisa, tapi umumnya sama ID-nya
-        return m[0]
+    col_chat.create_index([("ts", DESCENDING), ("_id", DESCENDING)])
+    col_chat.create_index([("ts", DESCENDING), ("name", ASCENDING)])
+    # TTL: counter rate-limit (dan sisa event format lama) hapus sendiri
+    _ensure_ttl_index(col_chat_rl, [("ts", ASCENDING)], 2 * RATE_WINDOW_S)
+    # Arsip chat: satu dokumen per pesan (_id sama dengan di col_chat), bucket = awal jam UTC
+    col_chat_arch.create_index([("expire_at", ASCENDING)], expireAfterSeconds=0)
+    col_chat_arch.create_index([("ts", DESCENDING), ("_id", DESCENDING)])
+    col_chat_arch.create_index([("bucket", ASCENDING)])
+    if "messages._id_1" in col_chat_arch.index_information():
+        col_chat_arch.drop_index("messages._id_1")  # format lama (satu dokumen per jam)
 
-    # 2) Fallback: watch?v=ID
-    m2 = re.findall(r'watch\?v=([a-zA-Z0-9_-]{11})', html_text)
-    if m2:
-        return m2[0]
+    _ensure_playlist_indexes(col_playlist)
 
-    return None
+    # Statistik pendengar: satu dokumen per (resolusi, awal bucket); unique juga
+    # dipakai untuk klaim sampel antar-worker. TTL per dokumen lewat expire_at.
+    col_listeners.create_index([("res", ASCENDING), ("t", ASCENDING)], unique=True)
+    col_listeners.create_index([("expire_at", ASCENDING)], expireAfterSeconds=0)
 
-@app.route("/api/tools/yt/find_first")
-def yt_find_first():
-    """
-    Param:
-      - q   : kata kunci pencarian (mis. 'Nothing To Do Bancali')
-      - url : (opsional) kalau user kirim link /results?search_query=...
-    Return: { ok:True, url:'https://www.youtube.com/watch?v=ID', id:'ID' }
-    """
-    q = (request.args.get("q") or "").strip()
-    url_in = (request.args.get("url") or "").strip()
+    # Presence relay per worker (jumlah listener /stats di mode relay)
+    col_relays.create_index([("expire_at", ASCENDING)], expireAfterSeconds=0)
 
-    if not q and url_in:
+def ensure_indexes(force: bool = False) -> bool:
+    """Buat index kalau penanda versi di DB lebih lama; True kalau index benar-benar dibuat."""
+    if not force:
+        marker = col_meta.find_one({"_id": "indexes"}) or {}
+        if marker.get("version", 0) >= INDEX_VERSION:
+            return False
+    _create_indexes()
+    col_meta.update_one(
+        {"_id": "indexes"},
+        {"$set": {"version": INDEX_VERSION, "updated_at": datetime.now(timezone.utc)}},
+        upsert=True,
+    )
+    return True
+
+def _index_bootstrap():
+    delay = 5.0
+    while True:
         try:
-            u = urllib.parse.urlparse(url_in)
-            if u.netloc.endswith("youtube.com") and u.path.startswith("/results"):
-                qs = urllib.parse.parse_qs(u.query or "")
-                qlist = qs.get("search_query", [])
-                if qlist:
-                    q = qlist[0]
-        except Exception:
-            pass
+            if ensure_indexes():
+                print(f"Index MongoDB dibuat (versi {INDEX_VERSION}).")
+            return
+        except OperationFailure as e:
+            if e.code in INDEX_CONFLICT_CODES:
+                # definisi index bentrok dengan yang ada di DB: perbaiki manual lalu
+                # jalankan `flask --app app ensure-indexes`; retry tidak akan menolong
+                print("Index bootstrap berhenti (index bentrok):", e)
+                return
+            print("Index bootstrap error (dicoba lagi):", e)
+        except PyMongoError as e:
+            print("Index bootstrap error (dicoba lagi):", e)
+        socketio.sleep(delay)
+        delay = min(delay * 2, 300.0)
 
-    if not q:
-        return jsonify({"ok": False, "error": "Butuh parameter q atau url results."}), 400
+@app.cli.command("ensure-indexes")
+def ensure_indexes_command():
+    """Buat/perbarui index MongoDB sekarang (abaikan penanda versi)."""
+    ensure_indexes(force=True)
+    print(f"Index MongoDB siap (versi {INDEX_VERSION}).")
+
+@app.errorhandler(ConnectionFailure)
+def _mongo_unavailable(e):
+    # Mongo mati/timeout: rute lain (radio, /stream, /stats) tetap jalan
+    print("MongoDB tidak tersedia:", e)
+    if request.path.startswith("/api/"):
+        return jsonify({"ok": False, "error": "Database sedang tidak tersedia. Coba lagi sebentar."}), 503
+    return "Database sedang tidak tersedia. Coba lagi sebentar.", 503
 
-    try:
-        yurl = "https://www.youtube.com/results?search_query=" + urllib.parse.quote(q)
-        resp = pyrequests.get(yurl, headers=YOUTUBE_UA, timeout=8)
-        resp.raise_for_status()
-        vid = _extract_first_video_id_from_html(resp.text)
-        if not vid:
-            return jsonify({"ok": False, "error": "Tidak ketemu video dari pencarian."}), 404
-        return jsonify({"ok": True, "id": vid, "url": f"https://www.youtube.com/watch?v={vid}"})
-    except pyrequests.exceptions.Timeout:
-        return jsonify({"ok": False, "error": "Timeout ke YouTube."}), 504
-    except Exception as e:
-        print("yt_find_first error:", e)
-        return jsonify({"ok": False, "error": "Gagal mengambil hasil YouTube."}), 502
 
 # ====== Util auth admin ======
 def is_admin():
@@ -156,9 +473,12 @@ def to_utc_iso(dt: datetime) -> str:
 # ====== Rate-limit & Moderasi Chat ======
 RATE_MAX_MSGS = int(os.getenv("CHAT_RATE_MAX_MSGS", "10"))
 RATE_WINDOW_S = int(os.getenv("CHAT_RATE_WINDOW_SECONDS", "60"))
+RATE_BACKEND = os.getenv("CHAT_RATE_BACKEND", "memory").strip().lower()  # memory | mongo
 BAD_WORDS = set(
     w.strip().lower() for w in os.getenv("CHAT_BAD_WORDS", "bodoh,kasar1,kasar2").split(",") if w.strip()
 )
+BAD_WORDS_FILE = os.getenv("CHAT_BAD_WORDS_FILE", "")  # opsional: satu kata per baris, '#' = komentar
+BAD_WORDS_RELOAD_S = float(os.getenv("CHAT_BAD_WORDS_RELOAD_SECONDS", "10"))
 
 def get_client_ip():
     fwd = request.headers.get("X-Forwarded-For")
@@ -166,18 +486,851 @@ def get_client_ip():
         return fwd.split(",")[0].strip()
     return request.remote_addr or "0.0.0.0"
 
-def check_rate_limit(ip: str, max_msgs: int = RATE_MAX_MSGS, per_seconds: int = RATE_WINDOW_S) -> bool:
-    now = datetime.now(timezone.utc)
-    window_start = now - timedelta(seconds=per_seconds)
-    count = col_chat_rl.count_documents({"ip": ip, "ts": {"$gte": window_start}})
-    return count < max_msgs
+class MemoryRateLimiter:
+    """
+    Sliding-window log per IP di memori proses: maks `max_msgs` dalam
+    `per_seconds` terakhir. Tiap IP paling banyak menyimpan `max_msgs`
+    timestamp, dan IP yang sudah diam lebih dari satu window dibuang berkala.
+    """
+
+    def __init__(self, max_msgs: int, per_seconds: int, sweep_every: float = 60.0):
+        self.max_msgs = max_msgs
+        self.per_seconds = per_seconds
+        self.sweep_every = sweep_every
+        self._hits = {}  # ip -> deque timestamp monotonic
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+    def allow(self, ip: str) -> bool:
+        """Cek + catat dalam satu langkah. False kalau sudah melewati batas."""
+        now = time.monotonic()
+        cutoff = now - self.per_seconds
+        with self._lock:
+            if now - self._last_sweep > self.sweep_every:
+                self._sweep(cutoff)
+                self._last_sweep = now
+            q = self._hits.get(ip)
+            if q is None:
+                q = self._hits[ip] = deque()
+            while q and q[0] <= cutoff:
+                q.popleft()
+            if len(q) >= self.max_msgs:
+                return False
+            q.append(now)
+            return True
+
+    def _sweep(self, cutoff: float):
+        idle = [ip for ip, q in self._hits.items() if not q or q[-1] <= cutoff]
+        for ip in idle:
+            del self._hits[ip]
+
+class MongoRateLimiter:
+    """
+    Untuk multi-worker: counter per (ip, window tetap) di Mongo. Satu
+    find_one_and_update upsert $inc per pesan = satu round trip dan atomik
+    antar-worker. Dokumen kedaluwarsa lewat TTL index di field `ts`.
+    """
+
+    def __init__(self, collection, max_msgs: int, per_seconds: int):
+        self.col = collection
+        self.max_msgs = max_msgs
+        self.per_seconds = per_seconds
+
+    def allow(self, ip: str) -> bool:
+        bucket = int(time.time() // self.per_seconds)
+        doc = self.col.find_one_and_update(
+            {"_id": f"{ip}|{bucket}"},
+            {"$inc": {"count": 1},
+             "$setOnInsert": {"ip": ip, "ts": datetime.fromtimestamp(bucket * self.per_seconds, timezone.utc)}},
+            upsert=True,
+            projection={"count": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        return doc["count"] <= self.max_msgs
+
+if RATE_BACKEND == "mongo":
+    rate_limiter = MongoRateLimiter(col_chat_rl, RATE_MAX_MSGS, RATE_WINDOW_S)
+else:
+    rate_limiter = MemoryRateLimiter(RATE_MAX_MSGS, RATE_WINDOW_S)
+
+# --- Normalisasi teks untuk moderasi (leet, diakritik, huruf berulang) ---
+_LEET_MAP = str.maketrans({
+    "4": "a", "@": "a", "3": "e", "1": "i", "!": "i", "|": "i",
+    "0": "o", "5": "s", "$": "s", "7": "t", "+": "t", "8": "b",
+})
+_MOD_SEPARATORS = re.compile(r"[._\-*'`~^]+")   # b.o.d.o.h → bodoh
+_MOD_REPEATS = re.compile(r"(.)\1+")            # bodooooh → bodoh
+_MOD_SPACES = re.compile(r"\s+")
+
+def normalize_for_moderation(text: str) -> str:
+    t = unicodedata.normalize("NFKD", text or "")
+    t = "".join(ch for ch in t if not unicodedata.combining(ch)).casefold()
+    t = t.translate(_LEET_MAP)
+    t = _MOD_SEPARATORS.sub("", t)
+    t = _MOD_REPEATS.sub(r"\1", t)
+    return _MOD_SPACES.sub(" ", t).strip()
+
+class AhoCorasick:
+    """Automaton multi-pattern: satu kali jalan per teks, berapapun jumlah kata."""
+
+    def __init__(self, patterns: dict):
+        # patterns: {bentuk_normal: kata_asli}
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        for norm, orig in patterns.items():
+            node = 0
+            for ch in norm:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                node = nxt
+            self._out[node] = self._out[node] + (orig,)
+
+        # BFS: fail link + gabung output dari fail link
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                cand = self._goto[f].get(ch, 0)
+                self._fail[nxt] = cand if cand != nxt else 0
+                if self._out[self._fail[nxt]]:
+                    self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def search(self, text: str) -> list:
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        found = {}
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                for w in out[node]:
+                    found[w] = True
+        return list(found)
+
+class ModerationEngine:
+    """
+    Gabungan CHAT_BAD_WORDS + CHAT_BAD_WORDS_FILE yang di-compile jadi satu
+    automaton. File dicek ulang (mtime) paling sering tiap `reload_s` detik;
+    kalau berubah, automaton baru dibangun lalu ditukar sekaligus.
+    """
+
+    def __init__(self, words: set, path: str, reload_s: float):
+        self.words = set(words)
+        self.path = path
+        self.reload_s = reload_s
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._matcher = None
+        self.reload(force=True)
+
+    def _load_file_words(self) -> set:
+        out = set()
+        with open(self.path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                w = line.split("#", 1)[0].strip().lower()
+                if w:
+                    out.add(w)
+        return out
+
+    def reload(self, force: bool = False):
+        words = set(self.words)
+        mtime = None
+        if self.path:
+            try:
+                mtime = os.path.getmtime(self.path)
+                if not force and mtime == self._mtime:
+                    return
+                words |= self._load_file_words()
+            except OSError as e:
+                print("Bad words file error:", e)
+        patterns = {}
+        for w in words:
+            norm = normalize_for_moderation(w)
+            if norm:
+                patterns.setdefault(norm, w)
+        self._matcher = AhoCorasick(patterns) if patterns else None
+        self._mtime = mtime
 
-def add_rate_event(ip: str):
-    col_chat_rl.insert_one({"ip": ip, "ts": datetime.now(timezone.utc)})
+    def _maybe_reload(self):
+        if not self.path:
+            return
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_s:
+            return
+        with self._lock:
+            if now - self._checked_at < self.reload_s:
+                return
+            self._checked_at = now
+            self.reload()
+
+    def match(self, text: str) -> list:
+        """Daftar kata (bentuk asli di daftar) yang ketemu di teks."""
+        self._maybe_reload()
+        matcher = self._matcher
+        if matcher is None:
+            return []
+        return matcher.search(normalize_for_moderation(text))
+
+moderation = ModerationEngine(BAD_WORDS, BAD_WORDS_FILE, BAD_WORDS_RELOAD_S)
 
 def is_bad(text: str) -> bool:
-    t = (text or "").lower()
-    return any(w in t for w in BAD_WORDS) if BAD_WORDS else False
+    return bool(moderation.match(text))
+
+# ====== Stream Relay (satu koneksi upstream, banyak listener) ======
+class IcyDemuxer:
+    """
+    Pisahkan metadata ICY dari byte audio. Dengan header `Icy-MetaData: 1`,
+    Icecast menyisipkan blok setelah tiap `metaint` byte audio:
+    1 byte panjang (×16) lalu teks "StreamTitle='...';" berpadding NUL.
+    Audio dikembalikan sebagai memoryview potongan chunk asli (tanpa salin).
+    """
+
+    def __init__(self, metaint: int):
+        self.metaint = metaint
+        self._audio_left = metaint
+        self._meta_left = None  # None = berikutnya byte panjang
+        self._meta = bytearray()
+
+    def feed(self, chunk: bytes):
+        """Return (potongan audio, blok metadata lengkap)."""
+        mv = memoryview(chunk)
+        audio, metas = [], []
+        i, n = 0, len(mv)
+        while i < n:
+            if self._audio_left:
+                take = min(self._audio_left, n - i)
+                audio.append(mv[i:i + take])
+                i += take
+                self._audio_left -= take
+            elif self._meta_left is None:
+                self._meta_left = mv[i] * 16
+                i += 1
+                if not self._meta_left:  # blok kosong = judul tidak berubah
+                    self._meta_left = None
+                    self._audio_left = self.metaint
+            else:
+                take = min(self._meta_left, n - i)
+                self._meta += mv[i:i + take]
+                i += take
+                self._meta_left -= take
+                if not self._meta_left:
+                    metas.append(bytes(self._meta))
+                    self._meta.clear()
+                    self._meta_left = None
+                    self._audio_left = self.metaint
+        return audio, metas
+
+_RE_ICY_TITLE = re.compile(rb"StreamTitle='(.*?)';(?=Stream\w+=|$)", re.S)
+
+def parse_icy_title(meta: bytes):
+    m = _RE_ICY_TITLE.search(meta.rstrip(b"\x00"))
+    if not m:
+        return None
+    raw = m.group(1)
+    try:
+        return raw.decode("utf-8").strip()
+    except UnicodeDecodeError:
+        return raw.decode("latin-1").strip()
+
+class StreamRelay:
+    """
+    Satu thread pembaca menarik mount Icecast sekali, lalu menaruh chunk-nya
+    ke ring buffer bersama (dibatasi STREAM_BUFFER_BYTES). Tiap listener cuma
+    pegang posisi (seq) di buffer itu, jadi tidak ada antrean per-listener.
+    - Listener baru dapat burst dari ekor buffer (STREAM_BURST_BYTES).
+    - Listener lambat yang posisinya sudah tergusur dari buffer diputus.
+    - Upstream ditutup otomatis kalau tidak ada listener selama STREAM_IDLE_S.
+    """
+
+    def __init__(self, url: str, chunk_size: int, buffer_bytes: int, burst_bytes: int,
+                 client_timeout: float, idle_s: float, icy: bool = True):
+        self.url = url
+        self.icy = icy
+        self.chunk_size = chunk_size
+        self.buffer_bytes = buffer_bytes
+        self.burst_bytes = burst_bytes
+        self.client_timeout = client_timeout
+        self.idle_s = idle_s
+        self.content_type = "audio/mpeg"
+
+        self._cond = threading.Condition()
+        self._chunks = deque()      # isi: (seq, bytes), seq berurutan tanpa lubang
+        self._buffered = 0
+        self._next_seq = 0
+        self._thread = None
+        self._connected = threading.Event()
+        self._listeners = 0
+        self._idle_since = time.monotonic()
+        self._closing = False
+        self._title = None          # StreamTitle ICY terakhir; None = tidak ada metadata in-band
+        self._title_callbacks = []
+
+    @property
+    def listeners(self) -> int:
+        return self._listeners
+
+    @property
+    def closing(self) -> bool:
+        return self._closing
+
+    @property
+    def upstream_connected(self) -> bool:
+        return self._connected.is_set()
+
+    def drain(self, timeout: float) -> int:
+        """
+        Shutdown: tolak listener baru, akhiri stream listener yang ada (generator
+        selesai → respon ditutup rapi), tunggu maks `timeout` detik.
+        Return jumlah listener yang masih tersisa.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+            while self._listeners > 0:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                self._cond.wait(timeout=min(left, 0.5))
+            return self._listeners
+
+    def _should_stop(self) -> bool:
+        # dipanggil dengan _cond terkunci; listener yang baru mendaftar di subscribe() ikut dihitung
+        return self._listeners == 0 and (time.monotonic() - self._idle_since) > self.idle_s
+
+    def on_title(self, fn):
+        """fn(judul) dipanggil saat StreamTitle berubah; fn(None) saat metadata ICY berhenti."""
+        self._title_callbacks.append(fn)
+        return fn
+
+    def _set_title(self, title):
+        if title == self._title:
+            return
+        self._title = title
+        if title is not None:
+            STREAM_ICY_TITLES.inc()
+        for fn in self._title_callbacks:
+            try:
+                fn(title)
+            except Exception as e:
+                print("Stream title callback error:", e)
+
+    def _run(self):
+        try:
+            self._read_upstream()
+        finally:
+            with self._cond:
+                replaced = self._thread is not None and self._thread is not threading.current_thread()
+            if not replaced:  # pembaca baru sudah jalan: judulnya jangan ditimpa
+                self._set_title(None)
+
+    def _read_upstream(self):
+        backoff = 1.0
+        while True:
+            with self._cond:
+                if self._should_stop():
+                    self._stop_locked()
+                    return
+            try:
+                with upstream_timer("icecast_stream"):
+                    r = pyrequests.get(self.url, stream=True, timeout=10,
+                                       headers={"Icy-MetaData": "1"} if self.icy else None)
+                    if not r.ok:
+                        r.close()
+                    r.raise_for_status()
+                with r:
+                    self.content_type = r.headers.get("content-type", "audio/mpeg")
+                    try:
+                        metaint = int(r.headers.get("icy-metaint") or 0) if self.icy else 0
+                    except ValueError:
+                        metaint = 0
+                    demux = IcyDemuxer(metaint) if metaint > 0 else None
+                    self._connected.set()
+                    backoff = 1.0
+                    for chunk in r.iter_content(chunk_size=self.chunk_size):
+                        if not chunk:
+                            continue
+                        if demux is None:
+                            pieces = (chunk,)
+                        else:
+                            # listener hanya dapat audio bersih; judul diteruskan ke callback
+                            pieces, metas = demux.feed(chunk)
+                            for meta in metas:
+                                title = parse_icy_title(meta)
+                                if title is not None:
+                                    self._set_title(title)
+                        with self._cond:
+                            for piece in pieces:
+                                self._push(piece)
+                            if self._should_stop():
+                                self._stop_locked()
+                                return
+            except pyrequests.exceptions.RequestException as e:
+                print(f"Stream relay upstream error: {e}")
+            self._connected.clear()
+            self._set_title(None)
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    def _stop_locked(self):
+        # buang sisa buffer supaya listener berikutnya tidak dapat audio basi
+        self._connected.clear()
+        self._chunks.clear()
+        self._buffered = 0
+        self._thread = None
+
+    def _push(self, chunk):
+        # dipanggil dengan _cond terkunci; chunk bisa memoryview dari demuxer ICY
+        self._chunks.append((self._next_seq, chunk))
+        self._next_seq += 1
+        self._buffered += len(chunk)
+        STREAM_BYTES_IN.inc(amount=len(chunk))
+        while self._buffered > self.buffer_bytes and len(self._chunks) > 1:
+            _, old = self._chunks.popleft()
+            self._buffered -= len(old)
+        self._cond.notify_all()
+
+    def subscribe(self, wait_s: float):
+        """
+        Daftarkan satu listener lalu return generator byte audionya; None kalau
+        upstream tidak tersambung dalam `wait_s` detik. Pendaftaran dan cek idle
+        pembaca memakai lock yang sama, jadi listener tidak pernah menempel ke
+        pembaca yang sedang berhenti (kalau sudah berhenti, dinyalakan lagi).
+        """
+        with self._cond:
+            self._listeners += 1
+            if self._thread is None:
+                self._idle_since = time.monotonic()
+                self._thread = threading.Thread(target=self._run, name="stream-relay", daemon=True)
+                self._thread.start()
+        if not self._connected.wait(wait_s):
+            self._release()
+            return None
+        audio = self._stream()
+        next(audio)  # masuk ke try/finally sekarang: close() dari server pasti memanggil _release()
+        return audio
+
+    def _release(self):
+        with self._cond:
+            self._listeners -= 1
+            if self._listeners == 0:
+                self._idle_since = time.monotonic()
+                self._cond.notify_all()  # drain() menunggu ini
+
+    def _stream(self):
+        try:
+            with self._cond:
+                # burst-on-connect: mundur dari chunk terbaru sampai kuota burst habis
+                seq = self._next_seq
+                total = 0
+                for s, c in reversed(self._chunks):
+                    if total + len(c) > self.burst_bytes:
+                        break
+                    total += len(c)
+                    seq = s
+            yield b""  # hanya untuk next() di subscribe(), tidak dikirim ke client
+            while True:
+                with self._cond:
+                    while seq >= self._next_seq:
+                        if self._closing:
+                            return
+                        if not self._cond.wait(timeout=self.client_timeout):
+                            return  # upstream macet
+                    if self._closing:
+                        return
+                    oldest = self._chunks[0][0]
+                    if seq < oldest:
+                        return  # listener terlalu lambat, datanya sudah tergusur
+                    start = seq - oldest
+                    batch = [self._chunks[i][1] for i in range(start, len(self._chunks))]
+                    seq = self._next_seq
+                data = b"".join(batch) if len(batch) > 1 else bytes(batch[0])
+                STREAM_BYTES_OUT.inc(amount=len(data))
+                yield data
+        finally:
+            self._release()
+
+stream_relay = StreamRelay(
+    ICECAST_URL,
+    chunk_size=STREAM_CHUNK_BYTES,
+    buffer_bytes=STREAM_BUFFER_BYTES,
+    burst_bytes=STREAM_BURST_BYTES,
+    client_timeout=STREAM_CLIENT_TIMEOUT_S,
+    idle_s=STREAM_IDLE_S,
+    icy=STREAM_ICY_METADATA,
+)
+
+metrics.register(GaugeFn("haloradio_stream_listeners", "Listener /stream yang sedang tersambung.",
+                         lambda: stream_relay.listeners))
+
+# ====== Helper ETag (respon JSON kondisional) ======
+def etag_for(obj) -> str:
+    raw = json.dumps(obj, sort_keys=True, default=str, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha1(raw).hexdigest()[:20]
+
+def json_with_etag(payload: dict, etag: str):
+    """jsonify + weak ETag; balas 304 kosong kalau If-None-Match cocok."""
+    if request.if_none_match.contains_weak(etag):
+        resp = Response(status=304)
+    else:
+        resp = jsonify(payload)
+    resp.set_etag(etag, weak=True)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+# ====== Helper cache memori (LRU + TTL, single-flight) ======
+class TTLCache:
+    """Cache LRU berbatas `maxsize` entri; tiap entri kedaluwarsa setelah `ttl` detik."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is None:
+                return default
+            if hit[0] <= now:
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return hit[1]
+
+    def set(self, key, value, ttl: float = None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+class SingleFlight:
+    """Panggilan serentak dengan key sama cukup dijalankan sekali; sisanya menunggu hasilnya."""
+
+    class _Call:
+        __slots__ = ("event", "value", "error")
+
+        def __init__(self):
+            self.event = threading.Event()
+            self.value = None
+            self.error = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = SingleFlight._Call()
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+        try:
+            call.value = fn()
+            return call.value
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+# ====== HTTP cache & kompresi (semua respon) ======
+# - JSON/HTML tanpa ETag diberi weak ETag dari isi body → If-None-Match dibalas 304
+# - body teks >= COMPRESS_MIN_BYTES dikompres br/gzip sesuai Accept-Encoding
+# - url_for('static', ...) otomatis diberi ?v=<hash isi file> → boleh di-cache setahun
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", "6"))
+STATIC_MAX_AGE = int(os.getenv("STATIC_MAX_AGE_SECONDS", str(365 * 24 * 3600)))
+STATIC_COMPRESS_MAX_BYTES = int(os.getenv("STATIC_COMPRESS_MAX_BYTES", str(2 * 1024 * 1024)))
+_COMPRESSIBLE = ("text/", "application/json", "application/javascript", "image/svg+xml")
+
+_static_hashes = {}  # path -> (mtime, hash)
+_compressed_cache = TTLCache(maxsize=256, ttl=3600)  # (sha1 body, encoding) -> bytes
+
+def _static_hash(filename: str) -> str:
+    path = os.path.join(app.static_folder, filename)
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return ""
+    hit = _static_hashes.get(path)
+    if hit and hit[0] == mtime:
+        return hit[1]
+    with open(path, "rb") as f:
+        h = hashlib.sha1(f.read()).hexdigest()[:10]
+    _static_hashes[path] = (mtime, h)
+    return h
+
+@app.url_defaults
+def _static_cache_bust(endpoint, values):
+    if endpoint == "static" and "filename" in values and "v" not in values:
+        h = _static_hash(values["filename"])
+        if h:
+            values["v"] = h
+
+def _pick_encoding() -> str:
+    offers = ["br", "gzip"] if brotli is not None else ["gzip"]
+    return request.accept_encodings.best_match(offers) or ""
+
+def _compress(body: bytes, digest: str, encoding: str) -> bytes:
+    key = (digest, encoding)
+    out = _compressed_cache.get(key)
+    if out is None:
+        if encoding == "br":
+            out = brotli.compress(body, quality=min(COMPRESS_LEVEL, 11))
+        else:
+            out = gzip.compress(body, compresslevel=COMPRESS_LEVEL, mtime=0)
+        _compressed_cache.set(key, out)
+    return out
+
+@app.after_request
+def _http_cache_layer(resp):
+    if request.method not in ("GET", "HEAD"):
+        return resp
+    is_static = request.endpoint == "static"
+    if is_static and resp.status_code == 200:
+        if request.args.get("v"):
+            resp.headers["Cache-Control"] = f"public, max-age={STATIC_MAX_AGE}, immutable"
+        if (request.range is None and resp.mimetype.startswith(_COMPRESSIBLE)
+                and (resp.content_length or 0) <= STATIC_COMPRESS_MAX_BYTES):
+            # file statis kecil → baca ke memori supaya bisa dikompres
+            resp.direct_passthrough = False
+            resp.get_data()
+    if resp.is_streamed or resp.status_code != 200 or "Content-Encoding" in resp.headers:
+        return resp  # /stream, export, file besar, 304, error
+    if not resp.mimetype.startswith(_COMPRESSIBLE):
+        return resp
+
+    body = resp.get_data()
+    digest = hashlib.sha1(body).hexdigest()
+    if not is_static:
+        if not resp.get_etag()[0]:
+            resp.set_etag(digest[:20], weak=True)
+        if "Cache-Control" not in resp.headers:
+            private = request.path.startswith(("/admin", "/api/admin"))
+            resp.headers["Cache-Control"] = "private, no-cache" if private else "no-cache"
+        resp.make_conditional(request)
+        if resp.status_code == 304:
+            return resp
+
+    resp.vary.add("Accept-Encoding")
+    encoding = _pick_encoding()
+    if request.method == "HEAD" or len(body) < COMPRESS_MIN_BYTES or not encoding:
+        return resp
+    resp.set_data(_compress(body, digest, encoding))
+    resp.headers["Content-Encoding"] = encoding
+    etag, weak = resp.get_etag()
+    if etag and not weak:
+        resp.set_etag(etag, weak=True)  # representasi terkompres ≠ byte aslinya
+    return resp
+
+# ====== Cache /stats (poller Icecast di background) ======
+def _offline_stats() -> dict:
+    return {
+        "listeners": 0,
+        "now_playing": "-",
+        "bitrate": None,
+        "content_type": None,
+        "mount": MOUNT
+    }
+
+def _parse_icecast_status(data: dict) -> dict:
+    """Pilih source sesuai MOUNT lalu rangkai now_playing dari title/artist/server_name."""
+    sources = (data or {}).get("icestats", {}).get("source", [])
+
+    if isinstance(sources, dict):
+        sources = [sources]
+
+    selected = None
+    for s in sources:
+        listenurl = s.get("listenurl", "")
+        mount_name = s.get("mount") or ""
+        if listenurl.endswith(MOUNT) or mount_name == MOUNT:
+            selected = s
+            break
+
+    if not selected and sources:
+        selected = sources[0]
+
+    if not selected:
+        return _offline_stats()
+
+    title = selected.get("title") or ""
+    artist = selected.get("artist") or ""
+    server_name = selected.get("server_name") or ""
+
+    if title:
+        now_playing = title
+    elif artist and server_name:
+        now_playing = f"{artist} - {server_name}"
+    else:
+        now_playing = title or artist or server_name or "-"
+
+    return {
+        "listeners": selected.get("listeners", 0),
+        "now_playing": now_playing,
+        "bitrate": selected.get("bitrate"),
+        "content_type": selected.get("content_type"),
+        "mount": selected.get("listenurl") or selected.get("mount") or MOUNT
+    }
+
+# Mode relay: Icecast menghitung relay tiap worker sebagai SATU listener. Tiap poll,
+# worker menulis jumlah listener relay-nya ke col_relays, lalu angka listeners =
+# listener Icecast - koneksi relay yang hidup + total listener relay semua worker.
+RELAY_PRESENCE_TTL_S = 3 * max(STATS_POLL_S, STATS_POLL_ICY_S)
+_relay_presence_ids = {}
+
+def _relay_presence_id() -> str:
+    # per proses (dihitung setelah fork), bukan saat import
+    pid = os.getpid()
+    return _relay_presence_ids.setdefault(pid, f"{pid}-{ObjectId()}")
+
+def relay_listener_count(icecast_listeners: int, now: datetime = None) -> int:
+    now = now or datetime.now(timezone.utc)
+    listeners = stream_relay.listeners
+    upstreams = 1 if stream_relay.upstream_connected else 0
+    try:
+        col_relays.update_one(
+            {"_id": _relay_presence_id()},
+            {"$set": {"listeners": listeners, "upstream": upstreams, "at": now,
+                      "expire_at": now + timedelta(seconds=RELAY_PRESENCE_TTL_S)}},
+            upsert=True,
+        )
+        rows = list(col_relays.aggregate([
+            {"$match": {"at": {"$gte": now - timedelta(seconds=RELAY_PRESENCE_TTL_S)}}},
+            {"$group": {"_id": None, "listeners": {"$sum": "$listeners"}, "upstream": {"$sum": "$upstream"}}},
+        ]))
+        if rows:
+            listeners, upstreams = rows[0]["listeners"], rows[0]["upstream"]
+    except PyMongoError as e:
+        print("Relay presence error (pakai angka worker ini saja):", e)
+    return max(0, int(icecast_listeners or 0) - upstreams) + listeners
+
+class StatsPoller:
+    """
+    Satu thread yang mengambil status-json.xsl tiap `interval` detik dan
+    menyimpan snapshot hasil parse di memori. /stats tinggal baca snapshot.
+    Callback di on_change() dipanggil tiap kali isi snapshot berubah.
+    Selama relay membawa metadata ICY, now_playing diambil dari judul in-band
+    (langsung saat berganti) dan polling melambat ke `icy_interval`.
+    """
+
+    def __init__(self, url: str, interval: float, stale_after: float, icy_interval: float = 30.0):
+        self.url = url
+        self.interval = interval
+        self.icy_interval = icy_interval
+        self.stale_after = stale_after
+        self._lock = threading.Lock()
+        self._payload = _offline_stats()
+        self._etag = etag_for(self._payload)
+        self._updated_at = time.monotonic()
+        self._last_ok = 0.0
+        self._thread = None
+        self._ready = threading.Event()
+        self._wake = threading.Event()
+        self._callbacks = []
+        self._icy_title = None
+
+    def on_change(self, fn):
+        self._callbacks.append(fn)
+        return fn
+
+    def ensure_started(self, wait_s: float = 5.0):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="stats-poller", daemon=True)
+                self._thread.start()
+        # request pertama setelah start menunggu poll pertama (maks wait_s)
+        self._ready.wait(wait_s)
+
+    def snapshot(self):
+        """Return (payload, etag, umur_detik)."""
+        with self._lock:
+            return self._payload, self._etag, time.monotonic() - self._updated_at
+
+    def poll_once(self):
+        try:
+            with upstream_timer("icecast_stats"):
+                resp = pyrequests.get(self.url, timeout=5)
+                data = resp.json()
+            payload = _parse_icecast_status(data)
+            if STREAM_MODE == "relay":
+                payload["listeners"] = relay_listener_count(payload["listeners"])
+            if self._icy_title is not None:
+                payload["now_playing"] = self._icy_title or "-"
+            self._last_ok = time.monotonic()
+        except Exception as e:
+            print("Stats error:", e)
+            if time.monotonic() - self._last_ok <= self.stale_after:
+                return  # pakai snapshot lama dulu
+            payload = _offline_stats()
+        self._set(payload)
+
+    def _set(self, payload: dict):
+        etag = etag_for(payload)
+        with self._lock:
+            changed = etag != self._etag
+            self._payload = payload
+            self._etag = etag
+            self._updated_at = time.monotonic()
+        if changed:
+            for fn in self._callbacks:
+                try:
+                    fn(payload)
+                except Exception as e:
+                    print("Stats callback error:", e)
+
+    def set_icy_title(self, title):
+        """Judul dari metadata ICY relay; None = metadata in-band berhenti (relay mati/putus)."""
+        prev, self._icy_title = self._icy_title, title
+        if title is None:
+            self._wake.set()  # kembali ke interval polling normal sekarang juga
+            return
+        if title != prev:
+            with self._lock:
+                payload = dict(self._payload, now_playing=title or "-")
+            self._set(payload)
+
+    def _run(self):
+        while True:
+            self.poll_once()
+            self._ready.set()
+            self._wake.wait(self.icy_interval if self._icy_title is not None else self.interval)
+            self._wake.clear()
+
+stats_poller = StatsPoller(f"{ICECAST_HOST}/status-json.xsl", interval=STATS_POLL_S, stale_after=STATS_STALE_S,
+                           icy_interval=STATS_POLL_ICY_S)
+stream_relay.on_title(stats_poller.set_icy_title)
 
 # ====== ROUTES: Public ======
 @app.route("/")
@@ -194,6 +1347,18 @@ def radio_page():
 
 @app.route("/stream")
 def stream_proxy():
+    if STREAM_MODE == "relay":
+        if stream_relay.closing:
+            return "Server sedang restart. Silakan coba lagi sebentar.", 503
+        audio = stream_relay.subscribe(STREAM_CONNECT_WAIT_S)
+        if audio is None:
+            return "Server radio sedang tidak aktif. Silakan coba lagi nanti.", 503
+        return Response(
+            audio,
+            content_type=stream_relay.content_type,
+            headers={"Cache-Control": "no-cache, no-store", "X-Accel-Buffering": "no"},
+            direct_passthrough=True,
+        )
     try:
         r = pyrequests.get(ICECAST_URL, stream=True, timeout=10)
         content_type = r.headers.get("content-type", "audio/mpeg")
@@ -204,93 +1369,853 @@ def stream_proxy():
 
 @app.route("/stats")
 def stats():
-    try:
-        resp = pyrequests.get(f"{ICECAST_HOST}/status-json.xsl", timeout=5)
-        data = resp.json()
-        sources = data.get("icestats", {}).get("source", [])
+    stats_poller.ensure_started()
+    payload, etag, age = stats_poller.snapshot()
+    return json_with_etag(dict(payload, age=round(age, 1)), etag)
 
-        if isinstance(sources, dict):
-            sources = [sources]
+# ====== Katalog Musik Lokal (indeks trigram di disk) ======
+# File di MUSIC_DIR dipindai, tag ID3 (judul/artis/album) dibaca, lalu judul +
+# artis diindeks per trigram kata (" me", "mej", ...). Query "mejik" cukup
+# irisan posting list trigramnya → autocomplete tetap jalan walau Deezer lambat
+# atau putus. Indeks disimpan ke CATALOG_INDEX_PATH; rescan hanya membaca
+# ulang file yang mtime/ukurannya berubah.
+MUSIC_DIR = os.getenv("MUSIC_DIR", os.path.join(app.static_folder, "audio"))
+CATALOG_INDEX_PATH = os.getenv("CATALOG_INDEX_PATH", os.path.join(app.instance_path, "catalog_index.json"))
+CATALOG_RESCAN_S = float(os.getenv("CATALOG_RESCAN_SECONDS", "0"))  # 0 = hanya saat start + manual
+CATALOG_TAG_MAX_BYTES = 256 * 1024  # tag ID3 lebih besar dari ini (cover art) tidak perlu dibaca semua
+CATALOG_EXTS = (".mp3", ".m4a", ".flac", ".ogg") if mutagen is not None else (".mp3",)
+MUSIC_SEARCH_LOCAL = os.getenv("MUSIC_SEARCH_LOCAL", "merge")  # merge | first | off
+_CATALOG_INDEX_VERSION = 1
 
-        selected = None
-        for s in sources:
-            listenurl = s.get("listenurl", "")
-            mount_name = s.get("mount") or ""
-            if listenurl.endswith(MOUNT) or mount_name == MOUNT:
-                selected = s
-                break
+_ID3_FRAMES = {"TIT2": "title", "TPE1": "artist", "TALB": "album",
+               "TT2": "title", "TP1": "artist", "TAL": "album"}  # v2.3/2.4 dan v2.2
+_ID3_ENCODINGS = {0: "latin-1", 1: "utf-16", 2: "utf-16-be", 3: "utf-8"}
+_RE_CATALOG_PUNCT = re.compile(r"[\W_]+")
+_RE_YT_ID_SUFFIX = re.compile(r"\s*\[[A-Za-z0-9_-]{11}\]$")
+
+def _syncsafe(b: bytes) -> int:
+    return (b[0] << 21) | (b[1] << 14) | (b[2] << 7) | b[3]
+
+def _id3_text(data: bytes) -> str:
+    if not data:
+        return ""
+    txt = data[1:].decode(_ID3_ENCODINGS.get(data[0], "latin-1"), errors="replace")
+    return txt.split("\x00")[0].strip()
+
+def read_id3_tags(path: str) -> dict:
+    """Baca TIT2/TPE1/TALB dari header ID3v2, fallback ke ID3v1 di 128 byte terakhir."""
+    tags = {}
+    with open(path, "rb") as f:
+        head = f.read(10)
+        if len(head) == 10 and head[:3] == b"ID3":
+            ver, flags = head[3], head[5]
+            body = f.read(min(_syncsafe(head[6:10]), CATALOG_TAG_MAX_BYTES))
+            if flags & 0x80 and ver < 4:
+                body = body.replace(b"\xff\x00", b"\xff")  # unsynchronisation v2.2/2.3
+            pos = 0
+            if flags & 0x40 and len(body) >= 4:  # extended header
+                pos = _syncsafe(body[:4]) if ver >= 4 else int.from_bytes(body[:4], "big") + 4
+            id_len, hdr_len = (3, 6) if ver == 2 else (4, 10)
+            while pos + hdr_len <= len(body) and len(tags) < 3:
+                fid = body[pos:pos + id_len]
+                if not fid.strip(b"\x00"):
+                    break  # padding
+                if ver == 2:
+                    size = int.from_bytes(body[pos + 3:pos + 6], "big")
+                elif ver >= 4:
+                    size = _syncsafe(body[pos + 4:pos + 8])
+                else:
+                    size = int.from_bytes(body[pos + 4:pos + 8], "big")
+                pos += hdr_len
+                key = _ID3_FRAMES.get(fid.decode("latin-1"))
+                if key and key not in tags:
+                    val = _id3_text(body[pos:pos + size])
+                    if val:
+                        tags[key] = val
+                pos += size
+        if len(tags) < 3:
+            try:
+                f.seek(-128, os.SEEK_END)
+                tail = f.read(128)
+            except OSError:
+                tail = b""
+            if tail[:3] == b"TAG":
+                for key, a, b in (("title", 3, 33), ("artist", 33, 63), ("album", 63, 93)):
+                    val = tail[a:b].split(b"\x00")[0].decode("latin-1").strip()
+                    if val:
+                        tags.setdefault(key, val)
+    return tags
+
+def read_track_tags(path: str) -> dict:
+    if mutagen is not None:
+        try:
+            mf = mutagen.File(path, easy=True)
+        except Exception as e:
+            print("Mutagen error:", path, e)
+            mf = None
+        if mf is not None and mf.tags:
+            return {k: (mf.tags.get(k) or [""])[0].strip() for k in ("title", "artist", "album")}
+    if path.lower().endswith(".mp3"):
+        return read_id3_tags(path)
+    return {}
 
-        if not selected and sources:
-            selected = sources[0]
-
-        if not selected:
-            return jsonify({
-                "listeners": 0,
-                "now_playing": "-",
-                "bitrate": None,
-                "content_type": None,
-                "mount": MOUNT
-            }), 200
-
-        title = selected.get("title") or ""
-        artist = selected.get("artist") or ""
-        server_name = selected.get("server_name") or ""
-
-        if title:
-            now_playing = title
-        elif artist and server_name:
-            now_playing = f"{artist} - {server_name}"
+def _catalog_norm(text: str) -> str:
+    s = unicodedata.normalize("NFKD", text or "")
+    s = "".join(ch for ch in s if not unicodedata.combining(ch)).casefold()
+    return " ".join(_RE_CATALOG_PUNCT.sub(" ", s).split())
+
+def _catalog_grams(norm: str, partial_last: bool = False) -> set:
+    """Trigram per kata dengan spasi di depan (awal kata) dan di belakang (kata utuh)."""
+    grams = set()
+    tokens = norm.split()
+    for i, tok in enumerate(tokens):
+        padded = " " + tok + ("" if partial_last and i == len(tokens) - 1 else " ")
+        for j in range(len(padded) - 2):
+            grams.add(padded[j:j + 3])
+    return grams
+
+def _catalog_track(rel: str, st, tags: dict) -> dict:
+    title, artist = tags.get("title") or "", tags.get("artist") or ""
+    if not title:
+        # tanpa tag: pakai nama file "Artis - Judul [videoId]"
+        stem = _RE_YT_ID_SUFFIX.sub("", os.path.splitext(os.path.basename(rel))[0])
+        if " - " in stem and not artist:
+            artist, title = (x.strip() for x in stem.split(" - ", 1))
         else:
-            now_playing = title or artist or server_name or "-"
+            title = stem.strip()
+    return {"path": rel, "mtime": st.st_mtime_ns, "size": st.st_size,
+            "title": title, "artist": artist, "album": tags.get("album") or ""}
 
-        return jsonify({
-            "listeners": selected.get("listeners", 0),
-            "now_playing": now_playing,
-            "bitrate": selected.get("bitrate"),
-            "content_type": selected.get("content_type"),
-            "mount": selected.get("listenurl") or selected.get("mount") or MOUNT
-        })
-    except Exception as e:
-        print("Stats error:", e)
-        return jsonify({
-                "listeners": 0,
-                "now_playing": "-",
-                "bitrate": None,
-                "content_type": None,
-                "mount": MOUNT
-        }), 200
+def _catalog_audio_url(rel: str) -> str:
+    # MP3 → klip preview pendek (cache); format lain → file utuh dengan Range
+    if rel.lower().endswith(".mp3"):
+        return url_for("audio_preview", rel=rel)
+    return url_for("audio_file", rel=rel)
+
+class LocalCatalog:
+    def __init__(self, root: str, index_path: str):
+        self.root = root
+        self.index_path = index_path
+        self._lock = threading.Lock()  # satu scan/load pada satu waktu
+        self._loaded = False
+        # snapshot immutable (diganti utuh): tracks, hay (judul+artis ternormalisasi), postings trigram
+        self._snap = ([], [], {})
+        self.scanned_at = None
+
+    def __len__(self):
+        return len(self._snap[0])
+
+    def _set_tracks(self, tracks: list, postings: dict | None = None):
+        hays = [" " + _catalog_norm(f"{t['title']} {t['artist']}") + " " for t in tracks]
+        if postings is None:
+            postings = defaultdict(list)
+            for i, hay in enumerate(hays):
+                for gram in _catalog_grams(hay):
+                    postings[gram].append(i)
+            postings = dict(postings)
+        self._snap = (tracks, hays, postings)
+
+    def _load_locked(self):
+        self._loaded = True
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print("Catalog index error (dipindai ulang):", e)
+            return
+        if raw.get("version") != _CATALOG_INDEX_VERSION or raw.get("root") != os.path.abspath(self.root):
+            return
+        keys = ("path", "mtime", "size", "title", "artist", "album")
+        tracks = [dict(zip(keys, row)) for row in raw.get("tracks", [])]
+        self._set_tracks(tracks, raw.get("grams") or {})
+        self.scanned_at = _iso_dt(raw["scanned_at"]) if raw.get("scanned_at") else None
+
+    def _save(self):
+        tracks, _, postings = self._snap
+        raw = {
+            "version": _CATALOG_INDEX_VERSION,
+            "root": os.path.abspath(self.root),
+            "scanned_at": to_utc_iso(self.scanned_at),
+            "tracks": [[t["path"], t["mtime"], t["size"], t["title"], t["artist"], t["album"]] for t in tracks],
+            "grams": postings,
+        }
+        os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+        tmp = f"{self.index_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(raw, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, self.index_path)
+
+    def ensure_loaded(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._load_locked()
+
+    def _walk(self):
+        for dirpath, _, files in os.walk(self.root):
+            for fn in files:
+                if fn.lower().endswith(CATALOG_EXTS):
+                    full = os.path.join(dirpath, fn)
+                    try:
+                        st = os.stat(full)
+                    except OSError:
+                        continue
+                    yield os.path.relpath(full, self.root).replace(os.sep, "/"), st
+
+    def rescan(self) -> dict:
+        """Pindai MUSIC_DIR; hanya file baru/berubah yang tag-nya dibaca ulang."""
+        t0 = time.perf_counter()
+        with self._lock:
+            if not self._loaded:
+                self._load_locked()
+            old = {t["path"]: t for t in self._snap[0]}
+            out = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0, "errors": 0}
+            tracks = []
+            for rel, st in self._walk():
+                prev = old.pop(rel, None)
+                if prev and prev["mtime"] == st.st_mtime_ns and prev["size"] == st.st_size:
+                    tracks.append(prev)
+                    out["unchanged"] += 1
+                    continue
+                try:
+                    tags = read_track_tags(os.path.join(self.root, rel))
+                except OSError as e:
+                    print("Catalog read error:", rel, e)
+                    out["errors"] += 1
+                    continue
+                tracks.append(_catalog_track(rel, st, tags))
+                out["updated" if prev else "added"] += 1
+            out["removed"] = len(old)
+            self.scanned_at = datetime.now(timezone.utc)
+            if out["added"] or out["updated"] or out["removed"] or not os.path.exists(self.index_path):
+                tracks.sort(key=lambda t: t["path"])
+                self._set_tracks(tracks)
+                try:
+                    self._save()
+                except OSError as e:
+                    print("Catalog save error:", e)
+        out["tracks"] = len(tracks)
+        out["took_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        return out
+
+    def search(self, q: str, limit: int = 15) -> list:
+        self.ensure_loaded()
+        tracks, hays, postings = self._snap
+        key = _catalog_norm(q)
+        if not key or not tracks:
+            return []
+        grams = _catalog_grams(key, partial_last=True)
+        if grams:
+            lists = [postings.get(g) for g in grams]
+            if not all(lists):
+                return []
+            lists.sort(key=len)
+            cands = set(lists[0])
+            for lst in lists[1:]:
+                cands.intersection_update(lst)
+                if not cands:
+                    return []
+        else:
+            cands = range(len(tracks))  # query 1 huruf: tak ada trigram, saring linear
+        tokens = key.split()
+        # trigram tidak urut → cek ulang: kata utuh untuk token depan, awalan kata untuk token terakhir
+        needles = [f" {t} " for t in tokens[:-1]] + [f" {tokens[-1]}"]
+        hits = []
+        for i in cands:
+            if all(n in hays[i] for n in needles):
+                t = tracks[i]
+                title_norm = " " + _catalog_norm(t["title"]) + " "
+                in_title = sum(1 for n in needles if n in title_norm)
+                hits.append((-in_title, len(t["title"]), t["title"].casefold(), i))
+        hits.sort()
+        return [{
+            "title": tracks[i]["title"],
+            "artist": tracks[i]["artist"],
+            "album": tracks[i]["album"],
+            "cover": "",
+            "preview": _catalog_audio_url(tracks[i]["path"]),
+            "source": "local",
+        } for *_, i in hits[:limit]]
+
+local_catalog = LocalCatalog(MUSIC_DIR, CATALOG_INDEX_PATH)
+
+def _catalog_scanner():
+    while True:
+        try:
+            out = local_catalog.rescan()
+            if out["added"] or out["updated"] or out["removed"]:
+                print(f"Katalog lokal: {out['tracks']} lagu (+{out['added']} ~{out['updated']} -{out['removed']})")
+        except Exception as e:
+            print("Catalog scan error:", e)
+        if CATALOG_RESCAN_S <= 0:
+            return
+        socketio.sleep(CATALOG_RESCAN_S)
+
+def _merge_search(local: list, remote: list) -> list:
+    """Hasil lokal duluan; hasil Deezer yang judul+artisnya sama dengan lagu lokal dibuang."""
+    seen = {(_catalog_norm(it["title"]), _catalog_norm(it["artist"])) for it in local}
+    merged = list(local)
+    for it in remote:
+        if (_catalog_norm(it["title"]), _catalog_norm(it["artist"])) not in seen:
+            merged.append(it)
+    return merged[:DEEZER_MAX_RESULTS]
+
+@app.route("/api/admin/catalog/rescan", methods=["POST"])
+@admin_required
+def admin_catalog_rescan():
+    try:
+        out = local_catalog.rescan()
+    except OSError as e:
+        print("Catalog rescan error:", e)
+        return jsonify({"ok": False, "error": "Gagal memindai folder musik."}), 500
+    return jsonify({"ok": True, **out, "scanned_at": to_utc_iso(local_catalog.scanned_at)})
+
+# ====== Audio Lokal (Range/206 + klip preview) ======
+# /audio/<rel>          : file utuh dari MUSIC_DIR, Range/206 + ETag kuat (send_file).
+#                         Di balik nginx set AUDIO_ACCEL_PREFIX → nginx yang kirim
+#                         file (sendfile, zero-copy) lewat X-Accel-Redirect.
+# /audio/preview/<rel>  : potongan ±AUDIO_PREVIEW_S detik, dipotong di batas frame
+#                         MP3 tanpa re-encode. File di-mmap dan hanya header + area
+#                         klip yang disentuh; hasilnya di-cache di memori.
+AUDIO_MAX_AGE = int(os.getenv("AUDIO_MAX_AGE_SECONDS", "86400"))
+AUDIO_ACCEL_PREFIX = os.getenv("AUDIO_ACCEL_PREFIX", "")  # mis. "/_music/" (location internal nginx)
+AUDIO_PREVIEW_S = float(os.getenv("AUDIO_PREVIEW_SECONDS", "30"))
+AUDIO_PREVIEW_START_S = float(os.getenv("AUDIO_PREVIEW_START_SECONDS", "30"))
+AUDIO_PREVIEW_CACHE_SIZE = int(os.getenv("AUDIO_PREVIEW_CACHE_SIZE", "64"))
+
+AUDIO_PREVIEW_CACHE = metrics.register(Counter(
+    "haloradio_audio_preview_cache_total", "Permintaan klip preview per hasil cache.", ("result",)))
+
+audio_preview_cache = TTLCache(AUDIO_PREVIEW_CACHE_SIZE, 24 * 3600)  # key ikut mtime+size → aman lama
+audio_preview_flight = SingleFlight()
+
+# kbps per indeks bitrate: (MPEG1?, layer) ; MPEG2/2.5 layer 2 & 3 berbagi tabel
+_MP3_BITRATES = {
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+def _mp3_frame(buf, i: int):
+    """Header frame MP3 di offset i → (panjang byte, sampel, sample rate, kbps) atau None."""
+    if i + 4 > len(buf) or buf[i] != 0xFF or (buf[i + 1] & 0xE0) != 0xE0:
+        return None
+    ver = (buf[i + 1] >> 3) & 3
+    layer = 4 - ((buf[i + 1] >> 1) & 3)
+    br_idx, sr_idx, pad = buf[i + 2] >> 4, (buf[i + 2] >> 2) & 3, (buf[i + 2] >> 1) & 1
+    if ver == 1 or layer == 4 or br_idx in (0, 15) or sr_idx == 3:
+        return None
+    mpeg1 = ver == 3
+    kbps = _MP3_BITRATES[(mpeg1, layer if mpeg1 or layer == 1 else 2)][br_idx]
+    sr = _MP3_SAMPLE_RATES[ver][sr_idx]
+    if layer == 1:
+        return (12 * kbps * 1000 // sr + pad) * 4, 384, sr, kbps
+    samples = 1152 if (mpeg1 or layer == 2) else 576
+    return samples // 8 * kbps * 1000 // sr + pad, samples, sr, kbps
+
+def _mp3_sync(buf, pos: int, end: int):
+    """Offset frame valid pertama >= pos (dicek dengan header frame berikutnya)."""
+    while pos < end:
+        pos = buf.find(b"\xff", pos, end)
+        if pos < 0:
+            return None
+        fr = _mp3_frame(buf, pos)
+        if fr and (pos + fr[0] >= end or _mp3_frame(buf, pos + fr[0])):
+            return pos
+        pos += 1
+    return None
+
+def _mp3_clip(buf, start_s: float, dur_s: float) -> bytes:
+    size = len(buf)
+    audio0 = 10 + _syncsafe(buf[6:10]) if buf[:3] == b"ID3" else 0
+    audio_end = size - 128 if buf[size - 128:size - 125] == b"TAG" else size
+    first = _mp3_sync(buf, audio0, audio_end)
+    if first is None:
+        raise ValueError("tidak ada frame MP3")
+    flen, samples, sr, kbps = _mp3_frame(buf, first)
+    # header Xing/Info (VBR): jumlah frame + TOC 100 titik → posisi detik ke-n tanpa scan
+    head = bytes(buf[first:first + min(flen, 200)])
+    tag = max(head.find(b"Xing"), head.find(b"Info"))
+    total_s, seek = None, None
+    audio_first = first
+    if tag >= 0 and tag + 8 <= len(head):
+        audio_first = first + flen  # frame Xing/Info bukan audio; durasinya = file penuh, jangan ikut klip
+        flags = int.from_bytes(head[tag + 4:tag + 8], "big")
+        p = tag + 8
+        frames = nbytes = None
+        if flags & 1:
+            frames = int.from_bytes(head[p:p + 4], "big"); p += 4
+        if flags & 2:
+            nbytes = int.from_bytes(head[p:p + 4], "big"); p += 4
+        toc = head[p:p + 100] if flags & 4 and len(head) >= p + 100 else None
+        data0 = audio_first
+        span = nbytes or (audio_end - data0)
+        if frames:
+            total_s = frames * samples / sr
+        if total_s and toc:
+            seek = lambda t: data0 + int(toc[min(int(t / total_s * 100), 99)] / 256 * span)
+        elif total_s:
+            seek = lambda t: data0 + int(t / total_s * span)
+    if seek is None:  # CBR: offset = detik × byte per detik
+        total_s = (audio_end - audio_first) / (kbps * 125)
+        seek = lambda t: audio_first + int(t * kbps * 125)
+    start_s = max(0.0, min(start_s, total_s - dur_s))
+    pos = _mp3_sync(buf, seek(start_s), audio_end) if start_s > 0 else audio_first
+    if pos is None:
+        raise ValueError("frame awal klip tidak ketemu")
+    end, t = pos, 0.0
+    while end < audio_end and t < dur_s:
+        fr = _mp3_frame(buf, end)
+        if fr is None or end + fr[0] > audio_end:
+            break
+        end += fr[0]
+        t += fr[1] / fr[2]
+    return bytes(buf[pos:end])
+
+def _audio_path(rel: str):
+    if not rel.lower().endswith(CATALOG_EXTS):
+        return None
+    path = safe_join(MUSIC_DIR, rel)
+    return path if path and os.path.isfile(path) else None
+
+def _audio_etag(*parts) -> str:
+    return hashlib.sha1("|".join(str(x) for x in parts).encode("utf-8")).hexdigest()[:24]
+
+@app.route("/audio/<path:rel>")
+def audio_file(rel):
+    path = _audio_path(rel)
+    if path is None:
+        return jsonify({"ok": False, "error": "File audio tidak ditemukan."}), 404
+    st = os.stat(path)
+    if AUDIO_ACCEL_PREFIX:
+        resp = Response(mimetype="audio/mpeg" if rel.lower().endswith(".mp3") else None)
+        resp.headers["X-Accel-Redirect"] = AUDIO_ACCEL_PREFIX + urllib.parse.quote(rel)
+        return resp
+    return send_from_directory(
+        MUSIC_DIR, rel, conditional=True, max_age=AUDIO_MAX_AGE,
+        etag=_audio_etag(rel, st.st_mtime_ns, st.st_size),
+    )
+
+@app.route("/audio/preview/<path:rel>")
+def audio_preview(rel):
+    path = _audio_path(rel)
+    if path is None or not rel.lower().endswith(".mp3"):
+        return jsonify({"ok": False, "error": "File audio tidak ditemukan."}), 404
+    try:
+        start_s = max(0.0, float(request.args.get("start", AUDIO_PREVIEW_START_S)))
+        dur_s = min(max(1.0, float(request.args.get("dur", AUDIO_PREVIEW_S))), AUDIO_PREVIEW_S)
+    except ValueError:
+        return jsonify({"ok": False, "error": "Parameter start/dur tidak valid."}), 400
+    st = os.stat(path)
+    key = (rel, st.st_mtime_ns, st.st_size, start_s, dur_s)
+    clip = audio_preview_cache.get(key)
+    if clip is None:
+        AUDIO_PREVIEW_CACHE.inc("miss")
+        def build():
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                out = _mp3_clip(mm, start_s, dur_s)
+            audio_preview_cache.set(key, out)
+            return out
+        try:
+            clip = audio_preview_flight.do(key, build)
+        except (ValueError, OSError) as e:
+            print("Audio preview error:", rel, e)
+            return jsonify({"ok": False, "error": "Gagal membuat preview audio."}), 422
+    else:
+        AUDIO_PREVIEW_CACHE.inc("hit")
+    resp = Response(clip, mimetype="audio/mpeg")
+    resp.set_etag(_audio_etag(*key))
+    resp.cache_control.public = True
+    resp.cache_control.max_age = AUDIO_MAX_AGE
+    return resp.make_conditional(request, accept_ranges=True, complete_length=len(clip))
 
 # ====== API: Music Search (Deezer) ======
+DEEZER_CACHE_SIZE = int(os.getenv("DEEZER_CACHE_SIZE", "2000"))
+DEEZER_CACHE_TTL = float(os.getenv("DEEZER_CACHE_TTL_SECONDS", "600"))
+DEEZER_MAX_RESULTS = 15
+DEEZER_API_URL = os.getenv("DEEZER_API_URL", "https://api.deezer.com/search")
+
+deezer_cache = TTLCache(DEEZER_CACHE_SIZE, DEEZER_CACHE_TTL)
+deezer_flight = SingleFlight()
+
+def _norm_query(q: str) -> str:
+    return " ".join((q or "").casefold().split())
+
+def _deezer_fetch(q: str) -> dict:
+    """Ambil dari Deezer lalu ringkas ke field yang dipakai UI saja."""
+    with upstream_timer("deezer"):
+        dz = pyrequests.get(DEEZER_API_URL, params={"q": q}, timeout=6)
+        dz.raise_for_status()
+        raw = dz.json() or {}
+    tracks = raw.get("data") or []
+    data = []
+    for tr in tracks[:DEEZER_MAX_RESULTS]:
+        title  = (tr.get("title") or "").strip()
+        artist = (tr.get("artist", {}) or {}).get("name") or ""
+        album  = (tr.get("album", {}) or {}).get("title") or ""
+        cover  = (tr.get("album", {}) or {}).get("cover_medium") or \
+                 (tr.get("album", {}) or {}).get("cover") or ""
+        preview = tr.get("preview") or ""
+        data.append({
+            "title": title,
+            "artist": artist,
+            "album": album,
+            "cover": cover,
+            "preview": preview
+        })
+    return {"data": data}
+
 @app.route("/api/music/search")
 def music_search():
     q = (request.args.get("q") or "").strip()
     if not q:
         return jsonify({"ok": True, "data": []})
+    local = local_catalog.search(q, DEEZER_MAX_RESULTS) if MUSIC_SEARCH_LOCAL != "off" else []
+    if local and MUSIC_SEARCH_LOCAL == "first":
+        return jsonify({"ok": True, "data": local})
+    # cache hanya per query ternormalisasi yang persis sama: Deezer mencocokkan secara fuzzy
+    # per field, jadi hasil "mejik" yang disaring lokal bukan hasil "mejikuh"
+    key = _norm_query(q)
+    hit = deezer_cache.get(key)
+    if hit is None:
+        def fetch():
+            entry = _deezer_fetch(q)
+            deezer_cache.set(key, entry)
+            return entry
+        try:
+            hit = deezer_flight.do(key, fetch)
+        except pyrequests.exceptions.Timeout:
+            if local:  # Deezer lambat: hasil lokal tetap dikirim
+                return jsonify({"ok": True, "data": local, "partial": True})
+            return jsonify({"ok": False, "error": "Timeout ke Deezer."}), 504
+        except Exception as e:
+            print("Deezer search error:", e)
+            if local:
+                return jsonify({"ok": True, "data": local, "partial": True})
+            return jsonify({"ok": False, "error": "Gagal mengambil data Deezer."}), 502
+    return jsonify({"ok": True, "data": _merge_search(local, hit["data"])})
+
+# ====== API: YouTube (cari video teratas) ======
+YOUTUBE_UA = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+                  "AppleWebKit/537.36 (KHTML, like Gecko) "
+                  "Chrome/124.0 Safari/537.36"
+}
+YT_POOL_SIZE = int(os.getenv("YT_POOL_SIZE", "10"))
+YT_CACHE_SIZE = int(os.getenv("YT_CACHE_SIZE", "5000"))
+YT_CACHE_TTL = float(os.getenv("YT_CACHE_TTL_SECONDS", "86400"))       # hasil ketemu
+YT_NEG_CACHE_TTL = float(os.getenv("YT_NEG_CACHE_TTL_SECONDS", "600"))  # hasil tidak ketemu
+YT_BATCH_CONCURRENCY = int(os.getenv("YT_BATCH_CONCURRENCY", "4"))
+YT_BATCH_MAX = int(os.getenv("YT_BATCH_MAX", "50"))
+YOUTUBE_RESULTS_URL = os.getenv("YOUTUBE_RESULTS_URL", "https://www.youtube.com/results")
+
+# 1) JSON initialData: "videoId":"XXXXXXXXXXX"   2) fallback: watch?v=XXXXXXXXXXX
+_RE_YT_VIDEOID = re.compile(rb'"videoId":"([a-zA-Z0-9_-]{11})"')
+_RE_YT_WATCH = re.compile(rb'watch\?v=([a-zA-Z0-9_-]{11})')
+_YT_SCAN_OVERLAP = 64  # cukup untuk pola terpanjang yang terpotong di batas chunk
+
+def _scan_first_video_id(chunks) -> str | None:
+    """
+    Cari ID video pertama sambil halaman masih diunduh. Berhenti di "videoId"
+    pertama; pola watch?v= hanya dipakai kalau sampai akhir tidak ada videoId.
+    """
+    tail = b""
+    fallback = None
+    for chunk in chunks:
+        if not chunk:
+            continue
+        buf = tail + chunk
+        m = _RE_YT_VIDEOID.search(buf)
+        if m:
+            return m.group(1).decode("ascii")
+        if fallback is None:
+            m2 = _RE_YT_WATCH.search(buf)
+            if m2:
+                fallback = m2.group(1).decode("ascii")
+        tail = buf[-_YT_SCAN_OVERLAP:]
+    return fallback
+
+_YT_MISS = object()
+
+class YouTubeResolver:
+    """
+    Judul → ID video YouTube teratas.
+    - Session persisten dengan pool koneksi (keep-alive, cookie ikut tersimpan).
+    - Cache positif/negatif per query ternormalisasi.
+    - Query serentak yang sama cukup satu request (SingleFlight).
+    """
+
+    def __init__(self, pool_size: int, cache_size: int, ttl: float, neg_ttl: float):
+        self.session = pyrequests.Session()
+        self.session.headers.update(YOUTUBE_UA)
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.cache = TTLCache(cache_size, ttl)
+        self.neg_ttl = neg_ttl
+        self.flight = SingleFlight()
+
+    def resolve(self, q: str) -> str | None:
+        key = _norm_query(q)
+        hit = self.cache.get(key, _YT_MISS)
+        if hit is not _YT_MISS:
+            return hit
+        return self.flight.do(key, lambda: self._fetch_and_cache(key, q))
+
+    def _fetch_and_cache(self, key: str, q: str) -> str | None:
+        vid = self._fetch(q)
+        self.cache.set(key, vid, ttl=None if vid else self.neg_ttl)
+        return vid
+
+    def _fetch(self, q: str) -> str | None:
+        yurl = YOUTUBE_RESULTS_URL + "?search_query=" + urllib.parse.quote(q)
+        with upstream_timer("youtube"), self.session.get(yurl, timeout=8, stream=True) as resp:
+            resp.raise_for_status()
+            return _scan_first_video_id(resp.iter_content(chunk_size=64 * 1024))
+
+yt_resolver = YouTubeResolver(YT_POOL_SIZE, YT_CACHE_SIZE, YT_CACHE_TTL, YT_NEG_CACHE_TTL)
+
+@app.route("/api/tools/yt/find_first")
+def yt_find_first():
+    """
+    Param:
+      - q   : kata kunci pencarian (mis. 'Nothing To Do Bancali')
+      - url : (opsional) kalau user kirim link /results?search_query=...
+    Return: { ok:True, url:'https://www.youtube.com/watch?v=ID', id:'ID' }
+    """
+    q = (request.args.get("q") or "").strip()
+    url_in = (request.args.get("url") or "").strip()
+
+    if not q and url_in:
+        try:
+            u = urllib.parse.urlparse(url_in)
+            if u.netloc.endswith("youtube.com") and u.path.startswith("/results"):
+                qs = urllib.parse.parse_qs(u.query or "")
+                qlist = qs.get("search_query", [])
+                if qlist:
+                    q = qlist[0]
+        except Exception:
+            pass
+
+    if not q:
+        return jsonify({"ok": False, "error": "Butuh parameter q atau url results."}), 400
+
     try:
-        dz = pyrequests.get("https://api.deezer.com/search", params={"q": q}, timeout=6)
-        dz.raise_for_status()
-        raw = dz.json() or {}
-        data = []
-        for tr in (raw.get("data") or [])[:15]:
-            title  = (tr.get("title") or "").strip()
-            artist = (tr.get("artist", {}) or {}).get("name") or ""
-            album  = (tr.get("album", {}) or {}).get("title") or ""
-            cover  = (tr.get("album", {}) or {}).get("cover_medium") or \
-                     (tr.get("album", {}) or {}).get("cover") or ""
-            preview = tr.get("preview") or ""
-            data.append({
-                "title": title,
-                "artist": artist,
-                "album": album,
-                "cover": cover,
-                "preview": preview
-            })
-        return jsonify({"ok": True, "data": data})
+        vid = yt_resolver.resolve(q)
+        if not vid:
+            return jsonify({"ok": False, "error": "Tidak ketemu video dari pencarian."}), 404
+        return jsonify({"ok": True, "id": vid, "url": f"https://www.youtube.com/watch?v={vid}"})
     except pyrequests.exceptions.Timeout:
-        return jsonify({"ok": False, "error": "Timeout ke Deezer."}), 504
+        return jsonify({"ok": False, "error": "Timeout ke YouTube."}), 504
     except Exception as e:
-        print("Deezer search error:", e)
-        return jsonify({"ok": False, "error": "Gagal mengambil data Deezer."}), 502
+        print("yt_find_first error:", e)
+        return jsonify({"ok": False, "error": "Gagal mengambil hasil YouTube."}), 502
+
+def _yt_resolve_item(q: str) -> dict:
+    try:
+        vid = yt_resolver.resolve(q)
+        if not vid:
+            return {"q": q, "ok": False, "error": "Tidak ketemu video dari pencarian."}
+        return {"q": q, "ok": True, "id": vid, "url": f"https://www.youtube.com/watch?v={vid}"}
+    except pyrequests.exceptions.Timeout:
+        return {"q": q, "ok": False, "error": "Timeout ke YouTube."}
+    except Exception as e:
+        print("yt_find_batch error:", e)
+        return {"q": q, "ok": False, "error": "Gagal mengambil hasil YouTube."}
+
+@app.route("/api/tools/yt/find_batch", methods=["POST"])
+@admin_required
+def yt_find_batch():
+    """
+    Body JSON salah satu:
+      - {"queries": ["judul 1", "judul 2", ...]}
+      - {"status": "New"}  → semua judul request lagu dengan status tsb
+    Return: { ok:True, items:[{q, ok, id, url | error, request_ids?}] }
+    """
+    data = request.get_json(silent=True) or {}
+    status = (data.get("status") or "").strip()
+    by_query = OrderedDict()  # query → request_ids (urutan dipertahankan, duplikat digabung)
+
+    if status:
+        cur = col_requests.find({"status": status}, {"title": 1}).sort("created_at", DESCENDING).limit(YT_BATCH_MAX * 4)
+        for d in cur:
+            t = (d.get("title") or "").strip()
+            if t:
+                by_query.setdefault(t, []).append(str(d["_id"]))
+    else:
+        queries = data.get("queries")
+        if not isinstance(queries, list):
+            return jsonify({"ok": False, "error": "Butuh 'queries' (list) atau 'status'."}), 400
+        for q in queries:
+            q = (str(q) if q is not None else "").strip()
+            if q:
+                by_query.setdefault(q, [])
+
+    qlist = list(by_query)[:YT_BATCH_MAX]
+    if not qlist:
+        return jsonify({"ok": True, "items": []})
+
+    with ThreadPoolExecutor(max_workers=max(1, min(YT_BATCH_CONCURRENCY, len(qlist)))) as ex:
+        items = list(ex.map(_yt_resolve_item, qlist))
+    if status:
+        for it in items:
+            it["request_ids"] = by_query[it["q"]]
+    return jsonify({"ok": True, "items": items, "truncated": len(by_query) > len(qlist)})
+
+# ====== Write-behind (antrean insert untuk lonjakan request/chat) ======
+# Opsional (WRITE_BEHIND=1): dokumen yang sudah divalidasi diberi ObjectId di
+# sisi app, masuk antrean memori, lalu ditulis dengan insert_many begitu
+# batch penuh atau WRITE_BEHIND_FLUSH_MS lewat. Antrean dibatasi; kalau penuh,
+# request ditolak 503 (backpressure) daripada memori membengkak.
+# Insert idempoten (pakai _id sendiri), jadi batch yang gagal karena koneksi
+# aman dicoba ulang. Sisa antrean ditulis saat shutdown (drain).
+WRITE_BEHIND = os.getenv("WRITE_BEHIND", "0") == "1"
+WRITE_BEHIND_BATCH = int(os.getenv("WRITE_BEHIND_BATCH", "500"))
+WRITE_BEHIND_FLUSH_S = float(os.getenv("WRITE_BEHIND_FLUSH_MS", "200")) / 1000.0
+WRITE_BEHIND_MAX_QUEUE = int(os.getenv("WRITE_BEHIND_MAX_QUEUE", "20000"))
+
+WB_FLUSH_LATENCY = metrics.register(Histogram(
+    "haloradio_writebehind_flush_seconds", "Durasi satu insert_many write-behind.", ("queue",)))
+WB_DOCS = metrics.register(Counter(
+    "haloradio_writebehind_docs_total", "Dokumen write-behind per hasil (written/duplicate/failed/rejected).",
+    ("queue", "result")))
+
+class WriteBehindQueue:
+    def __init__(self, name: str, collection, max_batch: int, flush_s: float, max_queue: int,
+                 stamp_fields: tuple = ()):
+        self.name = name
+        self.collection = collection
+        self.stamp_fields = stamp_fields  # diisi waktu flush, bukan waktu antre
+        self.max_batch = max_batch
+        self.flush_s = flush_s
+        self.max_queue = max_queue
+        self._buf = deque()          # (enqueued_monotonic, doc)
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()  # satu insert_many pada satu waktu (thread flusher vs drain)
+        self._thread = None
+        metrics.register(GaugeFn(f"haloradio_writebehind_queue_depth_{name}",
+                                 f"Dokumen yang menunggu ditulis ({name}).", lambda: len(self._buf)))
+
+    @property
+    def depth(self) -> int:
+        return len(self._buf)
+
+    def put(self, doc: dict) -> bool:
+        """Antrekan dokumen (doc['_id'] diisi kalau belum ada). False kalau antrean penuh."""
+        doc.setdefault("_id", ObjectId())
+        with self._cond:
+            if len(self._buf) >= self.max_queue:
+                WB_DOCS.inc(self.name, "rejected")
+                return False
+            self._buf.append((time.monotonic(), doc))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"write-behind-{self.name}", daemon=True)
+                self._thread.start()
+            # bangunkan flusher saat antrean baru terisi (mulai hitung flush_s) atau batch penuh
+            if len(self._buf) == 1 or len(self._buf) >= self.max_batch:
+                self._cond.notify()
+        return True
+
+    def _take(self) -> list:
+        # dipanggil dengan _cond terkunci
+        n = min(self.max_batch, len(self._buf))
+        return [self._buf.popleft()[1] for _ in range(n)]
+
+    def _write(self, docs: list) -> bool:
+        """insert_many satu batch; False kalau gagal karena koneksi (batch sudah dikembalikan ke antrean)."""
+        t0 = time.perf_counter()
+        if self.stamp_fields:
+            # delta sync admin (created_at/updated_at > cursor) hanya menoleh REQ_DELTA_OVERLAP
+            # ke belakang: waktu dokumen harus dekat dengan saat ia benar-benar tertulis
+            now = datetime.now(timezone.utc)
+            for d in docs:
+                for f in self.stamp_fields:
+                    d[f] = now
+        try:
+            self.collection.insert_many(docs, ordered=False)
+            WB_DOCS.inc(self.name, "written", amount=len(docs))
+            return True
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            dup = sum(1 for err in errors if err.get("code") == 11000)  # sudah tertulis di percobaan sebelumnya
+            WB_DOCS.inc(self.name, "written", amount=len(docs) - len(errors))
+            WB_DOCS.inc(self.name, "duplicate", amount=dup)
+            if len(errors) > dup:
+                WB_DOCS.inc(self.name, "failed", amount=len(errors) - dup)
+                print(f"Write-behind {self.name}: {len(errors) - dup} dokumen ditolak Mongo:", errors[0].get("errmsg"))
+            return True
+        except PyMongoError as e:
+            print(f"Write-behind {self.name} error (dicoba lagi):", e)
+            with self._cond:
+                now = time.monotonic()
+                self._buf.extendleft((now, d) for d in reversed(docs))
+            return False
+        finally:
+            WB_FLUSH_LATENCY.observe(time.perf_counter() - t0, self.name)
+
+    def _run(self):
+        backoff = 0.5
+        while True:
+            with self._cond:
+                while not self._buf:
+                    self._cond.wait(timeout=self.flush_s)
+                # tunggu batch penuh atau dokumen tertua sudah flush_s
+                while len(self._buf) < self.max_batch:
+                    left = self._buf[0][0] + self.flush_s - time.monotonic()
+                    if left <= 0:
+                        break
+                    self._cond.wait(timeout=left)
+                    if not self._buf:
+                        break
+                docs = self._take()
+            if not docs:
+                continue
+            with self._flush_lock:
+                ok = self._write(docs)
+            if ok:
+                backoff = 0.5
+            else:
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 10.0)
+
+    def drain(self, timeout: float = 10.0) -> int:
+        """Tulis semua isi antrean sekarang; return jumlah dokumen yang masih tersisa."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._cond:
+                docs = self._take()
+            if not docs:
+                break
+            with self._flush_lock:
+                if not self._write(docs):
+                    time.sleep(0.5)
+        return self.depth
+
+request_wb = WriteBehindQueue("requests", col_requests, WRITE_BEHIND_BATCH, WRITE_BEHIND_FLUSH_S,
+                              WRITE_BEHIND_MAX_QUEUE, stamp_fields=("created_at", "updated_at")) if WRITE_BEHIND else None
+chat_wb = WriteBehindQueue("chat", col_chat, WRITE_BEHIND_BATCH, WRITE_BEHIND_FLUSH_S,
+                           WRITE_BEHIND_MAX_QUEUE) if WRITE_BEHIND else None
+
+def drain_write_behind(timeout: float = 10.0) -> int:
+    left = 0
+    for q in (request_wb, chat_wb):
+        if q is not None:
+            left += q.drain(timeout)
+    if left:
+        print(f"Write-behind: {left} dokumen belum tertulis saat shutdown.")
+    return left
+
+atexit.register(drain_write_behind)
+
+def _busy_response():
+    resp = jsonify({"ok": False, "error": "Server sedang sibuk. Coba lagi sebentar."})
+    resp.status_code = 503
+    resp.headers["Retry-After"] = "1"
+    return resp
 
 # ====== API: User Request Lagu ======
 @app.route("/api/request_song", methods=["POST"])
@@ -307,15 +2232,26 @@ def api_request_song():
     if len(norm) < 9:
         return jsonify({"ok": False, "error": "Nomor HP tidak valid."}), 400
 
+    now = datetime.now(timezone.utc)
+    title_norm = normalize_title(title)
     doc = {
         "name": name,
         "phone": phone,
         "title": title,
+        "title_norm": title_norm,
+        "title_fp": title_fingerprint(title_norm),
         "status": "New",
-        "created_at": datetime.now(timezone.utc)
+        "created_at": now,
+        "updated_at": now
     }
-    res = col_requests.insert_one(doc)
-    return jsonify({"ok": True, "id": str(res.inserted_id)})
+    if request_wb is not None:
+        if not request_wb.put(doc):
+            return _busy_response()
+    else:
+        col_requests.insert_one(doc)
+    new_count.add(1)
+    request_leaderboard.add(doc)
+    return jsonify({"ok": True, "id": str(doc["_id"])})
 
 # ====== ROUTES: Admin (Login/Logout + Halaman UI) ======
 @app.route("/admin/login", methods=["GET", "POST"])
@@ -367,47 +2303,431 @@ def admin_ytlinker_page():
     return render_template("admin/ytlinker.html")
 
 # ====== API Admin: Requests ======
+REQ_FIELDS = ("name", "phone", "title", "status", "created_at", "updated_at")
+REQ_PAGE_DEFAULT = 100
+REQ_PAGE_MAX = 500
+REQ_DELTA_OVERLAP = timedelta(seconds=5)  # jaga-jaga tulisan yang commit-nya telat
+
+def _request_item(d: dict, fields) -> dict:
+    item = {"_id": str(d["_id"])}
+    for f in fields:
+        if f == "created_at":
+            item[f] = to_utc_iso(d.get("created_at"))
+        elif f == "updated_at":
+            item[f] = to_utc_iso(d.get("updated_at") or d.get("created_at"))
+        elif f == "status":
+            item[f] = d.get("status", "New")
+        else:
+            item[f] = d.get(f, "")
+    return item
+
+def _encode_keyset_cursor(dt: datetime, oid) -> str:
+    raw = f"{to_utc_iso(dt)}|{oid}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def _decode_keyset_cursor(cursor: str):
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+    iso, oid = raw.split("|", 1)
+    return datetime.fromisoformat(iso.replace("Z", "+00:00")), ObjectId(oid)
+
+def _keyset_before(field: str, dt: datetime, oid) -> dict:
+    """Filter "sebelum (dt, oid)" untuk urutan (field, _id) menurun."""
+    return {"$or": [{field: {"$lt": dt}}, {field: dt, "_id": {"$lt": oid}}]}
+
+def _keyset_after(field: str, dt: datetime, oid) -> dict:
+    """Filter "sesudah (dt, oid)" untuk urutan (field, _id) naik."""
+    return {"$or": [{field: {"$gt": dt}}, {field: dt, "_id": {"$gt": oid}}]}
+
+_MIN_OID = ObjectId("0" * 24)
+
+def _delta_cursor(dt: datetime) -> str:
+    # semua dokumen dengan waktu tepat `dt` ikut terkirim (oid terkecil)
+    return _encode_keyset_cursor(dt, _MIN_OID)
+
+def _decode_delta_since(value: str):
+    """since/updated_since: cursor dari next_since/next_updated_since, atau ISO biasa (format lama)."""
+    try:
+        return _as_utc(datetime.fromisoformat(value.replace("Z", "+00:00"))), None
+    except ValueError:
+        dt, oid = _decode_keyset_cursor(value)
+        return _as_utc(dt), oid
+
+def _encode_req_cursor(d: dict) -> str:
+    return _encode_keyset_cursor(d["created_at"], d["_id"])
+
+_decode_req_cursor = _decode_keyset_cursor
+
 @app.route("/api/admin/requests")
 @admin_required
 def admin_requests():
+    """
+    Param (semua opsional):
+      - status        : filter status
+      - limit         : jumlah item per halaman (default 100, maks 500)
+      - cursor        : next_cursor dari halaman sebelumnya (keyset created_at, _id)
+      - fields        : daftar field dipisah koma (default semua)
+      - since         : next_since sebelumnya (atau ISO); hanya request yang dibuat
+                        setelahnya (urut naik created_at, _id)
+      - updated_since : next_updated_since sebelumnya (atau ISO); request baru ATAU
+                        yang status-nya berubah setelahnya (urut naik updated_at, _id,
+                        filter status diabaikan supaya client tahu item yang keluar dari filter)
+    """
     status = request.args.get("status")
-    q = {}
-    if status:
-        q["status"] = status
-    items = []
-    for d in col_requests.find(q).sort("created_at", DESCENDING):
-        created_at = d.get("created_at")
-        items.append({
-            "_id": str(d["_id"]),
-            "name": d.get("name", ""),
-            "phone": d.get("phone", ""),
-            "title": d.get("title", ""),
-            "status": d.get("status", "New"),
-            "created_at": to_utc_iso(created_at)
+    try:
+        limit = int(request.args.get("limit", REQ_PAGE_DEFAULT))
+    except Exception:
+        limit = REQ_PAGE_DEFAULT
+    limit = max(1, min(limit, REQ_PAGE_MAX))
+
+    fields_arg = (request.args.get("fields") or "").strip()
+    fields = [f for f in (x.strip() for x in fields_arg.split(",")) if f in REQ_FIELDS] if fields_arg else list(REQ_FIELDS)
+    projection = {f: 1 for f in fields}
+    projection["created_at"] = 1  # dibutuhkan untuk cursor
+
+    since = request.args.get("since")
+    updated_since = request.args.get("updated_since")
+    now = datetime.now(timezone.utc)
+
+    if since or updated_since:
+        try:
+            dt, oid = _decode_delta_since(updated_since or since)
+        except Exception:
+            return jsonify({"ok": False, "error": "Format waktu/cursor tidak valid."}), 400
+        sort_key = "updated_at" if updated_since else "created_at"
+        projection[sort_key] = 1
+        q = {sort_key: {"$gt": dt}} if oid is None else _keyset_after(sort_key, dt, oid)
+        if status and not updated_since:
+            q = {"$and": [q, {"status": status}]}
+        docs = list(col_requests.find(q, projection).sort([(sort_key, ASCENDING), ("_id", ASCENDING)]).limit(limit))
+        items = [_request_item(d, fields) for d in docs]
+        if len(docs) == limit:
+            # masih ada sisa: lanjut tepat setelah (waktu, _id) item terakhir, tidak macet walau waktunya sama
+            nxt = _encode_keyset_cursor(docs[-1][sort_key], docs[-1]["_id"])
+        else:
+            nxt = _delta_cursor(now - REQ_DELTA_OVERLAP)
+        return jsonify({
+            "ok": True,
+            "items": items,
+            "has_more": len(docs) == limit,
+            "server_time": to_utc_iso(now),
+            "next_updated_since" if updated_since else "next_since": nxt,
         })
-    return jsonify({"ok": True, "items": items})
 
-@app.route("/api/admin/requests/<req_id>/status", methods=["POST"])
-@admin_required
-def admin_update_status(req_id):
-    data = request.get_json(silent=True) or {}
-    status = (data.get("status") or "").strip()
-    if status not in {"New", "In-Progress", "Done"}:
-        return jsonify({"ok": False, "error": "Status tidak valid."}), 400
-    try:
-        oid = ObjectId(req_id)
-    except Exception:
-        return jsonify({"ok": False, "error": "ID tidak valid."}), 400
-    result = col_requests.update_one({"_id": oid}, {"$set": {"status": status}})
-    if result.matched_count == 0:
-        return jsonify({"ok": False, "error": "ID tidak ditemukan."}), 404
-    return jsonify({"ok": True})
+    conds = []
+    if status:
+        conds.append({"status": status})
+    cursor = request.args.get("cursor")
+    if cursor:
+        try:
+            c_at, c_id = _decode_req_cursor(cursor)
+        except Exception:
+            return jsonify({"ok": False, "error": "Cursor tidak valid."}), 400
+        conds.append(_keyset_before("created_at", c_at, c_id))
+    q = {"$and": conds} if len(conds) > 1 else (conds[0] if conds else {})
+
+    docs = list(col_requests.find(q, projection)
+                .sort([("created_at", DESCENDING), ("_id", DESCENDING)])
+                .limit(limit + 1))
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    return jsonify({
+        "ok": True,
+        "items": [_request_item(d, fields) for d in docs],
+        "next_cursor": _encode_req_cursor(docs[-1]) if has_more and docs else None,
+        "server_time": to_utc_iso(now),
+        "next_updated_since": _delta_cursor(now - REQ_DELTA_OVERLAP),
+    })
+
+@app.route("/api/admin/requests/<req_id>/status", methods=["POST"])
+@admin_required
+def admin_update_status(req_id):
+    data = request.get_json(silent=True) or {}
+    status = (data.get("status") or "").strip()
+    if status not in {"New", "In-Progress", "Done"}:
+        return jsonify({"ok": False, "error": "Status tidak valid."}), 400
+    try:
+        oid = ObjectId(req_id)
+    except Exception:
+        return jsonify({"ok": False, "error": "ID tidak valid."}), 400
+    before = col_requests.find_one_and_update(
+        {"_id": oid},
+        {"$set": {"status": status, "updated_at": datetime.now(timezone.utc)}},
+        projection={"status": 1},
+        return_document=ReturnDocument.BEFORE,
+    )
+    if before is None:
+        return jsonify({"ok": False, "error": "ID tidak ditemukan."}), 404
+    prev = before.get("status", "New")
+    new_count.add(int(status == "New") - int(prev == "New"))
+    return jsonify({"ok": True})
+
+class NewCountTracker:
+    """
+    Jumlah request berstatus New, disimpan di memori dan diubah langsung
+    saat insert/ganti status. Dicocokkan ulang dengan count_documents tiap
+    NEW_COUNT_RECONCILE_S (tulisan dari worker lain ikut terhitung), dan
+    setiap perubahan didorong ke room Socket.IO "admin".
+    """
+
+    def __init__(self, reconcile_s: float):
+        self.reconcile_s = reconcile_s
+        self._lock = threading.Lock()
+        self._count = None
+        self._reconciled_at = 0.0
+
+    def get(self) -> int:
+        if self._count is None or time.monotonic() - self._reconciled_at > self.reconcile_s:
+            self.reconcile()
+        return self._count
+
+    def reconcile(self):
+        count = col_requests.count_documents({"status": "New"})
+        self._reconciled_at = time.monotonic()
+        self._set(lambda _: count)
+
+    def add(self, delta: int):
+        if delta and self._count is not None:
+            self._set(lambda c: max(0, c + delta))
+
+    def _set(self, fn):
+        with self._lock:
+            old = self._count
+            self._count = fn(old)
+            count = self._count
+        if count != old:
+            socketio.emit("requests:new_count", {"count": count}, to="admin")
+
+new_count = NewCountTracker(NEW_COUNT_RECONCILE_S)
+
+@app.route("/api/admin/requests/new_count")
+@admin_required
+def admin_new_count():
+    return jsonify({"ok": True, "count": new_count.get()})
+
+# ====== Top Request (dedupe judul + leaderboard per jendela waktu) ======
+# Saat request masuk, judul dinormalisasi (tanpa aksen, huruf kecil, isi
+# kurung & kata "noise" dibuang) lalu diberi fingerprint dari set token-nya.
+# Leaderboard per jendela (acara yang sedang tayang / hari ini WIB) disimpan
+# di memori: grup judul + inverted index token → grup. Judul yang set
+# tokennya subset/superset inti grup digabung ("mejikuhibiniu" ≈
+# "mejikuhibiniu tenxi"). Jendela dimuat sekali dari Mongo, lalu hanya
+# disinkron delta (created_at terbaru) supaya worker lain ikut terhitung.
+WIB = timezone(timedelta(hours=7))
+LEADERBOARD_SYNC_S = float(os.getenv("LEADERBOARD_SYNC_SECONDS", "10"))
+LEADERBOARD_MEMBER_CAP = int(os.getenv("LEADERBOARD_MEMBER_CAP", "500"))  # id per grup yang disimpan
+_TITLE_NOISE = frozenset((
+    "official", "video", "music", "musik", "lyric", "lyrics", "lirik", "audio", "mv", "hd", "hq",
+    "lagu", "judul", "req", "request", "tolong", "puterin", "putarin", "putar", "dong", "ya", "yg",
+    "feat", "ft", "featuring", "by", "oleh", "the", "and", "dan",
+))
+_RE_TITLE_BRACKETS = re.compile(r"[\(\[\{][^\)\]\}]*[\)\]\}]")
+_RE_TITLE_PUNCT = re.compile(r"[^\w\s]+")
+
+def normalize_title(title: str) -> str:
+    s = unicodedata.normalize("NFKD", title or "")
+    s = "".join(ch for ch in s if not unicodedata.combining(ch)).casefold()
+    s = _RE_TITLE_BRACKETS.sub(" ", s)
+    s = _RE_TITLE_PUNCT.sub(" ", s.replace("_", " "))
+    return " ".join(t for t in s.split() if t not in _TITLE_NOISE)
+
+def title_fingerprint(title_norm: str) -> str:
+    return hashlib.sha1(" ".join(sorted(set(title_norm.split()))).encode("utf-8")).hexdigest()[:16]
+
+def _strong_tokens(tokens: frozenset) -> bool:
+    # set kecil baru boleh jadi inti gabungan kalau cukup spesifik
+    return len(tokens) >= 2 or any(len(t) >= 5 for t in tokens)
+
+class _RequestWindow:
+    def __init__(self, key: str, start: datetime, end: datetime, meta: dict):
+        self.key, self.start, self.end, self.meta = key, start, end, meta
+        self.groups = {}    # gid -> {"core", "count", "ids", "titles"}
+        self.by_fp = {}     # fingerprint -> gid (jalur cepat judul identik)
+        self.index = {}     # token -> set(gid), token dari inti grup
+        self.seen = set()   # id request yang sudah dihitung
+        self.total = 0
+        self.watermark = start
+        self.synced_at = 0.0
+        self.syncing = False  # query Mongo sedang jalan (di luar lock)
+
+    def _containing(self, tokens: frozenset) -> set:
+        """Grup yang intinya memuat semua token ini."""
+        out = None
+        for t in tokens:
+            gids = self.index.get(t, set())
+            out = set(gids) if out is None else out & gids
+            if not out:
+                return set()
+        return out or set()
+
+    def _match(self, tokens: frozenset):
+        """
+        Return (gid, tumbuh). Judul yang lebih ringkas hanya ikut grup yang
+        intinya memuat judul itu, dan hanya kalau cuma satu grup yang cocok
+        ("Cinta" tidak boleh menyatukan dua lagu "Cinta ..."). Judul yang lebih
+        lengkap boleh menumbuhkan inti grup yang lebih ringkas asalkan inti itu
+        sendiri tidak cocok ke grup lain.
+        """
+        if not _strong_tokens(tokens):
+            return None, False
+        holders = self._containing(tokens)
+        if len(holders) == 1:
+            return next(iter(holders)), False
+        if holders:
+            return None, False  # ambigu
+        cands = set()
+        for t in tokens:
+            cands |= self.index.get(t, set())
+        subs = [gid for gid in cands
+                if self.groups[gid]["core"] < tokens and _strong_tokens(self.groups[gid]["core"])]
+        if len(subs) == 1 and len(self._containing(self.groups[subs[0]]["core"])) == 1:
+            return subs[0], True
+        return None, False
+
+    def add(self, rid: str, title: str, title_norm: str, fp: str, created_at: datetime):
+        if rid in self.seen:
+            return
+        self.seen.add(rid)
+        self.total += 1
+        if created_at > self.watermark:
+            self.watermark = created_at
+        tokens = frozenset(title_norm.split())
+        gid, grow = self.by_fp.get(fp), False
+        if gid is None and tokens:
+            gid, grow = self._match(tokens)
+        if gid is None:
+            gid = fp
+            self.groups[gid] = {"core": tokens, "count": 0, "ids": deque(maxlen=LEADERBOARD_MEMBER_CAP),
+                                "titles": {}}
+            for t in tokens:
+                self.index.setdefault(t, set()).add(gid)
+        g = self.groups[gid]
+        if grow:
+            # inti tidak pernah menyusut; judul yang lebih lengkap jadi inti baru
+            for t in tokens - g["core"]:
+                self.index.setdefault(t, set()).add(gid)
+            g["core"] = tokens
+        self.by_fp[fp] = gid
+        g["count"] += 1
+        g["ids"].append(rid)
+        label = " ".join(title.split())
+        g["titles"][label] = g["titles"].get(label, 0) + 1
+
+    def top(self, n: int, members: int) -> list:
+        out = []
+        for gid, g in heapq.nlargest(n, self.groups.items(), key=lambda kv: kv[1]["count"]):
+            variants = heapq.nlargest(5, g["titles"].items(), key=lambda kv: kv[1])
+            ids = list(g["ids"])
+            out.append({
+                "key": gid,
+                "label": variants[0][0] if variants else "",
+                "count": g["count"],
+                "titles": [{"title": t, "count": c} for t, c in variants],
+                "ids": ids[-members:][::-1] if members > 0 else [],
+            })
+        return out
+
+class RequestLeaderboard:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._windows = {}
+
+    @staticmethod
+    def _bounds(kind: str, now: datetime):
+        if kind == "today":
+            day = now.astimezone(WIB).replace(hour=0, minute=0, second=0, microsecond=0)
+            start = day.astimezone(timezone.utc)
+            return f"today:{day.date().isoformat()}", start, start + timedelta(days=1), \
+                {"kind": "today", "date": day.date().isoformat()}
+        if kind == "show":
+            show = current_show(now)  # sama dengan /api/schedules/now dan push jadwal
+            if show is None:
+                return None
+            return f"show:{show['_id']}", _iso_dt(show["start_time"]), _iso_dt(show["end_time"]), \
+                {"kind": "show", "schedule_id": show["_id"], "title": show["title"], "host": show["host"]}
+        raise ValueError(kind)
+
+    def _sync(self, w: _RequestWindow, since: datetime):
+        # dipanggil TANPA _lock: Mongo lambat tidak boleh menahan add() dari api_request_song
+        try:
+            docs = list(col_requests.find(
+                {"created_at": {"$gte": since, "$lt": w.end}},
+                {"title": 1, "title_norm": 1, "title_fp": 1, "created_at": 1},
+            ).sort("created_at", ASCENDING))
+        except Exception:
+            with self._lock:
+                w.syncing = False
+            raise
+        with self._lock:
+            for d in docs:
+                self._add_doc(w, d)  # id yang sudah masuk lewat add() dilewati (w.seen)
+            w.synced_at = time.monotonic()
+            w.syncing = False
 
-@app.route("/api/admin/requests/new_count")
+    @staticmethod
+    def _add_doc(w: _RequestWindow, d: dict):
+        title = d.get("title") or ""
+        norm = d.get("title_norm")
+        if norm is None:  # request lama sebelum ada normalisasi
+            norm = normalize_title(title)
+        fp = d.get("title_fp") or title_fingerprint(norm)
+        w.add(str(d["_id"]), title, norm, fp, _as_utc(d["created_at"]))
+
+    def window(self, kind: str, now: datetime = None):
+        now = now or datetime.now(timezone.utc)
+        bounds = self._bounds(kind, now)
+        if bounds is None:
+            return None
+        key, start, end, meta = bounds
+        with self._lock:
+            for k in [k for k, w in self._windows.items() if w.end <= now]:
+                del self._windows[k]  # jendela yang sudah lewat
+            w = self._windows.get(key)
+            if w is None:
+                w = self._windows[key] = _RequestWindow(key, start, end, meta)
+            since = None
+            if not w.syncing and time.monotonic() - w.synced_at > LEADERBOARD_SYNC_S:
+                w.syncing = True
+                since = max(w.start, w.watermark - REQ_DELTA_OVERLAP)
+        if since is not None:
+            self._sync(w, since)
+        return w
+
+    def add(self, doc: dict):
+        """Hitung request baru di jendela yang sudah dimuat (yang belum dimuat akan ambil dari Mongo)."""
+        ts = _as_utc(doc["created_at"])
+        with self._lock:
+            for w in self._windows.values():
+                if w.start <= ts < w.end:
+                    self._add_doc(w, doc)
+
+    def top(self, kind: str, n: int, members: int):
+        w = self.window(kind)
+        if w is None:
+            return None, 0, []
+        with self._lock:
+            return w.meta, w.total, w.top(n, members)
+
+request_leaderboard = RequestLeaderboard()
+
+@app.route("/api/admin/requests/top")
 @admin_required
-def admin_new_count():
-    count = col_requests.count_documents({"status": "New"})
-    return jsonify({"ok": True, "count": count})
+def admin_requests_top():
+    """
+    Query:
+      - window  : show (acara yang sedang tayang, default) | today (hari ini WIB)
+      - limit   : jumlah grup (default 10, maks 100)
+      - members : id request per grup yang dikirim (default 50)
+    """
+    kind = (request.args.get("window") or "show").lower()
+    if kind not in ("show", "today"):
+        return jsonify({"ok": False, "error": "window harus show atau today."}), 400
+    try:
+        limit = max(1, min(int(request.args.get("limit", 10)), 100))
+        members = max(0, min(int(request.args.get("members", 50)), LEADERBOARD_MEMBER_CAP))
+    except ValueError:
+        return jsonify({"ok": False, "error": "limit/members harus angka."}), 400
+    meta, total, groups = request_leaderboard.top(kind, limit, members)
+    return jsonify({"ok": True, "window": meta, "total": total, "groups": groups})
 
 # ====== API: Jadwal Siaran ======
 @app.route("/api/admin/schedules", methods=["GET", "POST"])
@@ -438,6 +2758,8 @@ def admin_schedules():
             "end_time": et.astimezone(timezone.utc),
         }
         ins = col_schedules.insert_one(doc)
+        schedule_index.add(doc)
+        push_schedule()
         return jsonify({"ok": True, "id": str(ins.inserted_id)})
 
     items = []
@@ -464,17 +2786,14 @@ def admin_schedule_delete(sid):
     res = col_schedules.delete_one({"_id": oid})
     if res.deleted_count == 0:
         return jsonify({"ok": False, "error": "ID tidak ditemukan."}), 404
+    schedule_index.remove(sid)
+    push_schedule()
     return jsonify({"ok": True})
 
 # Public now/upcoming
-@app.route("/api/schedules/now")
-def schedules_now():
-    now = datetime.now(timezone.utc)
-    d = col_schedules.find_one({"start_time": {"$lte": now}, "end_time": {"$gt": now}})
-    if not d:
-        return jsonify({"ok": True, "item": None})
+def _schedule_item(d: dict) -> dict:
     st = d.get("start_time"); et = d.get("end_time")
-    item = {
+    return {
         "_id": str(d["_id"]),
         "title": d.get("title", ""),
         "host": d.get("host", ""),
@@ -482,7 +2801,107 @@ def schedules_now():
         "start_time": to_utc_iso(st),
         "end_time": to_utc_iso(et),
     }
-    return jsonify({"ok": True, "item": item})
+
+def _as_utc(dt: datetime) -> datetime:
+    # PyMongo mengembalikan datetime naive (UTC)
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+class ScheduleIndex:
+    """
+    Index interval jadwal di memori, urut (start, end, _id).
+    - now      : semua interval aktif, lewat bisect + prefix-max end_time
+                 (tahan jadwal yang tumpang tindih).
+    - upcoming : N interval berikutnya (start >= sekarang) lewat bisect.
+    Dipatch saat admin menambah/menghapus, dan di-reload penuh tiap
+    SCHEDULE_INDEX_REFRESH_S supaya worker lain ikut sinkron.
+    Jadwal yang sudah selesai lebih dari sehari tidak dimuat.
+    """
+
+    KEEP_PAST = timedelta(days=1)
+
+    def __init__(self, refresh_s: float):
+        self.refresh_s = refresh_s
+        self._lock = threading.Lock()
+        self._entries = []   # (start, end, id, item)
+        self._starts = []
+        self._max_end = []
+        self._loaded_at = None
+
+    @staticmethod
+    def _entry(d: dict):
+        return (_as_utc(d["start_time"]), _as_utc(d["end_time"]), str(d["_id"]), _schedule_item(d))
+
+    def _rebuild(self, entries: list):
+        entries.sort(key=lambda e: e[:3])
+        starts = [e[0] for e in entries]
+        max_end, cur = [], None
+        for e in entries:
+            cur = e[1] if cur is None or e[1] > cur else cur
+            max_end.append(cur)
+        with self._lock:
+            self._entries, self._starts, self._max_end = entries, starts, max_end
+
+    def reload(self):
+        cutoff = datetime.now(timezone.utc) - self.KEEP_PAST
+        docs = col_schedules.find({"end_time": {"$gt": cutoff}})
+        self._rebuild([self._entry(d) for d in docs])
+        self._loaded_at = time.monotonic()
+
+    def _fresh(self):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_s:
+            self.reload()
+        with self._lock:
+            return self._entries, self._starts, self._max_end
+
+    def add(self, doc: dict):
+        if self._loaded_at is None:
+            return
+        with self._lock:
+            entries = list(self._entries)
+        entries.append(self._entry(doc))
+        self._rebuild(entries)
+
+    def remove(self, sid: str):
+        if self._loaded_at is None:
+            return
+        with self._lock:
+            entries = [e for e in self._entries if e[2] != sid]
+        self._rebuild(entries)
+
+    def active(self, now: datetime) -> list:
+        entries, starts, max_end = self._fresh()
+        i = bisect.bisect_right(starts, now) - 1
+        out = []
+        while i >= 0 and max_end[i] > now:
+            if entries[i][1] > now:
+                out.append(entries[i][3])
+            i -= 1
+        out.reverse()
+        return out
+
+    def upcoming(self, now: datetime, limit: int) -> list:
+        entries, starts, _ = self._fresh()
+        i = bisect.bisect_left(starts, now)
+        return [e[3] for e in entries[i:i + limit]]
+
+schedule_index = ScheduleIndex(SCHEDULE_INDEX_REFRESH_S)
+
+def current_show(now: datetime = None):
+    """Acara yang sedang tayang; kalau jadwal tumpang tindih, yang mulai paling awal (urutan index)."""
+    active = schedule_index.active(now or datetime.now(timezone.utc))
+    return active[0] if active else None
+
+def get_schedule_now():
+    return current_show()
+
+def get_schedule_upcoming(limit: int) -> list:
+    return schedule_index.upcoming(datetime.now(timezone.utc), limit)
+
+@app.route("/api/schedules/now")
+def schedules_now():
+    now = datetime.now(timezone.utc)
+    payload = {"ok": True, "item": current_show(now), "items": schedule_index.active(now)}
+    return json_with_etag(payload, etag_for(payload))
 
 @app.route("/api/schedules/upcoming")
 def schedules_upcoming():
@@ -491,21 +2910,236 @@ def schedules_upcoming():
     except Exception:
         limit = 5
     limit = max(1, min(limit, 50))
-    now = datetime.now(timezone.utc)
-    items = []
-    for d in col_schedules.find({"start_time": {"$gte": now}}).sort("start_time", ASCENDING).limit(limit):
-        st = d.get("start_time"); et = d.get("end_time")
-        items.append({
-            "_id": str(d["_id"]),
-            "title": d.get("title", ""),
-            "host": d.get("host", ""),
-            "description": d.get("description", ""),
-            "start_time": to_utc_iso(st),
-            "end_time": to_utc_iso(et),
-        })
-    return jsonify({"ok": True, "items": items})
+    payload = {"ok": True, "items": get_schedule_upcoming(limit)}
+    return json_with_etag(payload, etag_for(payload))
+
+# ====== Statistik Pendengar (time series) ======
+# Sampler membaca snapshot stats_poller tiap LISTENER_SAMPLE_S lalu menulis:
+#   res=raw    : satu dokumen per jam {t, samples:[{t, n, np}]}, disimpan singkat
+#   res=minute/hour/day : rollup {t, min, max, sum, count, np} lewat upsert
+#                $min/$max/$inc, jadi tidak pernah perlu membaca ulang sampel raw.
+# Tiap resolusi kedaluwarsa sendiri lewat expire_at (0 hari = simpan selamanya).
+LISTENER_SAMPLE_S = float(os.getenv("LISTENER_SAMPLE_SECONDS", "15"))
+LISTENER_RETENTION_DAYS = {
+    "raw": float(os.getenv("LISTENER_RAW_RETENTION_DAYS", "2")),
+    "minute": float(os.getenv("LISTENER_MINUTE_RETENTION_DAYS", "14")),
+    "hour": float(os.getenv("LISTENER_HOUR_RETENTION_DAYS", "400")),
+    "day": float(os.getenv("LISTENER_DAY_RETENTION_DAYS", "0")),
+}
+LISTENER_MAX_POINTS = int(os.getenv("LISTENER_MAX_POINTS", "5000"))
+_ROLLUP_STEPS = {"minute": timedelta(minutes=1), "hour": timedelta(hours=1), "day": timedelta(days=1)}
+
+def _floor_time(dt: datetime, res: str) -> datetime:
+    if res == "minute":
+        return dt.replace(second=0, microsecond=0)
+    if res in ("hour", "raw"):
+        return dt.replace(minute=0, second=0, microsecond=0)
+    return dt.replace(hour=0, minute=0, second=0, microsecond=0)  # day (UTC)
+
+def _listener_expiry(res: str, t: datetime) -> dict:
+    days = LISTENER_RETENTION_DAYS[res]
+    return {"expire_at": t + timedelta(days=days)} if days > 0 else {}
+
+def record_listener_sample(n: int, now_playing: str, now: datetime = None) -> bool:
+    """
+    Simpan satu sampel + update rollup. Waktu sampel dibulatkan ke kelipatan
+    LISTENER_SAMPLE_S supaya kalau beberapa worker sampling bersamaan, hanya
+    satu yang tercatat (sisanya kena unique index). True kalau tercatat.
+    """
+    now = now or datetime.now(timezone.utc)
+    step = max(1, int(LISTENER_SAMPLE_S))
+    ts = datetime.fromtimestamp(int(now.timestamp()) // step * step, timezone.utc)
+    hour = _floor_time(ts, "raw")
+    try:
+        col_listeners.update_one(
+            {"res": "raw", "t": hour, "samples.t": {"$ne": ts}},
+            {"$push": {"samples": {"t": ts, "n": n, "np": now_playing}},
+             "$setOnInsert": _listener_expiry("raw", hour)},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        return False  # sampel di detik ini sudah dicatat worker lain
+
+    ops = []
+    for res in _ROLLUP_STEPS:
+        t = _floor_time(ts, res)
+        update = {"$min": {"min": n}, "$max": {"max": n}, "$inc": {"sum": n, "count": 1},
+                  "$set": {"np": now_playing}}
+        exp = _listener_expiry(res, t)
+        if exp:
+            update["$setOnInsert"] = exp
+        ops.append(UpdateOne({"res": res, "t": t}, update, upsert=True))
+    col_listeners.bulk_write(ops, ordered=False)
+    return True
+
+def _listener_sampler():
+    while True:
+        socketio.sleep(LISTENER_SAMPLE_S)
+        try:
+            payload, _, _ = stats_poller.snapshot()
+            record_listener_sample(int(payload.get("listeners") or 0), payload.get("now_playing") or "-")
+        except Exception as e:
+            print("Listener sampler error:", e)
+
+def _listener_point(d: dict) -> dict:
+    count = d.get("count") or 0
+    return {
+        "t": to_utc_iso(d["t"]),
+        "min": d.get("min"), "max": d.get("max"),
+        "avg": round(d.get("sum", 0) / count, 2) if count else None,
+        "samples": count,
+        "now_playing": d.get("np"),
+    }
+
+def listener_series(res: str, start: datetime, end: datetime) -> list:
+    """Titik time series [start, end) pada resolusi tertentu (urut waktu)."""
+    if res == "raw":
+        points = []
+        for d in col_listeners.find({"res": "raw", "t": {"$gte": _floor_time(start, "raw"), "$lt": end}}).sort("t", ASCENDING):
+            for smp in d.get("samples") or []:
+                t = _as_utc(smp["t"])
+                if start <= t < end:
+                    points.append({"t": to_utc_iso(t), "listeners": smp.get("n"), "now_playing": smp.get("np")})
+        return points[:LISTENER_MAX_POINTS]
+    cur = (col_listeners.find({"res": res, "t": {"$gte": _floor_time(start, res), "$lt": end}}, {"_id": 0, "res": 0})
+           .sort("t", ASCENDING).limit(LISTENER_MAX_POINTS))
+    return [_listener_point(d) for d in cur]
+
+def _pick_listener_res(start: datetime, end: datetime) -> str:
+    span = end - start
+    if span <= timedelta(hours=6):
+        return "minute"
+    if span <= timedelta(days=31):
+        return "hour"
+    return "day"
+
+def _listener_range():
+    """from/to dari query (default: 24 jam terakhir); ValueError kalau format salah."""
+    end = _parse_export_bound(request.args.get("to"), end=True) or datetime.now(timezone.utc)
+    start = _parse_export_bound(request.args.get("from")) or end - timedelta(hours=24)
+    if start >= end:
+        raise ValueError("from harus sebelum to")
+    return start, end
+
+@app.route("/api/admin/listeners", methods=["GET"])
+@admin_required
+def admin_listener_series():
+    """
+    Query: from, to ('YYYY-MM-DD' / ISO), res = raw | minute | hour | day
+    (default dipilih dari panjang rentang).
+    """
+    try:
+        start, end = _listener_range()
+    except ValueError:
+        return jsonify({"ok": False, "error": "Rentang from/to tidak valid."}), 400
+    res = (request.args.get("res") or _pick_listener_res(start, end)).lower()
+    if res not in ("raw", "minute", "hour", "day"):
+        return jsonify({"ok": False, "error": "res harus raw, minute, hour, atau day."}), 400
+    points = listener_series(res, start, end)
+    return jsonify({"ok": True, "res": res, "from": to_utc_iso(start), "to": to_utc_iso(end),
+                    "points": points, "truncated": len(points) >= LISTENER_MAX_POINTS})
+
+@app.route("/api/admin/listeners/programs", methods=["GET"])
+@admin_required
+def admin_listener_programs():
+    """
+    Audiens per acara: jadwal di col_schedules yang tumpang tindih [from, to)
+    digabung dengan rollup per menit (atau per jam kalau rentang sudah lewat
+    retensi menit). Hasil per tayangan dan ringkasan per judul acara.
+    """
+    try:
+        start, end = _listener_range()
+    except ValueError:
+        return jsonify({"ok": False, "error": "Rentang from/to tidak valid."}), 400
+    minute_days = LISTENER_RETENTION_DAYS["minute"]
+    res = "minute"
+    if minute_days > 0 and start < datetime.now(timezone.utc) - timedelta(days=minute_days):
+        res = "hour"
+
+    shows = list(col_schedules.find({"start_time": {"$lt": end}, "end_time": {"$gt": start}})
+                 .sort("start_time", ASCENDING))
+    if not shows:
+        return jsonify({"ok": True, "res": res, "shows": [], "programs": []})
+    lo = min(_as_utc(d["start_time"]) for d in shows)
+    hi = max(_as_utc(d["end_time"]) for d in shows)
+    buckets = list(col_listeners.find({"res": res, "t": {"$gte": _floor_time(lo, res), "$lt": hi}},
+                                      {"_id": 0, "t": 1, "min": 1, "max": 1, "sum": 1, "count": 1})
+                   .sort("t", ASCENDING))
+    times = [_as_utc(b["t"]) for b in buckets]
+    step = _ROLLUP_STEPS[res]
+
+    out_shows, per_title = [], {}
+    for d in shows:
+        st, et = _as_utc(d["start_time"]), _as_utc(d["end_time"])
+        i = bisect.bisect_left(times, _floor_time(st, res))
+        j = bisect.bisect_left(times, et)
+        sel = buckets[i:j]
+        total = sum(b.get("sum", 0) for b in sel)
+        count = sum(b.get("count", 0) for b in sel)
+        peak = max((b.get("max", 0) for b in sel), default=None)
+        avg = round(total / count, 2) if count else None
+        item = dict(_schedule_item(d), avg_listeners=avg, peak_listeners=peak,
+                    low_listeners=min((b.get("min", 0) for b in sel), default=None),
+                    covered_minutes=round(len(sel) * step.total_seconds() / 60))
+        out_shows.append(item)
+        agg = per_title.setdefault(item["title"] or "-", {"title": item["title"] or "-", "shows": 0,
+                                                          "sum": 0, "count": 0, "peak": None})
+        agg["shows"] += 1
+        agg["sum"] += total
+        agg["count"] += count
+        if peak is not None and (agg["peak"] is None or peak > agg["peak"]):
+            agg["peak"] = peak
+
+    programs = [{
+        "title": a["title"], "shows": a["shows"],
+        "avg_listeners": round(a["sum"] / a["count"], 2) if a["count"] else None,
+        "peak_listeners": a["peak"],
+    } for a in per_title.values()]
+    programs.sort(key=lambda p: (p["avg_listeners"] is None, -(p["avg_listeners"] or 0)))
+    return jsonify({"ok": True, "res": res, "from": to_utc_iso(start), "to": to_utc_iso(end),
+                    "shows": out_shows, "programs": programs})
 
 # ====== API: Chat Global ======
+def _chat_public_item(d: dict) -> dict:
+    ts = d.get("ts") or datetime.now(timezone.utc)
+    return {
+        "_id": str(d["_id"]),
+        "name": d.get("name") or "Anon",
+        "text": d.get("text") or "",
+        "ts": to_utc_iso(ts),
+        "flagged": bool(d.get("flagged", False))
+    }
+
+# Poll chat: N pesan terbaru dibaca dari Mongo sekali per CHAT_POLL_CACHE_SECONDS per worker
+# lalu dibagi semua poll (single-flight). Pesan/hapus dari worker lain terlihat paling
+# lambat setelah TTL ini; kirim lewat worker ini langsung masuk jendela (TTL tidak diperpanjang),
+# hapus membuang jendela. 0 = mati.
+CHAT_POLL_CACHE_S = float(os.getenv("CHAT_POLL_CACHE_SECONDS", "1"))
+CHAT_POLL_WINDOW = 200  # = batas `limit` poll
+_chat_poll_cache = TTLCache(1, CHAT_POLL_CACHE_S)
+_chat_poll_flight = SingleFlight()
+_chat_poll_lock = threading.Lock()
+
+def _chat_poll_window() -> list:
+    """[(ts, item)] urut naik, maks CHAT_POLL_WINDOW pesan terbaru."""
+    box = _chat_poll_cache.get("latest")
+    if box is not None:
+        return box["items"]
+
+    def load():
+        docs = list(col_chat.find({}).sort("ts", DESCENDING).limit(CHAT_POLL_WINDOW))
+        box = {"items": [(_as_utc(d["ts"]), _chat_public_item(d)) for d in reversed(docs) if d.get("ts")]}
+        _chat_poll_cache.set("latest", box)
+        return box
+    return _chat_poll_flight.do("latest", load)["items"]
+
+def _chat_poll_push(ts: datetime, item: dict):
+    box = _chat_poll_cache.get("latest")
+    if box is None:
+        return
+    with _chat_poll_lock:
+        box["items"] = (box["items"] + [(ts, item)])[-CHAT_POLL_WINDOW:]
+
 @app.route("/api/chat/messages")
 def chat_messages():
     since = request.args.get("since")
@@ -515,24 +3149,26 @@ def chat_messages():
         limit = 50
 
     q = {}
+    dt = None
     if since:
         try:
-            dt = datetime.fromisoformat(since.replace("Z", "+00:00"))
+            dt = _as_utc(datetime.fromisoformat(since.replace("Z", "+00:00")))
             q["ts"] = {"$gt": dt}
         except Exception:
             pass
 
+    window = _chat_poll_window() if CHAT_POLL_CACHE_S > 0 else None
+    if window is not None:
+        if dt is None and not since:
+            return jsonify({"ok": True, "items": [it for _, it in window[-limit:]]})
+        # jendela memuat semua pesan setelah `since` bila belum penuh atau pesan tertuanya <= since
+        if dt is not None and (len(window) < CHAT_POLL_WINDOW or window[0][0] <= dt):
+            items = [it for ts, it in window if ts > dt][:limit]
+            return jsonify({"ok": True, "items": items})
+
+    # selalu dari Mongo (index ts): ring per proses tidak melihat pesan/hapus dari worker lain
     cursor = col_chat.find(q).sort("ts", ASCENDING if since else DESCENDING).limit(limit)
-    items = []
-    for d in cursor:
-        ts = d.get("ts") or datetime.now(timezone.utc)
-        items.append({
-            "_id": str(d["_id"]),
-            "name": d.get("name") or "Anon",
-            "text": d.get("text") or "",
-            "ts": to_utc_iso(ts),
-            "flagged": bool(d.get("flagged", False))
-        })
+    items = [_chat_public_item(d) for d in cursor]
     if not since:
         items.reverse()
     return jsonify({"ok": True, "items": items})
@@ -549,11 +3185,11 @@ def chat_send():
         return jsonify({"ok": False, "error": "Pesan terlalu panjang (maks 500)."}), 400
 
     ip = get_client_ip()
-    if not check_rate_limit(ip):
+    if not rate_limiter.allow(ip):
         return jsonify({"ok": False, "error": "Terlalu sering mengirim. Coba lagi sebentar."}), 429
-    add_rate_event(ip)
 
-    flagged = is_bad(text)
+    bad_terms = moderation.match(text)
+    flagged = bool(bad_terms)
     doc = {
         "ip": ip,
         "name": (name[:60] if name else "Anon"),
@@ -561,35 +3197,192 @@ def chat_send():
         "ts": datetime.now(timezone.utc),
         "flagged": flagged,
     }
-    col_chat.insert_one(doc)
-    return jsonify({"ok": True})
+    if flagged:
+        doc["flag_terms"] = bad_terms
+    if chat_wb is not None:
+        if not chat_wb.put(doc):
+            return _busy_response()
+    else:
+        col_chat.insert_one(doc)
+    item = _chat_public_item(doc)
+    _chat_poll_push(doc["ts"], item)
+    chat_ring.append(item)
+    socketio.emit("chat:message", item, to="chat")
+    return jsonify({"ok": True, "item": item})
+
+# ====== Retensi Chat (hot → arsip per jam) ======
+# col_chat hanya menyimpan pesan CHAT_HOT_HOURS terakhir. Pesan lebih lama
+# dipindah ke col_chat_arch, satu dokumen per pesan dengan _id yang sama plus
+# bucket (awal jam UTC) dan expire_at. Insert ber-_id sama ditolak sebagai
+# duplikat, jadi pemindahan aman diulang (proses mati di tengah jalan, atau
+# beberapa worker mengarsip bersamaan) dan tidak ada dokumen yang tumbuh
+# melewati batas 16 MB seperti bucket per jam.
+CHAT_HOT_HOURS = float(os.getenv("CHAT_HOT_HOURS", "24"))
+CHAT_ARCHIVE_TTL_DAYS = float(os.getenv("CHAT_ARCHIVE_TTL_DAYS", "365"))  # 0 = simpan selamanya
+CHAT_ARCHIVE_INTERVAL_S = float(os.getenv("CHAT_ARCHIVE_INTERVAL_SECONDS", "300"))
+CHAT_ARCHIVE_BATCH = int(os.getenv("CHAT_ARCHIVE_BATCH", "1000"))
+
+def _iso_dt(s: str) -> datetime:
+    return datetime.fromisoformat(s.replace("Z", "+00:00"))
+
+def _chat_bucket(ts: datetime) -> datetime:
+    return _as_utc(ts).replace(minute=0, second=0, microsecond=0)
+
+def _chat_archive_doc(d: dict) -> dict:
+    e = {
+        "_id": d["_id"], "ts": d.get("ts"),
+        "name": d.get("name") or "Anon", "text": d.get("text") or "",
+        "ip": d.get("ip", ""), "flagged": bool(d.get("flagged", False)),
+        "bucket": _chat_bucket(d["ts"]),
+    }
+    if d.get("flag_terms"):
+        e["flag_terms"] = d["flag_terms"]
+    if CHAT_ARCHIVE_TTL_DAYS > 0:
+        e["expire_at"] = e["bucket"] + timedelta(days=CHAT_ARCHIVE_TTL_DAYS)
+    return e
+
+def _insert_archive_docs(docs: list):
+    try:
+        col_chat_arch.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        # duplikat _id = sudah diarsip sebelumnya; error lain tetap dilempar
+        if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+            raise
+
+_chat_archive_migrated = False
+
+def _migrate_chat_archive_buckets():
+    """Format lama (satu dokumen per jam berisi array messages) → dokumen per pesan."""
+    global _chat_archive_migrated
+    if _chat_archive_migrated:
+        return
+    for bucket in col_chat_arch.find({"messages": {"$exists": True}}):
+        msgs = [m for m in bucket.get("messages") or [] if m.get("ts")]
+        if msgs:
+            _insert_archive_docs([_chat_archive_doc(m) for m in msgs])
+        col_chat_arch.delete_one({"_id": bucket["_id"]})
+    _chat_archive_migrated = True
+
+def archive_chat_once(now: datetime = None) -> int:
+    """Pindahkan pesan yang lebih tua dari CHAT_HOT_HOURS ke arsip; return jumlah yang dipindah."""
+    _migrate_chat_archive_buckets()
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(hours=CHAT_HOT_HOURS)
+    moved = 0
+    while True:
+        docs = list(col_chat.find({"ts": {"$lt": cutoff}}).sort("ts", ASCENDING).limit(CHAT_ARCHIVE_BATCH))
+        if not docs:
+            break
+        _insert_archive_docs([_chat_archive_doc(d) for d in docs])
+        col_chat.delete_many({"_id": {"$in": [d["_id"] for d in docs]}})
+        moved += len(docs)
+        if len(docs) < CHAT_ARCHIVE_BATCH:
+            break
+    return moved
+
+def _chat_archiver():
+    while True:
+        try:
+            archive_chat_once()
+        except Exception as e:
+            print("Chat archive error:", e)
+        socketio.sleep(CHAT_ARCHIVE_INTERVAL_S)
+
+def iter_chat_archive(before: datetime = None, after: datetime = None, newest_first: bool = True,
+                      flagged_only: bool = False, pattern=None, before_key: tuple = None):
+    """
+    Iterasi pesan arsip (dict seperti dokumen chat) berurutan (ts, _id).
+    before_key=(ts, _id): hanya pesan sebelum kunci itu (lanjutan halaman, urutan menurun).
+    """
+    q = {}
+    if before_key is not None:
+        q.update(_keyset_before("ts", *before_key))
+    rng = {}
+    if before:
+        rng["$lt"] = before
+    if after:
+        rng["$gte"] = after
+    if rng:
+        q["ts"] = rng
+    if flagged_only:
+        q["flagged"] = True
+    if pattern is not None:
+        q["text"] = {"$regex": pattern.pattern, "$options": "i"}
+    direction = DESCENDING if newest_first else ASCENDING
+    with col_chat_arch.find(q).sort([("ts", direction), ("_id", direction)]).batch_size(EXPORT_BATCH) as cur:
+        yield from cur
 
 # ====== API: Moderasi Chat (Admin) ======
+def _chat_admin_item(d: dict, archived: bool = False) -> dict:
+    ts = d.get("ts") or datetime.now(timezone.utc)
+    return {
+        "_id": str(d["_id"]),
+        "name": d.get("name") or "Anon",
+        "text": d.get("text") or "",
+        "ip": d.get("ip", ""),
+        "flagged": bool(d.get("flagged", False)),
+        "flag_terms": d.get("flag_terms", []),
+        "ts": to_utc_iso(ts),
+        "archived": archived,
+    }
+
 @app.route("/api/admin/chat", methods=["GET"])
 @admin_required
 def admin_chat_list():
+    """
+    Query:
+      - limit (maks 500), flagged=1
+      - q      : cari teks (tanpa beda huruf besar/kecil)
+      - cursor : next_cursor dari halaman sebelumnya (keyset ts, _id)
+      - before : ISO; hanya pesan sebelum waktu ini
+    Urut (ts, _id) menurun. Hasil dari koleksi hot dulu; kalau belum cukup,
+    lanjut ke arsip mulai dari kunci pesan terakhir yang sudah didapat.
+    """
     try:
         limit = min(int(request.args.get("limit", 100)), 500)
     except Exception:
         limit = 100
     flagged_only = request.args.get("flagged") == "1"
+    text_q = (request.args.get("q") or "").strip()
+    pattern = re.compile(re.escape(text_q), re.IGNORECASE) if text_q else None
+    before = None
+    if request.args.get("before"):
+        try:
+            before = _as_utc(_iso_dt(request.args["before"]))
+        except ValueError:
+            return jsonify({"ok": False, "error": "Parameter before tidak valid."}), 400
+    key = None
+    if request.args.get("cursor"):
+        try:
+            key = _decode_keyset_cursor(request.args["cursor"])
+        except Exception:
+            return jsonify({"ok": False, "error": "Cursor tidak valid."}), 400
 
-    q = {}
+    conds = []
     if flagged_only:
-        q["flagged"] = True
+        conds.append({"flagged": True})
+    if pattern is not None:
+        conds.append({"text": {"$regex": pattern.pattern, "$options": "i"}})
+    if before:
+        conds.append({"ts": {"$lt": before}})
+    if key:
+        conds.append(_keyset_before("ts", *key))
+    q = {"$and": conds} if len(conds) > 1 else (conds[0] if conds else {})
 
-    items = []
-    for d in col_chat.find(q).sort("ts", DESCENDING).limit(limit):
-        ts = d.get("ts") or datetime.now(timezone.utc)
-        items.append({
-            "_id": str(d["_id"]),
-            "name": d.get("name") or "Anon",
-            "text": d.get("text") or "",
-            "ip": d.get("ip", ""),
-            "flagged": bool(d.get("flagged", False)),
-            "ts": to_utc_iso(ts)
-        })
-    return jsonify({"ok": True, "items": items})
+    docs = [(d, False) for d in col_chat.find(q).sort([("ts", DESCENDING), ("_id", DESCENDING)]).limit(limit + 1)]
+    if len(docs) <= limit:
+        # lanjut ke arsip dari kunci (ts, _id) terakhir → pesan dengan ts sama tidak terlewat
+        last = (docs[-1][0]["ts"], docs[-1][0]["_id"]) if docs else key
+        for m in iter_chat_archive(before=before, flagged_only=flagged_only, pattern=pattern, before_key=last):
+            docs.append((m, True))
+            if len(docs) > limit:
+                break
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    return jsonify({
+        "ok": True,
+        "items": [_chat_admin_item(d, archived=arch) for d, arch in docs],
+        "next_cursor": _encode_keyset_cursor(docs[-1][0]["ts"], docs[-1][0]["_id"]) if has_more else None,
+    })
 
 @app.route("/api/admin/chat/<cid>", methods=["DELETE"])
 @admin_required
@@ -600,9 +3393,108 @@ def admin_chat_delete(cid):
         return jsonify({"ok": False, "error": "ID tidak valid."}), 400
     res = col_chat.delete_one({"_id": oid})
     if res.deleted_count == 0:
-        return jsonify({"ok": False, "error": "Pesan tidak ditemukan."}), 404
+        res = col_chat_arch.delete_one({"_id": oid})
+        if res.deleted_count == 0:
+            return jsonify({"ok": False, "error": "Pesan tidak ditemukan."}), 404
+    _chat_poll_cache.pop("latest")
+    chat_ring.remove(cid)
+    socketio.emit("chat:delete", {"_id": cid}, to="chat")
     return jsonify({"ok": True})
 
+# ====== Urutan Playlist: sort_key fraksional ======
+# sort_key berupa string base-62 yang diurutkan leksikografis (urutan byte
+# Mongo). Menyisipkan item di antara dua item cukup membuat kunci di antara
+# kunci tetangganya → hanya satu dokumen yang berubah. Kalau kunci makin
+# panjang (atau masih kunci angka lama), satu hari di-rebalance sekaligus.
+_KEY_DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+PLAYLIST_KEY_MAX_LEN = int(os.getenv("PLAYLIST_KEY_MAX_LEN", "12"))
+PLAYLIST_REBALANCE_S = float(os.getenv("PLAYLIST_REBALANCE_SECONDS", "3600"))
+
+def _key_midpoint(a: str, b: str | None) -> str:
+    # a dan b dibaca sebagai pecahan 0.a dan 0.b (tanpa nol di belakang)
+    if b:
+        n = 0
+        while n < len(b) and (a[n] if n < len(a) else "0") == b[n]:
+            n += 1
+        if n > 0:
+            return b[:n] + _key_midpoint(a[n:], b[n:])
+    da = _KEY_DIGITS.index(a[0]) if a else 0
+    db = _KEY_DIGITS.index(b[0]) if b else len(_KEY_DIGITS)
+    if db - da > 1:
+        return _KEY_DIGITS[(da + db + 1) // 2]
+    if b and len(b) > 1:
+        return b[:1]
+    return _KEY_DIGITS[da] + _key_midpoint(a[1:], None)
+
+def _key_after(a: str) -> str:
+    # naikkan digit pertama yang belum maksimum: menambah item di akhir terus-menerus
+    # cuma memanjangkan kunci satu karakter tiap ~31 item (bukan tiap ~5 kalau dibagi dua)
+    for i, ch in enumerate(a):
+        d = _KEY_DIGITS.index(ch)
+        if d < len(_KEY_DIGITS) - 1:
+            return a[:i] + _KEY_DIGITS[d + 1]
+    return a + _KEY_DIGITS[len(_KEY_DIGITS) // 2]
+
+def key_between(a: str | None, b: str | None) -> str:
+    """Kunci baru yang urut di antara a dan b; None = ujung awal/akhir."""
+    a = a or ""
+    if b is not None and a >= b:
+        raise ValueError("urutan kunci tidak valid")
+    if b is None and a:
+        return _key_after(a)
+    return _key_midpoint(a, b)
+
+def spread_keys(n: int) -> list:
+    """n kunci berjarak rata (dipakai saat reorder penuh / rebalance)."""
+    base = len(_KEY_DIGITS)
+    width = 1
+    while base ** width < (n + 1) * 4:
+        width += 1
+    step = base ** width / (n + 1)
+    keys = []
+    for i in range(1, n + 1):
+        v = int(round(i * step))
+        digits = []
+        for _ in range(width):
+            v, r = divmod(v, base)
+            digits.append(_KEY_DIGITS[r])
+        keys.append("".join(reversed(digits)).rstrip("0"))
+    return keys
+
+def _last_playlist_key(day: int, col=None):
+    col = col if col is not None else col_playlist
+    last = col.find_one({"day": day}, {"sort_key": 1}, sort=[("sort_key", DESCENDING)])
+    key = (last or {}).get("sort_key")
+    # kunci angka lama selalu urut sebelum string (urutan tipe BSON)
+    return key if isinstance(key, str) else None
+
+def playlist_day_needs_rebalance(day: int, col=None) -> bool:
+    col = col if col is not None else col_playlist
+    return col.find_one({"day": day, "$or": [
+        {"sort_key": {"$not": {"$type": "string"}}},
+        {"sort_key": {"$regex": "^.{%d,}" % (PLAYLIST_KEY_MAX_LEN + 1)}},
+    ]}, {"_id": 1}) is not None
+
+def rebalance_playlist_day(day: int, col=None) -> int:
+    """Beri ulang kunci berjarak rata untuk satu hari, satu bulk_write berurutan."""
+    col = col if col is not None else col_playlist
+    docs = list(col.find({"day": day}, {"_id": 1}).sort([("sort_key", ASCENDING), ("start_hhmm", ASCENDING)]))
+    if not docs:
+        return 0
+    ops = [UpdateOne({"_id": d["_id"]}, {"$set": {"sort_key": k}}) for d, k in zip(docs, spread_keys(len(docs)))]
+    col.bulk_write(ops, ordered=True)
+    return len(ops)
+
+def _playlist_rebalancer():
+    while True:
+        socketio.sleep(PLAYLIST_REBALANCE_S)
+        for day in range(7):
+            try:
+                if playlist_day_needs_rebalance(day):
+                    rebalance_playlist_day(day)
+            except Exception as e:
+                print("Playlist rebalance error:", e)
+
 # ====== API: Playlist (Admin ONLY) ======
 # Model: { _id, day(0=Senin..6=Minggu), start_hhmm, end_hhmm, program, tracks, sort_key }
 @app.route("/api/admin/playlist", methods=["GET", "POST"])
@@ -638,10 +3530,8 @@ def admin_playlist():
         if e_min <= s_min:
             return jsonify({"ok": False, "error": "Selesai harus setelah Mulai."}), 400
 
-        # hitung sort_key berikutnya untuk hari tsb
-        last_doc = col_playlist.find({"day": day}).sort("sort_key", DESCENDING).limit(1)
-        last_doc = next(last_doc, None)
-        next_key = (int(last_doc.get("sort_key", -1)) + 1) if last_doc else 0
+        # sort_key setelah item terakhir hari tsb (cukup baca field sort_key dari index)
+        next_key = key_between(_last_playlist_key(day), None)
 
         doc = {
             "day": day,
@@ -652,6 +3542,8 @@ def admin_playlist():
             "sort_key": next_key,
         }
         ins = col_playlist.insert_one(doc)
+        if len(next_key) > PLAYLIST_KEY_MAX_LEN:
+            rebalance_playlist_day(day)
         return jsonify({"ok": True, "id": str(ins.inserted_id)})
 
     # GET
@@ -664,7 +3556,7 @@ def admin_playlist():
             "end_hhmm": d.get("end_hhmm", ""),
             "program": d.get("program", ""),
             "tracks": d.get("tracks", ""),
-            "sort_key": int(d.get("sort_key", 0)),
+            "sort_key": d.get("sort_key", 0),
         })
     return jsonify({"ok": True, "items": items})
 
@@ -693,12 +3585,61 @@ def admin_playlist_reorder():
     except Exception:
         return jsonify({"ok": False, "error": "Payload tidak valid."}), 400
 
-    for idx, sid in enumerate(ids):
-        try:
-            col_playlist.update_one({"_id": ObjectId(sid)}, {"$set": {"sort_key": idx, "day": day}})
-        except Exception:
-            pass
-    return jsonify({"ok": True, "count": len(ids)})
+    try:
+        oids = [ObjectId(sid) for sid in ids]
+    except Exception:
+        return jsonify({"ok": False, "error": "ID tidak valid."}), 400
+
+    ops = [UpdateOne({"_id": oid}, {"$set": {"sort_key": key, "day": day}})
+           for oid, key in zip(oids, spread_keys(len(oids)))]
+    try:
+        res = col_playlist.bulk_write(ops, ordered=True)
+    except BulkWriteError as e:
+        print("Playlist reorder error:", e.details)
+        return jsonify({"ok": False, "error": "Gagal menyimpan urutan."}), 500
+    return jsonify({"ok": True, "count": len(ids), "matched": res.matched_count})
+
+@app.route("/api/admin/playlist/<pid>/move", methods=["POST"])
+@admin_required
+def admin_playlist_move(pid):
+    """
+    Pindah satu item: body { day, prev_id, next_id } = tetangga baru di atas/bawahnya
+    (boleh null di ujung). Hanya dokumen item itu yang diubah.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        oid = ObjectId(pid)
+        day = int(data.get("day"))
+        if day < 0 or day > 6:
+            raise ValueError
+        prev_id = ObjectId(data["prev_id"]) if data.get("prev_id") else None
+        next_id = ObjectId(data["next_id"]) if data.get("next_id") else None
+    except Exception:
+        return jsonify({"ok": False, "error": "Payload tidak valid."}), 400
+
+    def neighbour_keys():
+        wanted = [x for x in (prev_id, next_id) if x is not None]
+        found = {d["_id"]: d.get("sort_key") for d in col_playlist.find({"_id": {"$in": wanted}}, {"sort_key": 1})} if wanted else {}
+        return found.get(prev_id) if prev_id else None, found.get(next_id) if next_id else None
+
+    prev_key, next_key = neighbour_keys()
+    if (prev_id and prev_key is None) or (next_id and next_key is None):
+        return jsonify({"ok": False, "error": "Item tetangga tidak ditemukan. Muat ulang playlist."}), 409
+    if not isinstance(prev_key, (str, type(None))) or not isinstance(next_key, (str, type(None))):
+        # masih kunci angka lama → rebalance hari ini dulu
+        rebalance_playlist_day(day)
+        prev_key, next_key = neighbour_keys()
+    try:
+        new_key = key_between(prev_key, next_key)
+    except ValueError:
+        return jsonify({"ok": False, "error": "Urutan berubah di tempat lain. Muat ulang playlist."}), 409
+
+    res = col_playlist.update_one({"_id": oid}, {"$set": {"sort_key": new_key, "day": day}})
+    if res.matched_count == 0:
+        return jsonify({"ok": False, "error": "Item tidak ditemukan."}), 404
+    if len(new_key) > PLAYLIST_KEY_MAX_LEN:
+        rebalance_playlist_day(day)
+    return jsonify({"ok": True, "sort_key": new_key})
 
 # ====== CSV Export / Import untuk PLAYLIST (versi "pretty") ======
 DAY_NAMES = ['Senin','Selasa','Rabu','Kamis','Jumat','Sabtu','Minggu']
@@ -737,6 +3678,156 @@ def _parse_day_index(val: str) -> int:
 def _hhmm_ok(s: str) -> bool:
     return bool(re.match(r"^\d{2}:\d{2}$", s or ""))
 
+# ====== Export streaming (CSV / NDJSON) ======
+# Baris dibaca dari cursor Mongo (projection + batch_size) lalu langsung dikirim;
+# memori konstan walau data setahun penuh.
+EXPORT_BATCH = int(os.getenv("EXPORT_BATCH", "1000"))
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "200"))  # baris per potongan yang di-yield
+
+class _Echo:
+    """File palsu untuk csv.writer: write() mengembalikan teks, tidak menyimpan."""
+    def write(self, value):
+        return value
+
+def _chunked(lines, closers=()):
+    """
+    Gabungkan beberapa baris per yield (lebih sedikit write ke socket). Semua cursor /
+    generator di `closers` ditutup di akhir, juga saat client putus di tengah download.
+    """
+    buf = []
+    try:
+        for line in lines:
+            buf.append(line)
+            if len(buf) >= EXPORT_CHUNK_ROWS:
+                yield "".join(buf)
+                buf = []
+        if buf:
+            yield "".join(buf)
+    finally:
+        for c in closers:
+            c.close()
+
+def _stream_csv(header, rows, closers, fname):
+    w = csv.writer(_Echo())
+    def lines():
+        yield w.writerow(header)
+        for row in rows:
+            yield w.writerow(row)
+    return Response(stream_with_context(_chunked(lines(), closers)), mimetype="text/csv",
+                    headers={"Content-Disposition": f"attachment; filename={fname}"})
+
+def _stream_ndjson(items, closers, fname):
+    lines = (json.dumps(it, ensure_ascii=False) + "\n" for it in items)
+    return Response(stream_with_context(_chunked(lines, closers)), mimetype="application/x-ndjson",
+                    headers={"Content-Disposition": f"attachment; filename={fname}"})
+
+def _parse_export_bound(val: str, end: bool = False):
+    """'YYYY-MM-DD' atau ISO datetime → datetime UTC. Tanggal saja di 'to' = sampai akhir hari itu."""
+    val = (val or "").strip()
+    if not val:
+        return None
+    if re.match(r"^\d{4}-\d{2}-\d{2}$", val):
+        dt = datetime.strptime(val, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+        return dt + timedelta(days=1) if end else dt
+    return _as_utc(datetime.fromisoformat(val.replace("Z", "+00:00")))
+
+_PLAYLIST_EXPORT_PROJ = {"day": 1, "start_hhmm": 1, "end_hhmm": 1, "program": 1, "tracks": 1}
+
+def _playlist_export_row(d: dict) -> list:
+    day = int(d.get("day", 0))
+    return [
+        str(d["_id"]),
+        day, DAY_NAMES[day],
+        d.get("start_hhmm",""), d.get("end_hhmm",""),
+        d.get("program",""), (d.get("tracks","") or "").replace("\r\n","\n")
+    ]
+
+# kind → (koleksi, field waktu untuk from/to, urutan, projection, kolom)
+# Playlist tidak punya timestamp → from/to memakai waktu pembuatan dari _id.
+EXPORT_KINDS = {
+    "playlist": {
+        "col": lambda: col_playlist, "time_field": "_id",
+        "sort": [("day", ASCENDING), ("sort_key", ASCENDING), ("start_hhmm", ASCENDING)],
+        "proj": _PLAYLIST_EXPORT_PROJ,
+        "columns": ["id","day","day_name","start_hhmm","end_hhmm","program","tracks"],
+    },
+    "requests": {
+        "col": lambda: col_requests, "time_field": "created_at",
+        "sort": [("created_at", ASCENDING), ("_id", ASCENDING)],
+        "proj": {"name": 1, "phone": 1, "title": 1, "status": 1, "created_at": 1, "updated_at": 1},
+        "columns": ["id","created_at","updated_at","name","phone","title","status"],
+    },
+    "chat": {
+        "col": lambda: col_chat, "time_field": "ts",
+        "sort": [("ts", ASCENDING), ("_id", ASCENDING)],
+        "proj": {"ts": 1, "name": 1, "text": 1, "ip": 1, "flagged": 1, "flag_terms": 1},
+        "columns": ["id","ts","name","text","ip","flagged","flag_terms"],
+    },
+}
+
+def _export_item(kind: str, d: dict) -> dict:
+    if kind == "playlist":
+        return dict(zip(EXPORT_KINDS["playlist"]["columns"], _playlist_export_row(d)))
+    if kind == "requests":
+        return {
+            "id": str(d["_id"]),
+            "created_at": to_utc_iso(d.get("created_at")),
+            "updated_at": to_utc_iso(d.get("updated_at")),
+            "name": d.get("name",""), "phone": d.get("phone",""),
+            "title": d.get("title",""), "status": d.get("status",""),
+        }
+    return {
+        "id": str(d["_id"]),
+        "ts": to_utc_iso(d.get("ts")),
+        "name": d.get("name",""), "text": d.get("text",""), "ip": d.get("ip",""),
+        "flagged": bool(d.get("flagged", False)),
+        "flag_terms": d.get("flag_terms") or [],
+    }
+
+@app.route("/api/admin/export/<kind>", methods=["GET"])
+@admin_required
+def admin_export(kind):
+    """
+    Export streaming.
+      kind   : playlist | requests | chat
+      format : csv (default) | ndjson
+      from, to : 'YYYY-MM-DD' atau ISO datetime (UTC bila tanpa zona); 'to' eksklusif
+                 kecuali berupa tanggal (berarti sampai akhir hari itu)
+    """
+    spec = EXPORT_KINDS.get(kind)
+    if not spec:
+        return jsonify({"ok": False, "error": "Jenis export tidak dikenal."}), 404
+    fmt = (request.args.get("format") or "csv").lower()
+    if fmt not in ("csv", "ndjson"):
+        return jsonify({"ok": False, "error": "Format harus csv atau ndjson."}), 400
+    try:
+        dt_from = _parse_export_bound(request.args.get("from"))
+        dt_to = _parse_export_bound(request.args.get("to"), end=True)
+    except ValueError:
+        return jsonify({"ok": False, "error": "Format tanggal from/to tidak valid."}), 400
+
+    field = spec["time_field"]
+    rng = {}
+    if dt_from:
+        rng["$gte"] = ObjectId.from_datetime(dt_from) if field == "_id" else dt_from
+    if dt_to:
+        rng["$lt"] = ObjectId.from_datetime(dt_to) if field == "_id" else dt_to
+    query = {field: rng} if rng else {}
+
+    cur = spec["col"]().find(query, spec["proj"]).sort(spec["sort"]).batch_size(EXPORT_BATCH)
+    docs, closers = cur, (cur,)
+    if kind == "chat":
+        # arsip (lebih tua) dulu, baru koleksi hot
+        archive = iter_chat_archive(before=dt_to, after=dt_from, newest_first=False)
+        docs, closers = itertools.chain(archive, cur), (archive, cur)
+    items = (_export_item(kind, d) for d in docs)
+    fname = f"haloradio_{kind}.{fmt}"
+    if fmt == "ndjson":
+        return _stream_ndjson(items, closers, fname)
+    columns = spec["columns"]
+    rows = ([(",".join(v) if isinstance(v, list) else v) for v in (it[c] for c in columns)] for it in items)
+    return _stream_csv(columns, rows, closers, fname)
+
 @app.route("/api/admin/playlist/csv", methods=["GET"])
 @admin_required
 def playlist_export_csv():
@@ -746,36 +3837,96 @@ def playlist_export_csv():
     - style=raw     -> dengan 'id'
     """
     style = (request.args.get("style") or "pretty").lower()
-    si = StringIO()
-    w = csv.writer(si)
-
-    items = list(col_playlist.find().sort([("day", ASCENDING), ("sort_key", ASCENDING), ("start_hhmm", ASCENDING)]))
+    cur = (col_playlist.find({}, _PLAYLIST_EXPORT_PROJ)
+           .sort([("day", ASCENDING), ("sort_key", ASCENDING), ("start_hhmm", ASCENDING)])
+           .batch_size(EXPORT_BATCH))
 
     if style == "raw":
-        w.writerow(["id","day","day_name","start_hhmm","end_hhmm","program","tracks"])
-        for d in items:
-            day = int(d.get("day", 0))
-            w.writerow([
-                str(d["_id"]),
-                day, DAY_NAMES[day],
-                d.get("start_hhmm",""), d.get("end_hhmm",""),
-                d.get("program",""), (d.get("tracks","") or "").replace("\r\n","\n")
-            ])
+        header = ["id","day","day_name","start_hhmm","end_hhmm","program","tracks"]
+        rows = (_playlist_export_row(d) for d in cur)
         fname = "haloradio_playlist_raw.csv"
     else:
-        w.writerow(["no","day","day_name","start_hhmm","end_hhmm","program","tracks"])
-        for i, d in enumerate(items, start=1):
-            day0 = int(d.get("day", 0))
-            w.writerow([
-                i,
-                day0 + 1, DAY_NAMES[day0],
-                d.get("start_hhmm",""), d.get("end_hhmm",""),
-                d.get("program",""), (d.get("tracks","") or "").replace("\r\n","\n")
-            ])
+        header = ["no","day","day_name","start_hhmm","end_hhmm","program","tracks"]
+        def pretty_rows():
+            for i, d in enumerate(cur, start=1):
+                row = _playlist_export_row(d)
+                yield [i, row[1] + 1] + row[2:]
+        rows = pretty_rows()
         fname = "haloradio_playlist.csv"
 
-    return Response(si.getvalue(), mimetype="text/csv",
-                    headers={"Content-Disposition": f"attachment; filename={fname}"})
+    return _stream_csv(header, rows, (cur,), fname)
+
+PLAYLIST_IMPORT_BATCH = int(os.getenv("PLAYLIST_IMPORT_BATCH", "500"))
+_PLAYLIST_FIELDS = ("day", "start_hhmm", "end_hhmm", "program", "tracks")
+
+def _parse_playlist_csv_row(r: dict) -> dict:
+    """Validasi satu baris CSV (key sudah lowercase); ValueError berisi pesan untuk user."""
+    # day → 0..6
+    if "day" in r and r["day"] != "":
+        day0 = _parse_day_index(r["day"])
+    elif "day_name" in r and r["day_name"] != "":
+        day0 = _parse_day_index(r["day_name"])
+    else:
+        raise ValueError("butuh 'day' (1..7) atau 'day_name'")
+
+    start_hhmm = r.get("start_hhmm","")
+    end_hhmm   = r.get("end_hhmm","")
+    if not (_hhmm_ok(start_hhmm) and _hhmm_ok(end_hhmm)):
+        raise ValueError("waktu harus HH:MM.")
+    sh, sm = map(int, start_hhmm.split(":"))
+    eh, em = map(int, end_hhmm.split(":"))
+    if eh*60+em <= sh*60+sm:
+        raise ValueError("end harus setelah start.")
+
+    program = r.get("program","")
+    if not program:
+        raise ValueError("'program' wajib diisi.")
+
+    oid = None
+    rid = r.get("id","")
+    if rid:
+        try:
+            oid = ObjectId(rid)
+        except Exception:
+            oid = None  # id rusak → diperlakukan sebagai item baru (seperti sebelumnya)
+    return {
+        "day": day0, "start_hhmm": start_hhmm, "end_hhmm": end_hhmm,
+        "program": program, "tracks": r.get("tracks",""), "_id": oid,
+    }
+
+def _playlist_write_op(item: dict, sort_key: str, mark_upsert: bool = False):
+    fields = {k: item[k] for k in _PLAYLIST_FIELDS}
+    if item["_id"] is None:
+        return InsertOne(dict(fields, sort_key=sort_key))
+    # upsert by id: sort_key item lama dipertahankan
+    if mark_upsert:
+        fields["_upsert"] = True
+    return UpdateOne({"_id": item["_id"]}, {"$set": fields, "$setOnInsert": {"sort_key": sort_key}}, upsert=True)
+
+def _merge_staged_playlist(staging) -> tuple:
+    """Salin hasil staging (append) ke koleksi playlist per batch; return (inserted, updated)."""
+    inserted = updated = 0
+    ops = []
+
+    def flush():
+        nonlocal inserted, updated, ops
+        if ops:
+            res = col_playlist.bulk_write(ops, ordered=True)
+            inserted += res.inserted_count + res.upserted_count
+            updated += res.matched_count
+            ops = []
+
+    for d in staging.find().sort("_id", ASCENDING).batch_size(PLAYLIST_IMPORT_BATCH):
+        item = {k: d.get(k) for k in _PLAYLIST_FIELDS}
+        if d.pop("_upsert", False):
+            item["_id"] = d["_id"]
+        else:
+            item["_id"] = None
+        ops.append(_playlist_write_op(item, d.get("sort_key")))
+        if len(ops) >= PLAYLIST_IMPORT_BATCH:
+            flush()
+    flush()
+    return inserted, updated
 
 @app.route("/api/admin/playlist/csv", methods=["POST"])
 @admin_required
@@ -790,94 +3941,225 @@ def playlist_import_csv():
       - id (opsional; kalau ada → upsert by id)
     Form:
       - mode: append (default) | replace
+    File dibaca & divalidasi per baris sambil ditulis per batch ke koleksi
+    staging. Playlist asli baru disentuh setelah semua baris valid:
+      - replace → staging di-rename menggantikan koleksi playlist (atomik)
+      - append  → isi staging disalin ke playlist per batch
     """
     if "file" not in request.files:
         return jsonify({"ok": False, "error": "File CSV tidak ditemukan."}), 400
 
     mode = (request.form.get("mode") or "append").lower().strip()
-    content = request.files["file"].stream.read().decode("utf-8", errors="replace")
-
-    try:
-        reader = csv.DictReader(StringIO(content))
-    except Exception:
-        return jsonify({"ok": False, "error": "CSV tidak bisa dibaca."}), 400
-
-    if mode == "replace":
-        col_playlist.delete_many({})
+    replace = mode == "replace"
+    lines = codecs.getreader("utf-8-sig")(request.files["file"].stream, errors="replace")
+    reader = csv.DictReader(lines)
 
-    # siapkan counter sort_key per day untuk penambahan baru (append)
-    next_key = defaultdict(int)
-    if mode != "replace":
-        for d in range(0,7):
-            last = col_playlist.find({"day": d}).sort("sort_key", DESCENDING).limit(1)
-            last = next(last, None)
-            next_key[d] = (int(last.get("sort_key", -1)) + 1) if last else 0
+    staging = db[f"{col_playlist.name}__import_{ObjectId()}"]
+    _ensure_playlist_indexes(staging)
 
+    # kunci urutan terakhir per day; item baru disambung setelahnya
+    last_key = {d: (None if replace else _last_playlist_key(d)) for d in range(0, 7)}
     inserted = updated = 0
-    line = 1
-    for row in reader:
-        line += 1
-        r = { (k or "").lower().strip(): (v or "").strip() for k,v in row.items() }
+    ops = []
 
-        # day → 0..6
+    def flush():
+        nonlocal inserted, updated, ops
+        if ops:
+            res = staging.bulk_write(ops, ordered=True)
+            inserted += res.inserted_count + res.upserted_count
+            updated += res.matched_count
+            ops = []
+
+    try:
+        line = 1
         try:
-            if "day" in r and r["day"] != "":
-                day0 = _parse_day_index(r["day"])
-            elif "day_name" in r and r["day_name"] != "":
-                day0 = _parse_day_index(r["day_name"])
-            else:
-                raise ValueError("butuh 'day' (1..7) atau 'day_name'")
-        except ValueError as e:
-            return jsonify({"ok": False, "error": f"Baris {line}: {e}"}), 400
-
-        start_hhmm = r.get("start_hhmm","")
-        end_hhmm   = r.get("end_hhmm","")
-        if not (_hhmm_ok(start_hhmm) and _hhmm_ok(end_hhmm)):
-            return jsonify({"ok": False, "error": f"Baris {line}: waktu harus HH:MM."}), 400
-        sh, sm = map(int, start_hhmm.split(":"))
-        eh, em = map(int, end_hhmm.split(":"))
-        if eh*60+em <= sh*60+sm:
-            return jsonify({"ok": False, "error": f"Baris {line}: end harus setelah start."}), 400
-
-        program = r.get("program","")
-        if not program:
-            return jsonify({"ok": False, "error": f"Baris {line}: 'program' wajib diisi."}), 400
-        tracks  = r.get("tracks","")
-
-        rid = r.get("id","")
-        if rid:
-            # upsert by id (sort_key dipertahankan)
-            try:
-                oid = ObjectId(rid)
-                res = col_playlist.update_one(
-                    {"_id": oid},
-                    {"$set": {
-                        "day": day0, "start_hhmm": start_hhmm, "end_hhmm": end_hhmm,
-                        "program": program, "tracks": tracks
-                    }},
-                    upsert=True
-                )
-                if res.matched_count: updated += 1
-                else: inserted += 1
-            except Exception:
-                col_playlist.insert_one({
-                    "day": day0, "start_hhmm": start_hhmm, "end_hhmm": end_hhmm,
-                    "program": program, "tracks": tracks,
-                    "sort_key": next_key[day0]
-                })
-                next_key[day0] += 1
-                inserted += 1
+            for row in reader:
+                line += 1
+                r = { (k or "").lower().strip(): (v or "").strip() for k,v in row.items() if isinstance(v, str) or v is None }
+                try:
+                    item = _parse_playlist_csv_row(r)
+                except ValueError as e:
+                    return jsonify({"ok": False, "error": f"Baris {line}: {e}"}), 400
+                last_key[item["day"]] = key_between(last_key[item["day"]], None)
+                ops.append(_playlist_write_op(item, last_key[item["day"]], mark_upsert=not replace))
+                if len(ops) >= PLAYLIST_IMPORT_BATCH:
+                    flush()
+        except (csv.Error, UnicodeError) as e:
+            return jsonify({"ok": False, "error": f"CSV tidak bisa dibaca (baris {line}): {e}"}), 400
+        flush()
+
+        if replace:
+            for d in range(0, 7):
+                if last_key[d] and len(last_key[d]) > PLAYLIST_KEY_MAX_LEN:
+                    rebalance_playlist_day(d, col=staging)
+            staging.rename(col_playlist.name, dropTarget=True)
+            staging = None
         else:
-            col_playlist.insert_one({
-                "day": day0, "start_hhmm": start_hhmm, "end_hhmm": end_hhmm,
-                "program": program, "tracks": tracks,
-                "sort_key": next_key[day0]
-            })
-            next_key[day0] += 1
-            inserted += 1
+            inserted, updated = _merge_staged_playlist(staging)
+            # import banyak baris bikin kunci makin panjang → ratakan hari yang perlu
+            for d in range(0, 7):
+                if last_key[d] and len(last_key[d]) > PLAYLIST_KEY_MAX_LEN:
+                    rebalance_playlist_day(d)
+    finally:
+        if staging is not None:
+            staging.drop()
 
     return jsonify({"ok": True, "mode": mode, "inserted": inserted, "updated": updated})
 
+# ====== Realtime Hub (Socket.IO) ======
+# Event ke client:
+#   stats          → payload sama dengan /stats (dikirim tiap snapshot berubah)
+#   schedule       → {"now": item|None, "upcoming": [...]}
+#   chat:init      → {"items": [...]} pesan terakhir dari ring (saat join room chat)
+#   chat:message   → satu pesan baru
+#   chat:delete    → {"_id": ...} pesan dihapus admin
+#   requests:new_count → {"count": n} (room "admin", hanya untuk sesi admin)
+class ChatRing:
+    """Ring pesan chat terakhir di memori, diisi dari Mongo sekali saat pertama dipakai."""
+
+    def __init__(self, size: int):
+        self._items = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self._seeded = False
+
+    def _seed(self):
+        if self._seeded:
+            return
+        docs = list(col_chat.find().sort("ts", DESCENDING).limit(self._items.maxlen))
+        docs.reverse()
+        with self._lock:
+            if not self._seeded:
+                self._items.extend(_chat_public_item(d) for d in docs)
+                self._seeded = True
+
+    def recent(self) -> list:
+        self._seed()
+        with self._lock:
+            return list(self._items)
+
+    def append(self, item: dict):
+        with self._lock:
+            if self._seeded:
+                self._items.append(item)
+
+    def remove(self, item_id: str):
+        with self._lock:
+            kept = [it for it in self._items if it["_id"] != item_id]
+            self._items.clear()
+            self._items.extend(kept)
+
+chat_ring = ChatRing(CHAT_RING_SIZE)
+
+_rt_lock = threading.Lock()
+_rt_clients = 0
+metrics.register(GaugeFn("haloradio_socketio_clients", "Client Socket.IO yang sedang tersambung.",
+                         lambda: _rt_clients))
+_schedule_etag = None
+
+def schedule_snapshot() -> dict:
+    return {"now": get_schedule_now(), "upcoming": get_schedule_upcoming(8)}
+
+def push_schedule(force: bool = False):
+    """Kirim event schedule ke semua client kalau isinya berubah."""
+    global _schedule_etag
+    if _rt_clients == 0 and not force:
+        return
+    try:
+        snap = schedule_snapshot()
+    except Exception as e:
+        print("Schedule push error:", e)
+        return
+    etag = etag_for(snap)
+    if etag != _schedule_etag or force:
+        _schedule_etag = etag
+        socketio.emit("schedule", snap)
+
+def _schedule_ticker():
+    # jadwal bisa berganti hanya karena waktu lewat (acara mulai/selesai)
+    while True:
+        socketio.sleep(SCHEDULE_PUSH_S)
+        push_schedule()
+
+def _new_count_reconciler():
+    while True:
+        socketio.sleep(NEW_COUNT_RECONCILE_S)
+        try:
+            new_count.reconcile()
+        except Exception as e:
+            print("New count reconcile error:", e)
+
+@stats_poller.on_change
+def _push_stats(payload: dict):
+    socketio.emit("stats", dict(payload, age=0))
+
+_bg_started = False
+
+def start_background_services():
+    """Nyalakan worker background (sekali per proses)."""
+    global _bg_started
+    if _bg_started:
+        return
+    with _rt_lock:
+        if _bg_started:
+            return
+        _bg_started = True
+    stats_poller.ensure_started(wait_s=0)
+    if MONGODB_INDEX_BOOTSTRAP == "background":
+        socketio.start_background_task(_index_bootstrap)
+    socketio.start_background_task(_schedule_ticker)
+    socketio.start_background_task(_new_count_reconciler)
+    socketio.start_background_task(_playlist_rebalancer)
+    socketio.start_background_task(_chat_archiver)
+    socketio.start_background_task(_listener_sampler)
+    socketio.start_background_task(_catalog_scanner)
+
+@app.before_request
+def _ensure_background_services():
+    start_background_services()
+
+@socketio.on("connect")
+def rt_connect(auth=None):
+    global _rt_clients
+    start_background_services()
+    with _rt_lock:
+        _rt_clients += 1
+    payload, _, age = stats_poller.snapshot()
+    emit("stats", dict(payload, age=round(age, 1)))
+    try:
+        emit("schedule", schedule_snapshot())
+    except Exception as e:
+        print("Schedule snapshot error:", e)
+
+@socketio.on("disconnect")
+def rt_disconnect(*args):
+    global _rt_clients
+    with _rt_lock:
+        _rt_clients = max(0, _rt_clients - 1)
+
+@socketio.on("join")
+def rt_join(data=None):
+    room = (data or {}).get("room")
+    if room == "chat":
+        join_room("chat")
+        try:
+            emit("chat:init", {"items": chat_ring.recent()})
+        except Exception as e:
+            print("Chat ring error:", e)
+            emit("chat:init", {"items": []})
+    elif room == "admin" and is_admin():
+        join_room("admin")
+        try:
+            emit("requests:new_count", {"count": new_count.get()})
+        except Exception as e:
+            print("New count error:", e)
+
+@socketio.on("leave")
+def rt_leave(data=None):
+    room = (data or {}).get("room")
+    if room == "chat":
+        leave_room("chat")
+
 # ====== Main ======
+# Server dev (reloader + thread per koneksi). Untuk produksi pakai: python serve.py
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    socketio.run(app, host="0.0.0.0", port=5000, debug=True)
@@ -0,0 +1,169 @@
+"""
+Server palsu untuk benchmark: Icecast (stream MP3 + status-json.xsl),
+Deezer (/search) dan YouTube (/results). Semua stdlib, jalan di thread
+daemon pada port acak di 127.0.0.1.
+"""
+import hashlib
+import json
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Header frame MPEG-1 Layer III, 128 kbps, 44.1 kHz, tanpa padding → 417 byte/frame
+MP3_FRAME_HEADER = b"\xff\xfb\x90\x64"
+MP3_FRAME_BYTES = 417
+MP3_FRAME_SECONDS = 1152 / 44100
+ICY_METAINT = 16000
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def handle_error(self, request, client_address):
+        pass  # client memutus di tengah jalan itu wajar saat benchmark
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "HaloRadioBenchFake/1.0"
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _delay(self):
+        if self.server.latency_s:
+            time.sleep(self.server.latency_s)
+
+
+class _IcecastHandler(_Handler):
+    def do_GET(self):
+        path = urllib.parse.urlparse(self.path).path
+        if path == "/status-json.xsl":
+            return self._status()
+        if path == self.server.mount:
+            return self._stream()
+        self._send(404, b"not found", "text/plain")
+
+    def _title(self) -> str:
+        return f"Bench Artist - Lagu {int(time.time() // self.server.title_every_s) % 100}"
+
+    def _status(self):
+        srv = self.server
+        title = self._title()
+        body = json.dumps({"icestats": {"source": {
+            "listenurl": f"http://127.0.0.1:{srv.server_port}{srv.mount}",
+            "listeners": srv.listeners,
+            "title": title,
+            "server_name": "HaloRadio Bench",
+            "bitrate": 128,
+            "content_type": "audio/mpeg",
+        }}}).encode()
+        self._send(200, body, "application/json")
+
+    def _stream(self):
+        srv = self.server
+        frame = MP3_FRAME_HEADER + bytes(MP3_FRAME_BYTES - len(MP3_FRAME_HEADER))
+        per_write = 8  # frame per write (~0.2 detik audio)
+        payload = frame * per_write
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/mpeg")
+        self.send_header("icy-br", "128")
+        icy = self.headers.get("Icy-MetaData") == "1"
+        if icy:
+            self.send_header("icy-metaint", str(ICY_METAINT))
+        self.end_headers()
+        with srv.lock:
+            srv.listeners += 1
+        try:
+            next_at = time.monotonic()
+            until_meta, last_title = ICY_METAINT, None
+            while True:
+                if not icy:
+                    self.wfile.write(payload)
+                else:
+                    # sisipkan blok metadata tiap ICY_METAINT byte audio (kosong kalau judul sama)
+                    view = memoryview(payload)
+                    while view:
+                        n = min(until_meta, len(view))
+                        self.wfile.write(view[:n])
+                        view, until_meta = view[n:], until_meta - n
+                        if not until_meta:
+                            title = self._title()
+                            meta = b""
+                            if title != last_title:
+                                meta = f"StreamTitle='{title}';".encode()
+                                meta += bytes(-len(meta) % 16)
+                                last_title = title
+                            self.wfile.write(bytes([len(meta) // 16]) + meta)
+                            until_meta = ICY_METAINT
+                next_at += per_write * MP3_FRAME_SECONDS
+                time.sleep(max(0.0, next_at - time.monotonic()))
+        except (BrokenPipeError, ConnectionResetError, OSError):
+            pass
+        finally:
+            with srv.lock:
+                srv.listeners -= 1
+
+
+class _DeezerHandler(_Handler):
+    def do_GET(self):
+        qs = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+        q = (qs.get("q") or [""])[0]
+        self._delay()
+        data = [{
+            "id": i,
+            "title": f"{q.title()} #{i}",
+            "artist": {"name": f"Artist {i}"},
+            "album": {"title": f"Album {i}", "cover_medium": f"https://example.invalid/{i}.jpg"},
+            "preview": f"https://example.invalid/{i}.mp3",
+            "duration": 200 + i,
+        } for i in range(25)]
+        self._send(200, json.dumps({"data": data, "total": len(data)}).encode(), "application/json")
+
+
+class _YouTubeHandler(_Handler):
+    def do_GET(self):
+        qs = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+        q = (qs.get("search_query") or [""])[0]
+        self._delay()
+        vid = hashlib.sha1(q.encode()).hexdigest()[:11]
+        # halaman hasil asli ~500 KB, videoId pertama muncul jauh setelah <head>
+        head = b"<html><head>" + b"<script>var x=1;</script>" * 4000 + b"</head><body>"
+        tail = b"<div></div>" * 20000 + b"</body></html>"
+        body = head + b'{"videoId":"' + vid.encode() + b'"}' + tail
+        self._send(200, body, "text/html; charset=utf-8")
+
+
+def _start(handler, **attrs):
+    srv = _Server(("127.0.0.1", 0), handler)
+    srv.lock = threading.Lock()
+    for k, v in attrs.items():
+        setattr(srv, k, v)
+    threading.Thread(target=srv.serve_forever, name=handler.__name__, daemon=True).start()
+    return srv
+
+
+def start_fakes(mount: str = "/stream", upstream_latency_ms: float = 50.0) -> dict:
+    """Nyalakan semua server palsu; return dict nama → server (atribut server_port)."""
+    latency = upstream_latency_ms / 1000.0
+    return {
+        "icecast": _start(_IcecastHandler, mount=mount, listeners=0, title_every_s=30, latency_s=0),
+        "deezer": _start(_DeezerHandler, latency_s=latency),
+        "youtube": _start(_YouTubeHandler, latency_s=latency),
+    }
+
+
+def stop_fakes(fakes: dict):
+    for srv in fakes.values():
+        srv.shutdown()
+        srv.server_close()
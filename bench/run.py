@@ -0,0 +1,471 @@
+"""
+Benchmark HaloRadio dengan server pengganti lokal (Icecast/Deezer/YouTube palsu).
+
+    pip install -r bench/requirements.txt                 # sekali: mongomock dkk.
+    python bench/run.py                                   # mongomock, semua skenario
+    python bench/run.py --mongo-uri mongodb://localhost:27017 --server eventlet
+    python bench/run.py --scenarios stream,chat --listeners 200 --duration 20
+
+Skenario:
+  stream   : N listener /stream serentak (TTFB, byte/detik per listener)
+  chat     : badai kirim + poll chat (pengirim & poller terpisah)
+  requests : burst POST /api/request_song
+  admin    : polling list admin pada data hasil seed (ukuran realistis)
+  search   : /api/music/search & /api/tools/yt/find_first (cache hit + miss)
+
+Hasil ditulis ke JSON (--out, default bench_output.json): throughput dan
+latensi p50/p95/p99 per skenario/endpoint, plus parameter run-nya.
+
+Catatan: --server thread menjalankan app di proses yang sama dengan load
+generator (GIL dipakai bersama) — cocok untuk membandingkan sebelum/sesudah
+perubahan. --server eventlet menjalankan serve.py di proses terpisah
+(butuh mongod sungguhan) dan lebih dekat ke produksi.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench.fakes import start_fakes, stop_fakes  # noqa: E402
+
+ADMIN_USER = "bench"
+ADMIN_PASSWORD = "bench"
+WORDS = ("cinta rindu hujan senja malam pagi laut bintang bulan jalan pulang kota "
+         "rumah teman mimpi lagu radio halo kamu aku dia kita waktu hati").split()
+
+
+# ====== Pengukuran ======
+def percentile(sorted_vals, p: float) -> float:
+    """Nearest-rank; sorted_vals sudah urut."""
+    if not sorted_vals:
+        return 0.0
+    k = max(0, min(len(sorted_vals) - 1, int(round(p / 100.0 * len(sorted_vals) + 0.5)) - 1))
+    return sorted_vals[k]
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = []
+        self.statuses = Counter()
+        self.errors = 0
+
+    def add(self, seconds: float, status):
+        with self._lock:
+            self.latencies.append(seconds)
+            self.statuses[str(status)] += 1
+            if not isinstance(status, int) or status >= 500:
+                self.errors += 1
+
+    def timed(self, session, method: str, url: str, **kw):
+        t0 = time.perf_counter()
+        try:
+            r = session.request(method, url, timeout=kw.pop("timeout", 15), **kw)
+            self.add(time.perf_counter() - t0, r.status_code)
+            return r
+        except requests.RequestException as e:
+            self.add(time.perf_counter() - t0, type(e).__name__)
+            return None
+
+    def summary(self, wall_s: float) -> dict:
+        with self._lock:
+            lat = sorted(self.latencies)
+            statuses = dict(self.statuses)
+            errors = self.errors
+        n = len(lat)
+        return {
+            "requests": n,
+            "errors": errors,
+            "statuses": statuses,
+            "wall_seconds": round(wall_s, 3),
+            "throughput_rps": round(n / wall_s, 2) if wall_s > 0 else 0.0,
+            "p50_ms": round(percentile(lat, 50) * 1000, 2),
+            "p95_ms": round(percentile(lat, 95) * 1000, 2),
+            "p99_ms": round(percentile(lat, 99) * 1000, 2),
+            "max_ms": round(lat[-1] * 1000, 2) if lat else 0.0,
+        }
+
+
+def run_workers(n: int, duration: float, fn):
+    """Jalankan fn(worker_idx, deadline) di n thread; return waktu dinding."""
+    deadline = time.monotonic() + duration
+    threads = [threading.Thread(target=fn, args=(i, deadline), daemon=True) for i in range(n)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - t0
+
+
+def admin_session(base: str) -> requests.Session:
+    s = requests.Session()
+    r = s.post(base + "/admin/login", data={"username": ADMIN_USER, "password": ADMIN_PASSWORD},
+               allow_redirects=False, timeout=10)
+    if r.status_code not in (302, 303):
+        raise SystemExit(f"Login admin gagal (status {r.status_code})")
+    return s
+
+
+def fake_ip(i: int) -> str:
+    return f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}"
+
+
+# ====== Skenario ======
+def scenario_stream(base: str, args) -> dict:
+    ttfb = Recorder()
+    bytes_per = [0] * args.listeners
+    early_end = [False] * args.listeners
+
+    def listener(i, deadline):
+        t0 = time.perf_counter()
+        try:
+            with requests.get(base + "/stream", stream=True, timeout=15,
+                              headers={"X-Forwarded-For": fake_ip(i)}) as r:
+                first = True
+                for chunk in r.iter_content(chunk_size=8192):
+                    if first:
+                        ttfb.add(time.perf_counter() - t0, r.status_code)
+                        first = False
+                    bytes_per[i] += len(chunk)
+                    if time.monotonic() >= deadline:
+                        return
+                if first:
+                    ttfb.add(time.perf_counter() - t0, r.status_code)
+                early_end[i] = True
+        except requests.RequestException as e:
+            ttfb.add(time.perf_counter() - t0, type(e).__name__)
+            early_end[i] = True
+
+    wall = run_workers(args.listeners, args.stream_seconds, listener)
+    kbps = sorted(b * 8 / 1000 / wall for b in bytes_per)
+    out = ttfb.summary(wall)
+    out.update({
+        "listeners": args.listeners,
+        "ttfb_note": "p50/p95/p99 = waktu sampai byte audio pertama",
+        "bytes_total": sum(bytes_per),
+        "throughput_bytes_per_s": round(sum(bytes_per) / wall, 1),
+        "listener_kbps_min": round(kbps[0], 1) if kbps else 0.0,
+        "listener_kbps_p50": round(percentile(kbps, 50), 1),
+        "disconnected_early": sum(early_end),
+    })
+    return {"stream": out}
+
+
+def scenario_chat(base: str, args) -> dict:
+    send, poll = Recorder(), Recorder()
+
+    def sender(i, deadline):
+        s = requests.Session()
+        hdr = {"X-Forwarded-For": fake_ip(1000 + i)}
+        rnd = random.Random(i)
+        while time.monotonic() < deadline:
+            text = " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(3, 12)))
+            send.timed(s, "POST", base + "/api/chat/send", json={"name": f"Bench{i}", "text": text}, headers=hdr)
+            time.sleep(args.chat_send_interval * rnd.uniform(0.5, 1.5))
+
+    def poller(i, deadline):
+        s = requests.Session()
+        since = None
+        while time.monotonic() < deadline:
+            url = base + "/api/chat/messages" + (f"?since={since}" if since else "")
+            r = poll.timed(s, "GET", url)
+            if r is not None and r.ok:
+                items = r.json().get("items") or []
+                if items:
+                    since = items[-1]["ts"]
+            time.sleep(args.chat_poll_interval)
+
+    def worker(i, deadline):
+        if i < args.chat_senders:
+            sender(i, deadline)
+        else:
+            poller(i - args.chat_senders, deadline)
+
+    wall = run_workers(args.chat_senders + args.chat_pollers, args.duration, worker)
+    return {"chat_send": send.summary(wall), "chat_poll": poll.summary(wall)}
+
+
+def scenario_requests(base: str, args) -> dict:
+    rec = Recorder()
+    local = threading.local()
+
+    def one(i):
+        s = getattr(local, "s", None) or requests.Session()
+        local.s = s
+        rec.timed(s, "POST", base + "/api/request_song", json={
+            "name": f"Pendengar {i}", "phone": f"0812{i:08d}",
+            "title": " ".join(random.choice(WORDS) for _ in range(3)),
+        })
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.burst_concurrency) as ex:
+        list(ex.map(one, range(args.burst)))
+    return {"request_burst": rec.summary(time.perf_counter() - t0)}
+
+
+ADMIN_ENDPOINTS = (
+    "/api/admin/requests?limit=50",
+    "/api/admin/requests?limit=50&status=New",
+    "/api/admin/requests/new_count",
+    "/api/admin/chat?limit=100",
+    "/api/admin/chat?limit=100&flagged=1",
+    "/api/admin/chat?limit=100&q=rindu",
+)
+
+
+def scenario_admin(base: str, args) -> dict:
+    recs = {ep: Recorder() for ep in ADMIN_ENDPOINTS}
+
+    def worker(i, deadline):
+        s = admin_session(base)
+        k = i
+        while time.monotonic() < deadline:
+            ep = ADMIN_ENDPOINTS[k % len(ADMIN_ENDPOINTS)]
+            recs[ep].timed(s, "GET", base + ep)
+            k += 1
+
+    wall = run_workers(args.admin_concurrency, args.duration, worker)
+    return {f"admin {ep}": rec.summary(wall) for ep, rec in recs.items()}
+
+
+def scenario_search(base: str, args) -> dict:
+    deezer, yt = Recorder(), Recorder()
+    vocab = [f"{a} {b}" for a in WORDS for b in WORDS][:args.search_vocab]
+
+    def worker(i, deadline):
+        s = requests.Session()
+        rnd = random.Random(i)
+        while time.monotonic() < deadline:
+            q = rnd.choice(vocab)
+            deezer.timed(s, "GET", base + "/api/music/search", params={"q": q})
+            if rnd.random() < 0.2:
+                yt.timed(s, "GET", base + "/api/tools/yt/find_first", params={"q": q})
+
+    wall = run_workers(args.search_concurrency, args.duration, worker)
+    return {"search_deezer": deezer.summary(wall), "search_youtube": yt.summary(wall)}
+
+
+SCENARIOS = {
+    "stream": scenario_stream,
+    "chat": scenario_chat,
+    "requests": scenario_requests,
+    "admin": scenario_admin,
+    "search": scenario_search,
+}
+
+
+# ====== Seed data ======
+def seed(db, args):
+    rnd = random.Random(42)
+    now = datetime.now(timezone.utc)
+    batch = []
+    for i in range(args.seed_requests):
+        created = now - timedelta(seconds=rnd.randint(0, 90 * 86400))
+        batch.append({
+            "name": f"Seed {i}", "phone": f"0813{i:08d}",
+            "title": " ".join(rnd.choice(WORDS) for _ in range(3)),
+            "status": rnd.choice(("New", "In-Progress", "Done", "Done", "Done")),
+            "created_at": created, "updated_at": created,
+        })
+        if len(batch) >= 5000:
+            db[os.environ["MONGODB_COLL"]].insert_many(batch)
+            batch = []
+    if batch:
+        db[os.environ["MONGODB_COLL"]].insert_many(batch)
+
+    batch = []
+    for i in range(args.seed_chat):
+        flagged = rnd.random() < 0.02
+        batch.append({
+            "ip": fake_ip(rnd.randint(0, 5000)), "name": f"Seed{rnd.randint(0, 500)}",
+            "text": " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(3, 12))),
+            "ts": now - timedelta(seconds=rnd.randint(0, 20 * 3600)),
+            "flagged": flagged,
+        })
+        if len(batch) >= 5000:
+            db[os.environ["MONGODB_CHAT_COLL"]].insert_many(batch)
+            batch = []
+    if batch:
+        db[os.environ["MONGODB_CHAT_COLL"]].insert_many(batch)
+
+
+# ====== Menjalankan app ======
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+WARMUP_PATHS = ("/stats", "/api/chat/messages", "/api/schedules/now", "/api/schedules/upcoming")
+
+
+def wait_ready(base: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(base + "/radio", timeout=2).status_code == 200:
+                break
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    else:
+        raise SystemExit("App tidak siap dalam waktu yang ditentukan.")
+    # isi cache/ring/index sekali supaya biaya pemanasan tidak masuk hasil
+    for path in WARMUP_PATHS:
+        requests.get(base + path, timeout=30)
+
+
+def start_thread_server(args, port: int):
+    if not args.mongo_uri:
+        try:
+            import mongomock
+        except ImportError:
+            raise SystemExit("mongomock belum terpasang: pip install -r bench/requirements.txt "
+                             "(atau pakai --mongo-uri ke mongod sungguhan).")
+        import pymongo
+        pymongo.MongoClient = mongomock.MongoClient  # sebelum app di-import
+    import app as app_module
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    db = app_module.db
+    if not args.keep_db:
+        for name in db.list_collection_names():
+            db.drop_collection(name)
+    app_module.ensure_indexes(force=True)
+    seed(db, args)
+    srv = make_server("127.0.0.1", port, app_module.app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=srv.serve_forever, name="bench-app", daemon=True).start()
+    app_module.start_background_services()
+    return lambda: srv.shutdown()
+
+
+def start_eventlet_server(args, port: int, env: dict):
+    if not args.mongo_uri:
+        raise SystemExit("--server eventlet butuh --mongo-uri (mongomock hanya bisa di proses yang sama).")
+    import pymongo
+    db = pymongo.MongoClient(args.mongo_uri)[args.db]
+    if not args.keep_db:
+        pymongo.MongoClient(args.mongo_uri).drop_database(args.db)
+    seed(db, args)
+    subprocess.run([sys.executable, "-m", "flask", "--app", "app", "ensure-indexes"],
+                   cwd=ROOT, env=env, check=True)
+    proc = subprocess.Popen([sys.executable, "serve.py"], cwd=ROOT,
+                            env=dict(env, SERVE_PORT=str(port), SERVE_HOST="127.0.0.1"))
+
+    def stop():
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(timeout=20)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    return stop
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--mongo-uri", default="", help="kosong = mongomock di proses yang sama")
+    ap.add_argument("--db", default="haloradio_bench")
+    ap.add_argument("--keep-db", action="store_true", help="jangan kosongkan database bench dulu")
+    ap.add_argument("--server", choices=("thread", "eventlet"), default="thread")
+    ap.add_argument("--scenarios", default=",".join(SCENARIOS))
+    ap.add_argument("--duration", type=float, default=10.0, help="detik per skenario berbasis waktu")
+    ap.add_argument("--listeners", type=int, default=50)
+    ap.add_argument("--stream-seconds", type=float, default=None)
+    ap.add_argument("--chat-senders", type=int, default=20)
+    ap.add_argument("--chat-pollers", type=int, default=100)
+    ap.add_argument("--chat-send-interval", type=float, default=1.0)
+    ap.add_argument("--chat-poll-interval", type=float, default=1.0)
+    ap.add_argument("--burst", type=int, default=2000)
+    ap.add_argument("--burst-concurrency", type=int, default=50)
+    ap.add_argument("--seed-requests", type=int, default=20000)
+    ap.add_argument("--seed-chat", type=int, default=50000)
+    ap.add_argument("--admin-concurrency", type=int, default=8)
+    ap.add_argument("--search-concurrency", type=int, default=20)
+    ap.add_argument("--search-vocab", type=int, default=300)
+    ap.add_argument("--upstream-latency-ms", type=float, default=50.0)
+    ap.add_argument("--out", default=os.path.join(ROOT, "bench_output.json"))
+    args = ap.parse_args()
+    args.stream_seconds = args.stream_seconds or args.duration
+    if "bench" not in args.db:
+        raise SystemExit("Nama --db harus mengandung 'bench' (database ini dikosongkan).")
+    chosen = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in chosen if s not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"Skenario tidak dikenal: {', '.join(unknown)}")
+
+    fakes = start_fakes(upstream_latency_ms=args.upstream_latency_ms)
+    env = {
+        "ICECAST_HOST": f"http://127.0.0.1:{fakes['icecast'].server_port}",
+        "ICECAST_MOUNT": "/stream",
+        "DEEZER_API_URL": f"http://127.0.0.1:{fakes['deezer'].server_port}/search",
+        "YOUTUBE_RESULTS_URL": f"http://127.0.0.1:{fakes['youtube'].server_port}/results",
+        "MONGODB_URI": args.mongo_uri or "mongodb://localhost:27017",
+        "MONGODB_DBNAME": args.db,
+        "MONGODB_COLL": "song_requests",
+        "MONGODB_CHAT_COLL": "chat_messages",
+        "MONGODB_INDEX_BOOTSTRAP": "off",
+        "ADMIN_USER": ADMIN_USER,
+        "ADMIN_PASSWORD": ADMIN_PASSWORD,
+        "CHAT_RATE_MAX_MSGS": "100000",
+    }
+    os.environ.update(env)
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+
+    if args.server == "thread":
+        stop = start_thread_server(args, port)
+    else:
+        stop = start_eventlet_server(args, port, dict(os.environ))
+    results = {}
+    try:
+        wait_ready(base)
+        for name in chosen:
+            print(f"== {name}", flush=True)
+            results.update(SCENARIOS[name](base, args))
+    finally:
+        stop()
+        stop_fakes(fakes)
+
+    report = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "server": args.server,
+            "mongo": args.mongo_uri or "mongomock",
+            "params": {k: v for k, v in vars(args).items() if k not in ("out", "mongo_uri")},
+        },
+        "scenarios": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{'skenario':<48}{'req':>8}{'err':>6}{'rps':>10}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for name, r in results.items():
+        print(f"{name:<48}{r['requests']:>8}{r['errors']:>6}{r['throughput_rps']:>10}"
+              f"{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}")
+    print(f"Hasil: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
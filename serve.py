@@ -0,0 +1,85 @@
+"""
+Entry point produksi HaloRadio: eventlet (green thread) + Flask-SocketIO.
+
+    python serve.py
+
+Tiap koneksi (termasuk listener /stream yang tersambung berjam-jam) cuma
+makan satu green thread, bukan thread OS. monkey_patch() harus jalan
+sebelum app (dan pymongo/requests) di-import supaya socket, threading dan
+time.sleep di dalamnya ikut kooperatif.
+
+Push realtime (chat, jadwal, jumlah request baru) dikirim lewat Socket.IO.
+Satu proses serve.py tidak butuh apa-apa lagi. Kalau menjalankan beberapa
+proses/worker di belakang load balancer, set SOCKETIO_MESSAGE_QUEUE ke URL
+Redis yang sama di semua worker (pip install redis) dan pakai sticky session;
+tanpa itu event hanya sampai ke client yang tersambung ke worker pengirim.
+"""
+import eventlet
+eventlet.monkey_patch()
+
+import os
+import signal
+import sys
+
+os.environ.setdefault("SOCKETIO_ASYNC_MODE", "eventlet")
+
+import eventlet.wsgi
+from eventlet.event import Event
+from greenlet import GreenletExit
+
+from app import app, stream_relay, start_background_services, drain_write_behind
+
+# ====== Konfigurasi server ======
+HOST = os.getenv("SERVE_HOST", "0.0.0.0")
+PORT = int(os.getenv("SERVE_PORT", os.getenv("PORT", "5000")))
+BACKLOG = int(os.getenv("SERVE_BACKLOG", "2048"))
+MAX_CONNECTIONS = int(os.getenv("SERVE_MAX_CONNECTIONS", "2000"))     # green thread aktif maksimum
+KEEPALIVE_S = float(os.getenv("SERVE_KEEPALIVE_SECONDS", "75"))       # 0 = tanpa keep-alive
+SOCKET_TIMEOUT_S = float(os.getenv("SERVE_SOCKET_TIMEOUT_SECONDS", "0")) or None  # 0 = tanpa batas (/stream!)
+DRAIN_S = float(os.getenv("SERVE_DRAIN_SECONDS", "10"))
+SHUTDOWN_S = float(os.getenv("SERVE_SHUTDOWN_SECONDS", "5"))
+ACCESS_LOG = os.getenv("SERVE_ACCESS_LOG", "0") == "1"
+
+
+def main():
+    sock = eventlet.listen((HOST, PORT), backlog=BACKLOG)
+    start_background_services()
+    server = eventlet.spawn(
+        eventlet.wsgi.server, sock, app,
+        max_size=MAX_CONNECTIONS,
+        keepalive=KEEPALIVE_S if KEEPALIVE_S > 0 else False,
+        socket_timeout=SOCKET_TIMEOUT_S,
+        log_output=ACCESS_LOG,
+    )
+    print(f"HaloRadio (eventlet) di http://{HOST}:{PORT} — maks {MAX_CONNECTIONS} koneksi")
+
+    stopping = Event()
+
+    def request_stop(signum=None, frame=None):
+        if not stopping.ready():
+            stopping.send(signum)
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+    server.link(lambda gt: request_stop())  # server mati sendiri → ikut keluar
+
+    signum = stopping.wait()
+    if signum is not None:
+        print("Shutdown: berhenti menerima koneksi, menutup listener /stream...")
+        sock.close()
+        left = stream_relay.drain(DRAIN_S)
+        if left:
+            print(f"Shutdown: {left} listener belum selesai setelah {DRAIN_S:.0f} detik, diputus.")
+    server.kill()
+    with eventlet.Timeout(SHUTDOWN_S, False):
+        try:
+            server.wait()
+        except GreenletExit:
+            pass
+    # request/chat yang masih di antrean write-behind ditulis sebelum keluar
+    drain_write_behind(SHUTDOWN_S)
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
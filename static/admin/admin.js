@@ -39,7 +39,19 @@ async function loadCount(){
     document.querySelector('#newCount').textContent = j.count ?? 0;
   }catch{ document.querySelector('#newCount').textContent = '0'; }
 }
-loadCount(); setInterval(loadCount, 5000);
+// realtime lewat Socket.IO kalau tersedia; polling jadi cadangan saat socket putus
+let countTimer = null;
+function pollCount(on){
+  if(on && !countTimer){ loadCount(); countTimer = setInterval(loadCount, 5000); }
+  if(!on && countTimer){ clearInterval(countTimer); countTimer = null; }
+}
+const rt = window.io ? window.io({ transports: ['websocket', 'polling'] }) : null;
+if(rt){
+  rt.on('connect', ()=>{ pollCount(false); rt.emit('join', { room:'admin' }); });
+  rt.on('disconnect', ()=> pollCount(true));
+  rt.on('requests:new_count', (j)=>{ document.querySelector('#newCount').textContent = j.count ?? 0; });
+}
+pollCount(true);
 
 // ====== REQUESTS ======
 (function initRequests(){
@@ -249,8 +261,11 @@ loadCount(); setInterval(loadCount, 5000);
     renderTimeline();
   }
   function sortForDay(a, b){
+    // sort_key angka (data lama) selalu sebelum string fraksional, sama seperti urutan Mongo
     const ak = (a.sort_key ?? 0), bk = (b.sort_key ?? 0);
-    if (ak !== bk) return ak - bk;
+    const as = typeof ak === 'string', bs = typeof bk === 'string';
+    if (as !== bs) return as ? 1 : -1;
+    if (ak !== bk) return ak < bk ? -1 : 1;
     return (a.start_hhmm||'').localeCompare(b.start_hhmm||'');
   }
   function isLiveSlot(day, start, end){
@@ -23,24 +23,39 @@
   function escapeHtmlAdmin(s){ return (s||'').replace(/[&<>"']/g, c => ({'&':'&amp;','<':'&lt;','>':'&gt;','"':'&quot;'}[c])); }
   function hhmmValid(s){ return /^\d{2}:\d{2}$/.test(s); }
 
+  function setCount(n){
+    const el = document.querySelector('#newCount');
+    if (el) el.textContent = n ?? 0;
+  }
   async function loadCount(){
     try{
       const r = await fetch('/api/admin/requests/new_count', { cache:'no-store' });
       const j = await r.json();
-      const el = document.querySelector('#newCount');
-      if (el) el.textContent = j.count ?? 0;
+      setCount(j.count);
     }catch{
-      const el = document.querySelector('#newCount');
-      if (el) el.textContent = '0';
+      setCount(0);
     }
   }
 
+  // Badge realtime lewat Socket.IO; polling hanya jalan kalau socket putus
+  let countTimer = null;
+  function pollCount(on){
+    if(on && !countTimer){ loadCount(); countTimer = setInterval(loadCount, 5000); }
+    if(!on && countTimer){ clearInterval(countTimer); countTimer = null; }
+  }
+  const rt = window.io ? window.io({ transports: ['websocket', 'polling'] }) : null;
+  if(rt){
+    rt.on('connect', ()=>{ pollCount(false); rt.emit('join', { room:'admin' }); });
+    rt.on('disconnect', ()=> pollCount(true));
+    rt.on('requests:new_count', (j)=> setCount(j.count));
+  }
+
   // Toggle sidebar (mobile)
   const btn = document.getElementById('btnToggle');
   const sidebar = document.getElementById('sidebar');
   btn?.addEventListener('click', ()=> sidebar.classList.toggle('open'));
   sidebar?.querySelectorAll('a').forEach(a=> a.addEventListener('click', ()=> sidebar.classList.remove('open')));
 
-  window.App = { TZ_WIB, dayNames, showToast, fmtRange, escapeHtmlAdmin, hhmmValid, loadCount };
-  loadCount(); setInterval(loadCount, 5000);
+  window.App = { TZ_WIB, dayNames, showToast, fmtRange, escapeHtmlAdmin, hhmmValid, loadCount, rt };
+  pollCount(true);
 })();
@@ -3,21 +3,25 @@ const chatBody = document.getElementById('chatBody');
 if (chatBody){
   const chatReload = document.getElementById('chatReload');
   const chatFlagOnly = document.getElementById('chatFlagOnly');
+  const chatSearch = document.getElementById('chatSearch');
 
   async function loadChatList(){
-    const qs = chatFlagOnly.checked ? '?flagged=1&limit=200' : '?limit=200';
-    const r = await fetch('/api/admin/chat'+qs, { cache:'no-store' });
+    const qs = new URLSearchParams({ limit: '200' });
+    if (chatFlagOnly.checked) qs.set('flagged', '1');
+    const term = (chatSearch?.value || '').trim();
+    if (term) qs.set('q', term);
+    const r = await fetch('/api/admin/chat?'+qs, { cache:'no-store' });
     const j = await r.json();
     chatBody.innerHTML = '';
     (j.items||[]).forEach(it=>{
       const timeString = new Date(it.ts).toLocaleString('id-ID', { timeZone: TZ_WIB, hour12:false });
       const tr = document.createElement('tr');
       tr.innerHTML = `
-        <td>${timeString} WIB</td>
+        <td>${timeString} WIB${it.archived ? ' <span class="status" title="Dari arsip">Arsip</span>' : ''}</td>
         <td>${escapeHtmlAdmin(it.name)}</td>
         <td>${escapeHtmlAdmin(it.text)}</td>
         <td>${escapeHtmlAdmin(it.ip||'-')}</td>
-        <td>${it.flagged ? '<span class="status s-prog">Flagged</span>' : '-'}</td>
+        <td>${it.flagged ? `<span class="status s-prog" title="${escapeHtmlAdmin((it.flag_terms||[]).join(', '))}">Flagged</span>` : '-'}</td>
         <td><button data-del="${it._id}">Hapus</button></td>`;
       tr.querySelector('[data-del]').addEventListener('click', async (e)=>{
         const id = e.currentTarget.dataset.del;
@@ -32,7 +36,10 @@ if (chatBody){
     });
   }
   chatReload?.addEventListener('click', loadChatList);
+  document.getElementById('chatExport')?.addEventListener('click', ()=> window.open('/api/admin/export/chat?format=csv','_blank'));
   chatFlagOnly?.addEventListener('change', loadChatList);
+  let searchTimer;
+  chatSearch?.addEventListener('input', ()=>{ clearTimeout(searchTimer); searchTimer = setTimeout(loadChatList, 300); });
   setInterval(loadChatList, 5000);
   loadChatList();
 }
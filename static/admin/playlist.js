@@ -41,7 +41,14 @@ if (plTimelineWrap){
     plDaySel.value = String(activeDay);
     renderTimeline();
   }
-  const sortForDay = (a,b) => (a.sort_key??0)-(b.sort_key??0) || (a.start_hhmm||'').localeCompare(b.start_hhmm||'');
+  // sort_key bisa angka (data lama) atau string fraksional; angka selalu di depan (urutan Mongo)
+  function cmpKey(x, y){
+    x = x ?? 0; y = y ?? 0;
+    const tx = typeof x === 'string', ty = typeof y === 'string';
+    if(tx !== ty) return tx ? 1 : -1;
+    return x < y ? -1 : (x > y ? 1 : 0);
+  }
+  const sortForDay = (a,b) => cmpKey(a.sort_key, b.sort_key) || (a.start_hhmm||'').localeCompare(b.start_hhmm||'');
   function isLiveSlot(day, start, end){
     try{ const now=new Date(), nowWIB=new Date(now.toLocaleString('en-US',{timeZone:'Asia/Jakarta'}));
       const nowDay=(nowWIB.getDay()+6)%7; if(nowDay!==day) return false;
@@ -49,8 +56,10 @@ if (plTimelineWrap){
       const mins=nowWIB.getHours()*60+nowWIB.getMinutes(); const s=sh*60+sm,e=eh*60+em; return mins>=s && mins<e;
     }catch{return false;}
   }
-  async function sendReorder(day, ids){
-    const r = await fetch('/api/admin/playlist/reorder', { method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify({ day, ids }) });
+  // pindah satu slot: cukup kirim tetangga barunya, server hanya mengubah item ini
+  async function sendMove(day, id, prevId, nextId){
+    const r = await fetch('/api/admin/playlist/'+id+'/move', { method:'POST', headers:{'Content-Type':'application/json'},
+      body: JSON.stringify({ day, prev_id: prevId, next_id: nextId }) });
     const j = await r.json(); if(!j.ok) throw new Error(j.error||'Gagal menyimpan urutan.');
   }
   async function moveItem(day, id, delta){
@@ -58,7 +67,7 @@ if (plTimelineWrap){
     const idx = arr.findIndex(x=>x._id===id); const to = idx+delta;
     if(idx<0 || to<0 || to>=arr.length) return;
     const ids=arr.map(x=>x._id); const [pick]=ids.splice(idx,1); ids.splice(to,0,pick);
-    try{ await sendReorder(day, ids); await loadPlaylist(); setActiveDay(day); showToast('Urutan diperbarui.'); }catch(e){ showToast(e.message||'Gagal mengurutkan.', true); }
+    try{ await sendMove(day, id, ids[to-1] || null, ids[to+1] || null); await loadPlaylist(); setActiveDay(day); showToast('Urutan diperbarui.'); }catch(e){ showToast(e.message||'Gagal mengurutkan.', true); }
   }
   function renderTimeline(){
     plTimelineWrap.innerHTML=''; const day=activeDay;
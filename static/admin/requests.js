@@ -1,4 +1,4 @@
-const { TZ_WIB, showToast } = window.App;
+const { TZ_WIB, showToast, escapeHtmlAdmin } = window.App;
 const tbody = document.getElementById('tbody');
 if (tbody) {
   const fstatus = document.getElementById('fstatus');
@@ -6,8 +6,14 @@ if (tbody) {
   const prevBtn = document.getElementById('prevPage');
   const nextBtn = document.getElementById('nextPage');
   const pageInfo = document.getElementById('pageInfo');
+  const ytBatchBtn = document.getElementById('ytBatchBtn');
 
   let allRequests = [], currentPage = 1; const PAGE_SIZE = 10;
+  // data diambil per batch (keyset cursor), lalu disinkron pakai delta updated_since
+  const FETCH_SIZE = 100;
+  const FIELDS = 'name,phone,title,status,created_at,updated_at';
+  let nextCursor = null, syncSince = null;
+  const ytLinks = {}; // request_id → url video YouTube
 
   const pill = (status) => (
     status === 'New' ? '<span class="status s-new">New</span>' :
@@ -19,9 +25,9 @@ if (tbody) {
     const total = allRequests.length;
     const totalPages = Math.max(1, Math.ceil(total / PAGE_SIZE));
     currentPage = Math.min(Math.max(currentPage,1), totalPages);
-    pageInfo.textContent = `Page ${currentPage}/${totalPages}`;
+    pageInfo.textContent = `Page ${currentPage}/${totalPages}${nextCursor ? '+' : ''}`;
     prevBtn.disabled = currentPage <= 1;
-    nextBtn.disabled = currentPage >= totalPages;
+    nextBtn.disabled = currentPage >= totalPages && !nextCursor;
   }
 
   function renderPage(){
@@ -34,7 +40,7 @@ if (tbody) {
         <td style="font-family:monospace">${item._id}</td>
         <td>${item.name}</td>
         <td>${item.phone || '-'}</td>
-        <td>${item.title}</td>
+        <td>${item.title}${ytLinks[item._id] ? ` <a href="${ytLinks[item._id]}" target="_blank" rel="noopener">▶</a>` : ''}</td>
         <td>${timeString} WIB</td>
         <td>${pill(item.status)}</td>
         <td>
@@ -54,26 +60,119 @@ if (tbody) {
         });
         const j = await r.json();
         showToast(j.ok ? 'Status diperbarui.' : (j.error || 'Gagal update status'), !j.ok);
-        loadData();
+        syncDelta();
       });
     });
   }
 
+  function listParams(extra){
+    const p = new URLSearchParams({ fields: FIELDS, ...extra });
+    if(fstatus.value) p.set('status', fstatus.value);
+    return p;
+  }
+
   async function loadData(){
-    const qs = fstatus.value ? `?status=${encodeURIComponent(fstatus.value)}` : '';
-    const res = await fetch('/api/admin/requests'+qs, { cache:'no-store' });
+    const res = await fetch('/api/admin/requests?'+listParams({ limit: FETCH_SIZE }), { cache:'no-store' });
     const data = await res.json();
     allRequests = data.items || [];
+    nextCursor = data.next_cursor || null;
+    syncSince = data.next_updated_since || null;
     currentPage = 1;
     renderPage();
     window.App.loadCount(); // refresh badge
   }
 
+  async function loadMore(){
+    if(!nextCursor) return;
+    const res = await fetch('/api/admin/requests?'+listParams({ limit: FETCH_SIZE, cursor: nextCursor }), { cache:'no-store' });
+    const data = await res.json();
+    if(!data.ok) return;
+    const known = new Set(allRequests.map(x=>x._id));
+    (data.items||[]).forEach(it=>{ if(!known.has(it._id)) allRequests.push(it); });
+    nextCursor = data.next_cursor || null;
+  }
+
+  // hanya ambil request baru / yang status-nya berubah sejak sync terakhir
+  async function syncDelta(){
+    if(!syncSince) return loadData();
+    const p = new URLSearchParams({ fields: FIELDS, updated_since: syncSince, limit: 500 });
+    const res = await fetch('/api/admin/requests?'+p, { cache:'no-store' });
+    const data = await res.json();
+    if(!data.ok) return;
+    syncSince = data.next_updated_since || syncSince;
+    let changed = false;
+    (data.items||[]).forEach(it=>{
+      const idx = allRequests.findIndex(x=>x._id===it._id);
+      const match = !fstatus.value || it.status === fstatus.value;
+      if(idx >= 0){
+        if(match){ changed = changed || allRequests[idx].status !== it.status; allRequests[idx] = it; }
+        else { allRequests.splice(idx, 1); changed = true; }
+      }else if(match){
+        allRequests.push(it); changed = true;
+      }
+    });
+    if(changed){
+      allRequests.sort((a,b)=> (new Date(b.created_at) - new Date(a.created_at)) || (a._id < b._id ? 1 : -1));
+      renderPage();
+      window.App.loadCount();
+    }
+    if(data.has_more) syncDelta();
+  }
+
+  async function resolveYouTubeBatch(){
+    ytBatchBtn.disabled = true;
+    try{
+      const r = await fetch('/api/tools/yt/find_batch', {
+        method:'POST', headers:{'Content-Type':'application/json'},
+        body: JSON.stringify({ status:'New' })
+      });
+      const j = await r.json();
+      if(!j.ok) throw new Error(j.error || 'Gagal mencari link YouTube');
+      let found = 0;
+      (j.items||[]).forEach(it=>{
+        if(!it.ok) return;
+        found++;
+        (it.request_ids||[]).forEach(id=> ytLinks[id] = it.url);
+      });
+      showToast(`Link YouTube ditemukan: ${found}/${(j.items||[]).length} judul.`);
+      renderPage();
+    }catch(err){ showToast(err.message || 'Gagal mencari link YouTube', true); }
+    finally{ ytBatchBtn.disabled = false; }
+  }
+
   prevBtn.addEventListener('click', ()=>{ currentPage--; renderPage(); });
-  nextBtn.addEventListener('click', ()=>{ currentPage++; renderPage(); });
+  nextBtn.addEventListener('click', async ()=>{
+    if(currentPage * PAGE_SIZE >= allRequests.length && nextCursor) await loadMore();
+    currentPage++; renderPage();
+  });
   fstatus.addEventListener('change', loadData);
   refreshBtn.addEventListener('click', loadData);
+  document.getElementById('exportBtn')?.addEventListener('click', ()=> window.open('/api/admin/export/requests?format=csv','_blank'));
+  ytBatchBtn?.addEventListener('click', resolveYouTubeBatch);
+
+  // ===== Top request (judul mirip digabung di server) =====
+  const topWindow = document.getElementById('topWindow');
+  const topList = document.getElementById('topList');
+  const topInfo = document.getElementById('topInfo');
+  async function loadTop(){
+    if(!topList) return;
+    try{
+      const r = await fetch(`/api/admin/requests/top?window=${topWindow.value}&limit=10&members=0`, { cache:'no-cache' });
+      const j = await r.json();
+      if(!j.ok) return;
+      topInfo.textContent = !j.window ? 'Tidak ada acara yang sedang tayang.'
+        : (j.window.kind === 'show' ? `${j.window.title} • ${j.total} request` : `${j.total} request`);
+      topList.innerHTML = (j.groups||[]).map(g=>{
+        const variants = g.titles.map(t=>`${t.title} (${t.count})`).join(', ');
+        return `<li title="${escapeHtmlAdmin(variants)}"><strong>${escapeHtmlAdmin(g.label)}</strong> — ${g.count}×</li>`;
+      }).join('');
+    }catch(e){ /* panel opsional, abaikan */ }
+  }
+  topWindow?.addEventListener('change', loadTop);
 
   loadData();
-  setInterval(()=>{ if(!fstatus.value || fstatus.value==='New') loadData(); }, 5000);
+  loadTop();
+  setInterval(syncDelta, 5000);
+  setInterval(loadTop, 15000);
+  window.App.rt?.on('requests:new_count', ()=>{ syncDelta(); loadTop(); }); // ada request baru → sinkron segera
 }
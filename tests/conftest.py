@@ -0,0 +1,30 @@
+"""
+Test memakai mongomock sebagai pengganti MongoDB (pip install -r bench/requirements.txt).
+app di-import sekali dengan pymongo.MongoClient diganti mongomock.MongoClient;
+tanpa flask/mongomock semua test di-skip.
+"""
+import os
+import sys
+
+import pytest
+
+os.environ.setdefault("MONGODB_INDEX_BOOTSTRAP", "off")
+os.environ.setdefault("STREAM_MODE", "direct")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def app_module():
+    pytest.importorskip("flask")
+    pytest.importorskip("flask_socketio")
+    mongomock = pytest.importorskip("mongomock")
+    import pymongo
+    pymongo.MongoClient = mongomock.MongoClient
+    import app
+    app._bg_started = True  # tanpa worker background (poller Icecast, archiver, ...) saat test
+    return app
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
@@ -0,0 +1,83 @@
+FRAME_S = 1152 / 44100  # MPEG1 layer 3, 44.1 kHz
+
+
+def _frame(i: int, pad: int) -> bytes:
+    # 128 kbps: 144 * 128000 // 44100 = 417 byte (+1 kalau padding)
+    header = bytes([0xFF, 0xFB, 0x90 | (pad << 1), 0x00])
+    body = bytes([i % 250, i // 250]) + b"\x00" * (417 + pad - 6)
+    return header + body
+
+
+def _id3v2(size: int) -> bytes:
+    ss = bytes([(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F])
+    return b"ID3\x04\x00\x00" + ss + b"\x00" * size
+
+
+def _mp3(n_frames: int, junk: bytes = b"", xing: bool = False) -> bytes:
+    frames = [_frame(i, i % 3 == 0) for i in range(n_frames)]
+    if xing:
+        x = bytearray(_frame(0, 0))
+        info = b"Xing" + (1 | 4).to_bytes(4, "big") + n_frames.to_bytes(4, "big") + bytes(range(0, 250, 2)[:100])
+        x[36:36 + len(info)] = info
+        frames.insert(0, bytes(x))
+    return _id3v2(64) + junk + b"".join(frames) + b"TAG" + b"\x00" * 125
+
+
+def _frames_in(app_module, clip: bytes) -> list:
+    out, i = [], 0
+    while i < len(clip):
+        fr = app_module._mp3_frame(clip, i)
+        assert fr is not None, f"bukan batas frame di offset {i}"
+        out.append(clip[i + 4] + clip[i + 5] * 250)
+        i += fr[0]
+    assert i == len(clip)
+    return out
+
+
+def test_clip_starts_and_ends_on_frame_boundaries(app_module):
+    data = _mp3(2000, junk=b"\xff\xfb\x90\x00junk")  # sync palsu setelah ID3
+    clip = app_module._mp3_clip(data, 10.0, 5.0)
+    idx = _frames_in(app_module, clip)
+    assert idx == list(range(idx[0], idx[0] + len(idx)))  # frame asli berurutan, tanpa lompat
+    assert abs(idx[0] * FRAME_S - 10.0) < 0.1
+    assert abs(len(idx) * FRAME_S - 5.0) < FRAME_S
+
+
+def test_clip_from_zero_skips_id3_junk_and_id3v1(app_module):
+    data = _mp3(100, junk=b"\xff\xfb\x90\x00junk")
+    clip = app_module._mp3_clip(data, 0.0, 60.0)  # lebih panjang dari file
+    assert _frames_in(app_module, clip) == list(range(100))
+    assert b"TAG" not in clip[-128:]
+
+
+def test_clip_start_is_clamped_to_fit_duration(app_module):
+    clip = app_module._mp3_clip(_mp3(500), 3600.0, 5.0)
+    idx = _frames_in(app_module, clip)
+    assert idx[-1] == 499
+    assert abs(len(idx) * FRAME_S - 5.0) < FRAME_S
+
+
+def test_clip_never_includes_xing_header_frame(app_module):
+    data = _mp3(1000, xing=True)
+    for start in (0.0, 8.0):
+        clip = app_module._mp3_clip(data, start, 3.0)
+        assert b"Xing" not in clip  # header VBR file penuh bikin durasi klip salah di player
+        _frames_in(app_module, clip)
+
+
+def test_preview_endpoint_caches_and_serves_ranges(app_module, client, monkeypatch, tmp_path):
+    (tmp_path / "lagu.mp3").write_bytes(_mp3(2000))
+    monkeypatch.setattr(app_module, "MUSIC_DIR", str(tmp_path))
+    monkeypatch.setattr(app_module, "audio_preview_cache", app_module.TTLCache(4, 60))
+    built = []
+    real = app_module._mp3_clip
+    monkeypatch.setattr(app_module, "_mp3_clip", lambda *a: built.append(1) or real(*a))
+
+    r = client.get("/audio/preview/lagu.mp3", query_string={"start": 5, "dur": 4})
+    assert r.status_code == 200 and r.mimetype == "audio/mpeg"
+    full = r.data
+    r2 = client.get("/audio/preview/lagu.mp3", query_string={"start": 5, "dur": 4},
+                    headers={"Range": "bytes=100-199"})
+    assert r2.status_code == 206 and r2.data == full[100:200]
+    assert built == [1]
+    assert client.get("/audio/preview/../etc/passwd.mp3").status_code == 404
@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+
+
+def test_poll_sees_message_written_by_other_worker(app_module, client):
+    client.post("/api/chat/send", json={"name": "a", "text": "dari worker ini"})
+    first = client.get("/api/chat/messages").get_json()["items"]
+    since = first[-1]["ts"]
+
+    # pesan dari worker lain: langsung ke Mongo, tidak lewat chat_ring proses ini
+    app_module.col_chat.insert_one({
+        "_id": ObjectId(), "ip": "x", "name": "b", "text": "dari worker lain",
+        "ts": datetime.now(timezone.utc) + timedelta(seconds=1), "flagged": False,
+    })
+    app_module._chat_poll_cache.pop("latest")  # = CHAT_POLL_CACHE_SECONDS lewat
+    items = client.get("/api/chat/messages", query_string={"since": since}).get_json()["items"]
+    assert [it["text"] for it in items] == ["dari worker lain"]
+
+
+
+def test_poll_older_than_window_falls_back_to_mongo(app_module, client, monkeypatch):
+    app_module.col_chat.delete_many({})
+    monkeypatch.setattr(app_module, "CHAT_POLL_WINDOW", 3)
+    app_module._chat_poll_cache.pop("latest")
+    t0 = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+    app_module.col_chat.insert_many([
+        {"_id": ObjectId(), "ip": "x", "name": "a", "text": f"m{i}", "ts": t0 + timedelta(seconds=i), "flagged": False}
+        for i in range(6)
+    ])
+    latest = client.get("/api/chat/messages").get_json()["items"]
+    assert [it["text"] for it in latest] == ["m3", "m4", "m5"]
+
+    since = app_module.to_utc_iso(t0)
+    items = client.get("/api/chat/messages", query_string={"since": since}).get_json()["items"]
+    assert [it["text"] for it in items] == ["m1", "m2", "m3", "m4", "m5"]
+    items = client.get("/api/chat/messages", query_string={"since": app_module.to_utc_iso(t0 + timedelta(seconds=4))}).get_json()["items"]
+    assert [it["text"] for it in items] == ["m5"]
+
+
+def _old_msg(app_module, minutes_ago, text, now):
+    return {"_id": ObjectId(), "ip": "x", "name": "a", "text": text, "flagged": False,
+            "ts": now - timedelta(hours=app_module.CHAT_HOT_HOURS, minutes=minutes_ago)}
+
+
+def test_archive_one_document_per_message_and_rerun_safe(app_module):
+    app_module.col_chat.delete_many({})
+    app_module.col_chat_arch.delete_many({})
+    now = datetime.now(timezone.utc)
+    docs = [_old_msg(app_module, 10 + i, f"pesan {i}", now) for i in range(5)]
+    app_module.col_chat.insert_many([dict(d) for d in docs])
+
+    assert app_module.archive_chat_once(now) == 5
+    assert app_module.col_chat_arch.count_documents({}) == 5
+    assert app_module.col_chat.count_documents({}) == 0
+
+    # proses mati setelah insert arsip tapi sebelum delete: dijalankan ulang tidak macet / dobel
+    app_module.col_chat.insert_many([dict(d) for d in docs])
+    assert app_module.archive_chat_once(now) == 5
+    assert app_module.col_chat_arch.count_documents({}) == 5
+    arch = app_module.col_chat_arch.find_one({"_id": docs[0]["_id"]})
+    assert app_module._as_utc(arch["bucket"]) == app_module._chat_bucket(docs[0]["ts"])
+
+
+def test_legacy_hour_buckets_are_split(app_module, monkeypatch):
+    app_module.col_chat.delete_many({})
+    app_module.col_chat_arch.delete_many({})
+    now = datetime.now(timezone.utc)
+    msgs = [_old_msg(app_module, 90 + i, f"lama {i}", now) for i in range(3)]
+    hour = app_module._chat_bucket(msgs[0]["ts"]).replace(tzinfo=None)  # seperti yang dibaca balik dari Mongo
+    app_module.col_chat_arch.insert_one({"_id": hour, "messages": msgs})
+    monkeypatch.setattr(app_module, "_chat_archive_migrated", False)
+
+    app_module.archive_chat_once(now)
+    assert app_module.col_chat_arch.count_documents({"messages": {"$exists": True}}) == 0
+    texts = [m["text"] for m in app_module.iter_chat_archive(newest_first=False)]
+    assert sorted(texts) == ["lama 0", "lama 1", "lama 2"]
+
+
+def _admin(app_module, client):
+    with client.session_transaction() as sess:
+        sess["is_admin"] = True
+    return client
+
+
+def test_admin_chat_pages_through_same_ts_into_archive(app_module, client):
+    app_module.col_chat.delete_many({})
+    app_module.col_chat_arch.delete_many({})
+    ts = datetime(2026, 1, 1, 12, 0, 0, 123000, tzinfo=timezone.utc)
+    # ts sama persis; pesan arsip dibuat lebih dulu → _id lebih kecil dari semua pesan hot
+    arch = [{"_id": ObjectId(), "ip": "x", "name": "a", "text": f"arsip {i}", "ts": ts, "flagged": False}
+            for i in range(2)]
+    hot = [{"_id": ObjectId(), "ip": "x", "name": "a", "text": f"hot {i}", "ts": ts, "flagged": False}
+           for i in range(3)]
+    app_module.col_chat.insert_many(hot)
+    app_module.col_chat_arch.insert_many([app_module._chat_archive_doc(d) for d in arch])
+
+    _admin(app_module, client)
+    seen, cursor = [], None
+    for _ in range(10):
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        j = client.get("/api/admin/chat", query_string=params).get_json()
+        seen += [it["text"] for it in j["items"]]
+        cursor = j["next_cursor"]
+        if not cursor:
+            break
+    assert seen == ["hot 2", "hot 1", "hot 0", "arsip 1", "arsip 0"]
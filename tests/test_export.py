@@ -0,0 +1,101 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+
+
+def _admin(client):
+    with client.session_transaction() as sess:
+        sess["is_admin"] = True
+    return client
+
+
+def _msg(ts, text):
+    return {"_id": ObjectId(), "ip": "x", "name": "a", "text": text, "ts": ts, "flagged": False}
+
+
+def test_chat_export_closes_archive_cursor_on_disconnect(app_module, client, monkeypatch):
+    app_module.col_chat.delete_many({})
+    app_module.col_chat_arch.delete_many({})
+    t0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    n = app_module.EXPORT_CHUNK_ROWS * 3
+    app_module.col_chat_arch.insert_many(
+        [app_module._chat_archive_doc(_msg(t0 + timedelta(seconds=i), f"a{i}")) for i in range(n)])
+    app_module.col_chat.insert_one(_msg(t0 + timedelta(days=1), "hot"))
+
+    closed, gens = [], []  # gens: tahan referensi supaya penutupan bukan kebetulan dari GC
+    real = app_module.iter_chat_archive
+
+    def tracked(*a, **kw):
+        try:
+            yield from real(*a, **kw)
+        finally:
+            closed.append("archive")
+
+    def make(*a, **kw):
+        g = tracked(*a, **kw)
+        gens.append(g)
+        return g
+    monkeypatch.setattr(app_module, "iter_chat_archive", make)
+
+    resp = _admin(client).get("/api/admin/export/chat", query_string={"format": "ndjson"}, buffered=False)
+    assert resp.status_code == 200
+    first = next(iter(resp.response))
+    assert b'"a0"' in first
+    resp.close()  # client putus di tengah arsip
+    assert closed == ["archive"]
+
+
+def _req(ts, i, title):
+    return {"_id": ObjectId(), "name": f"n{i}", "phone": "081234567890", "title": title,
+            "status": "New", "created_at": ts, "updated_at": ts}
+
+
+def test_requests_csv_has_header_rows_and_respects_bounds(app_module, client):
+    app_module.col_requests.delete_many({})
+    t0 = datetime(2026, 2, 1, 12, 0, tzinfo=timezone.utc)
+    titles = ['Lagu, "koma"', "Baris\nbaru", "Biasa", "Hari lain"]
+    docs = [_req(t0 + timedelta(minutes=i), i, t) for i, t in enumerate(titles[:3])]
+    docs.append(_req(t0 + timedelta(days=1), 3, titles[3]))
+    app_module.col_requests.insert_many(docs)
+
+    r = _admin(client).get("/api/admin/export/requests", query_string={"from": "2026-02-01", "to": "2026-02-01"})
+    assert r.status_code == 200 and r.mimetype == "text/csv"
+    assert "haloradio_requests.csv" in r.headers["Content-Disposition"]
+    rows = list(csv.reader(io.StringIO(r.get_data(as_text=True))))
+    assert rows[0] == app_module.EXPORT_KINDS["requests"]["columns"]
+    assert [row[rows[0].index("title")] for row in rows[1:]] == titles[:3]  # 'to' tanggal = sampai akhir hari
+    assert rows[1][0] == str(docs[0]["_id"])
+
+    r = client.get("/api/admin/export/requests", query_string={"from": "2026-02-01T12:01:00Z",
+                                                               "to": "2026-02-01T12:02:00Z"})
+    rows = list(csv.reader(io.StringIO(r.get_data(as_text=True))))
+    assert [row[rows[0].index("title")] for row in rows[1:]] == ["Baris\nbaru"]  # 'to' ISO eksklusif
+
+
+def test_chat_ndjson_streams_archive_then_hot_in_order(app_module, client):
+    app_module.col_chat.delete_many({})
+    app_module.col_chat_arch.delete_many({})
+    t0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    n = app_module.EXPORT_CHUNK_ROWS + 5  # lebih dari satu chunk
+    app_module.col_chat_arch.insert_many(
+        [app_module._chat_archive_doc(_msg(t0 + timedelta(seconds=i), f"a{i}")) for i in range(n)])
+    app_module.col_chat.insert_many([_msg(t0 + timedelta(days=1, seconds=i), f"h{i}") for i in range(3)])
+
+    r = _admin(client).get("/api/admin/export/chat", query_string={"format": "ndjson"})
+    assert r.status_code == 200
+    items = [json.loads(line) for line in r.get_data(as_text=True).splitlines()]
+    assert [it["text"] for it in items] == [f"a{i}" for i in range(n)] + ["h0", "h1", "h2"]
+    assert set(items[0]) == set(app_module.EXPORT_KINDS["chat"]["columns"])
+
+    r = client.get("/api/admin/export/chat", query_string={"format": "ndjson", "from": "2026-01-02"})
+    assert [json.loads(line)["text"] for line in r.get_data(as_text=True).splitlines()] == ["h0", "h1", "h2"]
+
+
+def test_export_rejects_bad_params(client):
+    _admin(client)
+    assert client.get("/api/admin/export/lain").status_code == 404
+    assert client.get("/api/admin/export/chat", query_string={"format": "xml"}).status_code == 400
+    assert client.get("/api/admin/export/chat", query_string={"from": "kemarin"}).status_code == 400
@@ -0,0 +1,117 @@
+import random
+import threading
+
+
+def _meta_block(text: bytes) -> bytes:
+    if not text:
+        return b"\x00"
+    n = -(-len(text) // 16)
+    return bytes([n]) + text.ljust(n * 16, b"\x00")
+
+
+def _icy_stream(metaint, titles):
+    """Audio + metadata ICY; title None = blok kosong (judul tidak berubah)."""
+    audio, out = bytearray(), bytearray()
+    for i, t in enumerate(titles):
+        block = bytes((i * 7 + j) % 251 for j in range(metaint))
+        audio += block
+        out += block
+        out += _meta_block(b"" if t is None else b"StreamTitle='" + t + b"';")
+    return bytes(out), bytes(audio)
+
+
+TITLES = [b"Satu", None, b"Dua - Penyanyi", b"Don't Stop", None, "Lagu Ñ".encode("utf-8"), b"x" * 40]
+
+
+def _split(data, sizes):
+    i = 0
+    for n in sizes:
+        if i >= len(data):
+            return
+        yield data[i:i + n]
+        i += n
+    if i < len(data):
+        yield data[i:]
+
+
+def _demux_all(app_module, metaint, chunks):
+    d = app_module.IcyDemuxer(metaint)
+    audio, metas = bytearray(), []
+    for c in chunks:
+        pieces, m = d.feed(c)
+        for p in pieces:
+            audio += p
+        metas += m
+    return bytes(audio), metas
+
+
+def test_demuxer_handles_any_chunk_split(app_module):
+    metaint = 32
+    stream, want_audio = _icy_stream(metaint, TITLES)
+    want_titles = [t.decode("utf-8") for t in TITLES if t is not None]
+    rnd = random.Random(25)
+    splits = [[1] * len(stream), [2] * len(stream), [metaint - 1] * len(stream), [metaint + 1] * len(stream),
+              [len(stream)]] + [[rnd.randint(1, 50) for _ in range(len(stream))] for _ in range(30)]
+    for sizes in splits:
+        audio, metas = _demux_all(app_module, metaint, _split(stream, sizes))
+        assert audio == want_audio
+        assert [app_module.parse_icy_title(m) for m in metas] == want_titles
+
+
+def test_parse_icy_title(app_module):
+    p = app_module.parse_icy_title
+    assert p(b"StreamTitle='Artis - Lagu';\x00\x00") == "Artis - Lagu"
+    assert p(b"StreamTitle='Don't Stop';StreamUrl='http://x';") == "Don't Stop"
+    assert p("StreamTitle='Café';".encode("latin-1")) == "Café"
+    assert p(b"StreamTitle='';") == ""
+    assert p(b"StreamUrl='http://x';") is None
+
+
+class _IcyUpstream:
+    def __init__(self, chunks, metaint):
+        self.ok = True
+        self.headers = {"content-type": "audio/mpeg", "icy-metaint": str(metaint)}
+        self.chunks = chunks
+        self.done = threading.Event()
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        yield from self.chunks
+        self.done.wait(5)  # tahan koneksi sampai test selesai
+
+    def close(self):
+        self.done.set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def test_relay_strips_metadata_and_reports_titles(app_module, monkeypatch):
+    metaint = 32
+    stream, want_audio = _icy_stream(metaint, TITLES)
+    up = _IcyUpstream(list(_split(stream, [13] * len(stream))), metaint)
+    sent_headers = {}
+
+    def get(url, stream=None, timeout=None, headers=None):
+        sent_headers.update(headers or {})
+        return up
+    monkeypatch.setattr(app_module.pyrequests, "get", get)
+    relay = app_module.StreamRelay("http://fake/stream", chunk_size=13, buffer_bytes=1 << 16,
+                                   burst_bytes=1 << 16, client_timeout=0.5, idle_s=0, icy=True)
+    titles = []
+    relay.on_title(titles.append)
+
+    audio = relay.subscribe(5)
+    got = bytearray()
+    for data in audio:  # berakhir saat client_timeout (upstream diam)
+        got += data
+    up.close()
+    assert sent_headers.get("Icy-MetaData") == "1"
+    assert bytes(got) == want_audio
+    want_titles = [t.decode("utf-8") for t in TITLES if t is not None]
+    assert titles[:len(want_titles)] == want_titles  # sesudahnya boleh None (relay berhenti)
@@ -0,0 +1,59 @@
+import pytest
+from pymongo.errors import AutoReconnect, OperationFailure
+
+
+class _FakeDB:
+    def __init__(self):
+        self.commands = []
+
+    def command(self, *args, **kwargs):
+        self.commands.append((args, kwargs))
+
+
+class _FakeCol:
+    name = "chat_rate_limiter"
+
+    def __init__(self, code):
+        self.code = code
+        self.database = _FakeDB()
+
+    def create_index(self, keys, **kwargs):
+        raise OperationFailure("Index already exists with different options", code=self.code)
+
+
+def test_ttl_change_is_applied_with_collmod(app_module):
+    col = _FakeCol(85)
+    app_module._ensure_ttl_index(col, [("ts", 1)], 240)
+    assert col.database.commands == [(("collMod", "chat_rate_limiter"),
+                                      {"index": {"keyPattern": {"ts": 1}, "expireAfterSeconds": 240}})]
+
+
+def test_other_operation_failures_still_raise(app_module):
+    with pytest.raises(OperationFailure):
+        app_module._ensure_ttl_index(_FakeCol(13), [("ts", 1)], 240)
+
+
+def _no_sleep(*a, **kw):
+    raise AssertionError("bootstrap tidak boleh retry")
+
+
+def test_bootstrap_stops_on_index_conflict(app_module, monkeypatch):
+    def conflict(force=False):
+        raise OperationFailure("IndexOptionsConflict", code=85)
+    monkeypatch.setattr(app_module, "ensure_indexes", conflict)
+    monkeypatch.setattr(app_module.socketio, "sleep", _no_sleep)
+    app_module._index_bootstrap()  # return, bukan loop selamanya
+
+
+def test_bootstrap_retries_connection_errors(app_module, monkeypatch):
+    calls = []
+
+    def flaky(force=False):
+        calls.append(1)
+        if len(calls) == 1:
+            raise AutoReconnect("mongo belum siap")
+        return True
+    monkeypatch.setattr(app_module, "ensure_indexes", flaky)
+    monkeypatch.setattr(app_module.socketio, "sleep", lambda s: None)
+    app_module._index_bootstrap()
+    assert len(calls) == 2
@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+
+@pytest.fixture
+def window(app_module):
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    w = app_module._RequestWindow("test", start, start + timedelta(days=1), {})
+    n = iter(range(10_000))
+
+    def add(title):
+        norm = app_module.normalize_title(title)
+        w.add(f"r{next(n)}", title, norm, app_module.title_fingerprint(norm), start + timedelta(minutes=1))
+
+    w.add_title = add
+    return w
+
+
+def _group_of(w, title):
+    for gid, g in w.groups.items():
+        if title in g["titles"]:
+            return gid
+    raise AssertionError(title)
+
+
+def test_short_title_does_not_merge_two_songs(window):
+    window.add_title("Cinta Luar Biasa - Andmesh")
+    window.add_title("Cinta Sejati - BCL")
+    window.add_title("Cinta")
+    assert len(window.groups) == 3
+    assert _group_of(window, "Cinta Luar Biasa - Andmesh") != _group_of(window, "Cinta Sejati - BCL")
+
+
+def test_short_title_first_does_not_absorb_other_songs(window):
+    window.add_title("Cinta")
+    window.add_title("Cinta Luar Biasa - Andmesh")
+    window.add_title("Cinta Sejati - BCL")
+    assert _group_of(window, "Cinta Luar Biasa - Andmesh") != _group_of(window, "Cinta Sejati - BCL")
+
+
+def test_artist_only_request_does_not_collapse_catalog(window):
+    window.add_title("Iwan Fals")
+    for title in ("Bento - Iwan Fals", "Ibu - Iwan Fals", "Kemesraan - Iwan Fals"):
+        window.add_title(title)
+    songs = {_group_of(window, t) for t in ("Bento - Iwan Fals", "Ibu - Iwan Fals", "Kemesraan - Iwan Fals")}
+    assert len(songs) == 3
+
+
+def test_core_never_shrinks(window):
+    window.add_title("Cinta Luar Biasa - Andmesh")
+    gid = _group_of(window, "Cinta Luar Biasa - Andmesh")
+    core = window.groups[gid]["core"]
+    window.add_title("Cinta Luar Biasa")
+    assert _group_of(window, "Cinta Luar Biasa") == gid
+    assert window.groups[gid]["core"] == core
+
+
+def test_same_song_variants_still_grouped(window):
+    for title in ("Cinta Luar Biasa - Andmesh", "cinta luar biasa (live)", "Andmesh - Cinta Luar Biasa",
+                  "CINTA LUAR BIASA feat. Andmesh"):
+        window.add_title(title)
+    assert len(window.groups) == 1
+    assert next(iter(window.groups.values()))["count"] == 4
+
+
+def test_add_not_blocked_by_slow_sync(app_module, monkeypatch):
+    import threading
+    import time
+
+    release = threading.Event()
+    entered = threading.Event()
+
+    class SlowCollection:
+        def find(self, *args, **kwargs):
+            entered.set()
+            release.wait(5)
+            return app_module.db["lb_test_empty"].find(*args, **kwargs)
+
+    monkeypatch.setattr(app_module, "col_requests", SlowCollection())
+    lb = app_module.RequestLeaderboard()
+    now = datetime.now(timezone.utc)
+    lb._windows["warm"] = app_module._RequestWindow("warm", now - timedelta(hours=1), now + timedelta(hours=1), {})
+
+    t = threading.Thread(target=lb.window, args=("today",))
+    t.start()
+    assert entered.wait(2)
+    t0 = time.monotonic()
+    lb.add({"_id": "x1", "title": "Bento", "title_norm": "bento", "title_fp": "fp", "created_at": now})
+    assert time.monotonic() - t0 < 0.5
+    release.set()
+    t.join(5)
+    assert lb._windows["warm"].total == 1
+
+
+def test_show_window_is_the_same_show_as_schedules_now(app_module, client):
+    app_module.col_schedules.delete_many({})
+    now = datetime.now(timezone.utc)
+    app_module.col_schedules.insert_many([
+        {"title": "Pagi", "host": "a", "description": "", "start_time": now - timedelta(hours=2),
+         "end_time": now + timedelta(hours=1)},
+        {"title": "Sisipan", "host": "b", "description": "", "start_time": now - timedelta(minutes=10),
+         "end_time": now + timedelta(minutes=20)},
+    ])
+    app_module.schedule_index.reload()
+    try:
+        item = client.get("/api/schedules/now").get_json()["item"]
+        w = app_module.request_leaderboard.window("show")
+        assert w.meta["schedule_id"] == item["_id"]
+        assert app_module.get_schedule_now()["_id"] == item["_id"]
+    finally:
+        app_module.col_schedules.delete_many({})
+        app_module.schedule_index.reload()
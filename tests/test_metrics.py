@@ -0,0 +1,22 @@
+def test_metrics_closed_by_default(client):
+    assert client.get("/metrics").status_code == 401
+
+
+def test_metrics_admin_session(client):
+    with client.session_transaction() as sess:
+        sess["is_admin"] = True
+    r = client.get("/metrics")
+    assert r.status_code == 200
+    assert b"haloradio_http_requests_total" in r.data
+
+
+def test_metrics_token(app_module, client, monkeypatch):
+    monkeypatch.setattr(app_module, "METRICS_TOKEN", "rahasia")
+    assert client.get("/metrics", headers={"Authorization": "Bearer salah"}).status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer rahasia"}).status_code == 200
+    assert client.get("/metrics", query_string={"token": "rahasia"}).status_code == 200
+
+
+def test_metrics_public_opt_in(app_module, client, monkeypatch):
+    monkeypatch.setattr(app_module, "METRICS_PUBLIC", True)
+    assert client.get("/metrics").status_code == 200
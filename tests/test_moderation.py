@@ -0,0 +1,47 @@
+import os
+import random
+
+
+def test_normalizer_folds_leet_diacritics_separators_and_repeats(app_module):
+    norm = app_module.normalize_for_moderation
+    assert norm("B.0.D.O.O.O.H") == "bodoh"
+    assert norm("bódóh") == "bodoh"
+    assert norm("b-o_d*o'h") == "bodoh"
+    assert norm("  K4$4R1   kasar2 ") == "kasari kasar2"
+
+
+def test_aho_corasick_finds_overlapping_patterns(app_module):
+    ac = app_module.AhoCorasick({w: w for w in ("he", "she", "his", "hers")})
+    assert sorted(ac.search("ushers")) == ["he", "hers", "she"]
+    assert ac.search("xyz") == []
+
+
+def test_aho_corasick_matches_naive_substring_search(app_module):
+    rnd = random.Random(5)
+    for _ in range(200):
+        words = {"".join(rnd.choice("ab") for _ in range(rnd.randint(1, 4))) for _ in range(5)}
+        text = "".join(rnd.choice("abc") for _ in range(30))
+        ac = app_module.AhoCorasick({w: w for w in words})
+        assert sorted(ac.search(text)) == sorted(w for w in words if w in text)
+
+
+def test_engine_reports_original_word_and_reloads_file(app_module, tmp_path):
+    path = tmp_path / "kata.txt"
+    path.write_text("jelek  # komentar\n", encoding="utf-8")
+    eng = app_module.ModerationEngine({"Bodoh"}, str(path), reload_s=0)
+    assert eng.match("dasar b0d000h") == ["Bodoh"]
+    assert eng.match("J.E.L.E.K sekali") == ["jelek"]
+
+    path.write_text("payah\n", encoding="utf-8")
+    st = os.stat(path)
+    os.utime(path, (st.st_atime, st.st_mtime + 10))
+    assert eng.match("payah") == ["payah"]
+    assert eng.match("jelek") == []
+
+
+def test_chat_send_flags_obfuscated_bad_word(app_module, client, monkeypatch):
+    monkeypatch.setattr(app_module, "moderation", app_module.ModerationEngine({"bodoh"}, "", 10))
+    item = client.post("/api/chat/send", json={"name": "a", "text": "kamu B-0-D-0-H"}).get_json()["item"]
+    assert item["flagged"] is True
+    doc = app_module.col_chat.find_one({"_id": app_module.ObjectId(item["_id"])})
+    assert doc["flag_terms"] == ["bodoh"]
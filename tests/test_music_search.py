@@ -0,0 +1,36 @@
+class _FakeDeezer:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, url, params=None, **kw):
+        self.queries.append(params["q"])
+
+        class R:
+            def raise_for_status(self):
+                pass
+
+            def json(self):
+                # Deezer mencocokkan fuzzy: hasil "mejikuh" tidak harus subset hasil "mejik"
+                titles = {"mejik": ["Mejikuh Cover"],
+                          "mejikuh": ["Mejikuhibiniu", "Mejikuh Cover"]}.get(params["q"].strip().lower(), [])
+                data = [{"title": t, "artist": {"name": "Tasya"}, "album": {"title": "A"}} for t in titles]
+                return {"data": data, "total": len(data)}
+        return R()
+
+
+def _search(client, q):
+    j = client.get("/api/music/search", query_string={"q": q}).get_json()
+    assert j["ok"]
+    return [it["title"] for it in j["data"]]
+
+
+def test_longer_query_is_not_answered_from_shorter_cached_query(app_module, client, monkeypatch):
+    fake = _FakeDeezer()
+    monkeypatch.setattr(app_module.pyrequests, "get", fake)
+    monkeypatch.setattr(app_module, "MUSIC_SEARCH_LOCAL", "off")
+    monkeypatch.setattr(app_module, "deezer_cache", app_module.TTLCache(10, 60))
+
+    assert _search(client, "mejik") == ["Mejikuh Cover"]
+    assert _search(client, "mejikuh") == ["Mejikuhibiniu", "Mejikuh Cover"]
+    assert _search(client, "  MEJIK ") == ["Mejikuh Cover"]  # key ternormalisasi sama → dari cache
+    assert fake.queries == ["mejik", "mejikuh"]
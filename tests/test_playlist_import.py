@@ -0,0 +1,75 @@
+import io
+
+
+def _admin(client):
+    with client.session_transaction() as sess:
+        sess["is_admin"] = True
+    return client
+
+
+def _upload(client, text, mode=None):
+    data = {"file": (io.BytesIO(text.encode("utf-8")), "playlist.csv")}
+    if mode:
+        data["mode"] = mode
+    return client.post("/api/admin/playlist/csv", data=data, content_type="multipart/form-data")
+
+
+def _day(app_module, day):
+    return [d["program"] for d in app_module.col_playlist.find({"day": day}).sort("sort_key", 1)]
+
+
+def _staging_left(app_module):
+    return [n for n in app_module.db.list_collection_names() if "__import_" in n]
+
+
+def _seed(app_module):
+    app_module.col_playlist.delete_many({})
+    app_module.col_playlist.insert_many([
+        {"day": 0, "start_hhmm": "08:00", "end_hhmm": "09:00", "program": p, "tracks": "", "sort_key": k}
+        for p, k in (("Lama A", "a"), ("Lama B", "b"))])
+
+
+def test_replace_swaps_in_staged_rows(app_module, client):
+    _seed(app_module)
+    csv_text = "day_name,start_hhmm,end_hhmm,program\nSenin,10:00,11:00,Baru 1\n1,11:00,12:00,Baru 2\n"
+    j = _upload(_admin(client), csv_text, "replace").get_json()
+    assert j["ok"] and j["inserted"] == 2
+    assert _day(app_module, 0) == ["Baru 1", "Baru 2"]
+    assert app_module.col_playlist.count_documents({}) == 2
+    assert _staging_left(app_module) == []
+
+
+def test_invalid_row_leaves_playlist_untouched(app_module, client):
+    _seed(app_module)
+    csv_text = "day,start_hhmm,end_hhmm,program\n1,10:00,11:00,Baru\n1,12:00,11:00,Salah\n"
+    r = _upload(_admin(client), csv_text, "replace")
+    assert r.status_code == 400 and "Baris 3" in r.get_json()["error"]
+    assert _day(app_module, 0) == ["Lama A", "Lama B"]
+    assert _staging_left(app_module) == []
+
+
+def test_append_adds_after_existing_and_upserts_by_id(app_module, client):
+    _seed(app_module)
+    old = app_module.col_playlist.find_one({"program": "Lama A"})
+    csv_text = ("id,day,start_hhmm,end_hhmm,program\n"
+                f"{old['_id']},1,08:00,09:30,Lama A (ubah)\n"
+                ",1,20:00,21:00,Baru\n")
+    j = _upload(_admin(client), csv_text).get_json()
+    assert j["ok"] and j["inserted"] == 1 and j["updated"] == 1
+    assert _day(app_module, 0) == ["Lama A (ubah)", "Lama B", "Baru"]
+    doc = app_module.col_playlist.find_one({"_id": old["_id"]})
+    assert doc["sort_key"] == "a" and doc["end_hhmm"] == "09:30" and "_upsert" not in doc
+    assert _staging_left(app_module) == []
+
+
+def test_large_import_keeps_keys_short(app_module, client, monkeypatch):
+    app_module.col_playlist.delete_many({})
+    monkeypatch.setattr(app_module, "PLAYLIST_KEY_MAX_LEN", 2)
+    monkeypatch.setattr(app_module, "PLAYLIST_IMPORT_BATCH", 7)  # beberapa batch
+    names = [f"P{i:03d}" for i in range(150)]
+    csv_text = "day,start_hhmm,end_hhmm,program\n" + "".join(f"3,08:00,09:00,{p}\n" for p in names)
+    for mode in ("replace", "append"):
+        assert _upload(_admin(client), csv_text, mode).get_json()["ok"]
+    assert _day(app_module, 2) == names + names
+    keys = [d["sort_key"] for d in app_module.col_playlist.find({"day": 2})]
+    assert len(set(keys)) == len(keys) and max(len(k) for k in keys) <= 3
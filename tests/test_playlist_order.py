@@ -0,0 +1,103 @@
+import random
+
+import pytest
+
+
+def test_key_between_keeps_order_under_random_inserts(app_module):
+    kb = app_module.key_between
+    rnd = random.Random(11)
+    keys = []
+    for _ in range(2000):
+        i = rnd.randint(0, len(keys))
+        a = keys[i - 1] if i > 0 else None
+        b = keys[i] if i < len(keys) else None
+        k = kb(a, b)
+        assert (a is None or a < k) and (b is None or k < b)
+        assert not k.endswith("0")  # 0.x0 == 0.x: kunci dengan nol di belakang bisa bentrok
+        keys.insert(i, k)
+    assert keys == sorted(keys)
+
+
+def test_key_between_appending_stays_short(app_module):
+    keys, k = [], None
+    for _ in range(300):
+        k = app_module.key_between(k, None)
+        keys.append(k)
+    assert keys == sorted(keys)
+    assert len(keys[-1]) <= app_module.PLAYLIST_KEY_MAX_LEN
+
+
+def test_key_between_rejects_bad_order(app_module):
+    with pytest.raises(ValueError):
+        app_module.key_between("b", "a")
+    with pytest.raises(ValueError):
+        app_module.key_between("a", "a")
+
+
+@pytest.mark.parametrize("n", [1, 2, 7, 61, 62, 500])
+def test_spread_keys_sorted_unique_with_room_between(app_module, n):
+    keys = app_module.spread_keys(n)
+    assert len(keys) == n
+    assert keys == sorted(set(keys))
+    for a, b in zip(keys, keys[1:]):
+        assert a < app_module.key_between(a, b) < b
+
+
+def _admin(client):
+    with client.session_transaction() as sess:
+        sess["is_admin"] = True
+    return client
+
+
+def _day(client, day):
+    items = client.get("/api/admin/playlist").get_json()["items"]
+    return [it["program"] for it in items if it["day"] == day]
+
+
+def _add(client, day, program):
+    j = client.post("/api/admin/playlist", json={"day": day, "start_hhmm": "08:00", "end_hhmm": "09:00",
+                                                 "program": program}).get_json()
+    assert j["ok"]
+    return j["id"]
+
+
+def test_reorder_and_move_only_touch_sort_keys(app_module, client):
+    app_module.col_playlist.delete_many({})
+    _admin(client)
+    ids = [_add(client, 2, p) for p in ("A", "B", "C", "D")]
+    assert _day(client, 2) == ["A", "B", "C", "D"]
+
+    j = client.post("/api/admin/playlist/reorder", json={"day": 2, "ids": ids[::-1]}).get_json()
+    assert j["ok"] and j["matched"] == 4
+    assert _day(client, 2) == ["D", "C", "B", "A"]
+
+    # A (paling bawah) ke antara D dan C
+    j = client.post(f"/api/admin/playlist/{ids[0]}/move",
+                    json={"day": 2, "prev_id": ids[3], "next_id": ids[2]}).get_json()
+    assert j["ok"]
+    assert _day(client, 2) == ["D", "A", "C", "B"]
+
+
+def test_adding_items_rebalances_long_keys(app_module, client, monkeypatch):
+    app_module.col_playlist.delete_many({})
+    monkeypatch.setattr(app_module, "PLAYLIST_KEY_MAX_LEN", 2)
+    _admin(client)
+    names = [f"P{i:02d}" for i in range(70)]
+    for p in names:
+        _add(client, 4, p)
+    assert _day(client, 4) == names
+    keys = [d["sort_key"] for d in app_module.col_playlist.find({"day": 4})]
+    assert max(len(k) for k in keys) <= 3
+
+
+def test_move_rebalances_legacy_numeric_keys(app_module, client):
+    app_module.col_playlist.delete_many({})
+    _admin(client)
+    ids = [_add(client, 3, p) for p in ("A", "B", "C")]
+    for i, oid in enumerate(ids):  # kunci angka format lama
+        app_module.col_playlist.update_one({"_id": app_module.ObjectId(oid)}, {"$set": {"sort_key": i}})
+    j = client.post(f"/api/admin/playlist/{ids[2]}/move",
+                    json={"day": 3, "prev_id": None, "next_id": ids[0]}).get_json()
+    assert j["ok"]
+    assert _day(client, 3) == ["C", "A", "B"]
+    assert not app_module.playlist_day_needs_rebalance(3)
@@ -0,0 +1,89 @@
+class _Counting:
+    """Proxy koleksi yang menghitung round trip ke Mongo."""
+
+    def __init__(self, col):
+        self.col = col
+        self.calls = []
+
+    def __getattr__(self, name):
+        attr = getattr(self.col, name)
+        if callable(attr):
+            def call(*a, **kw):
+                self.calls.append(name)
+                return attr(*a, **kw)
+            return call
+        return attr
+
+
+def _fixed_time(app_module, monkeypatch, t):
+    clock = {"t": t}
+    monkeypatch.setattr(app_module.time, "time", lambda: clock["t"])
+    return clock
+
+
+def test_mongo_limiter_one_round_trip_per_message(app_module, monkeypatch):
+    app_module.col_chat_rl.delete_many({})
+    _fixed_time(app_module, monkeypatch, 1_000_020.0)
+    col = _Counting(app_module.col_chat_rl)
+    rl = app_module.MongoRateLimiter(col, max_msgs=3, per_seconds=60)
+
+    assert [rl.allow("1.1.1.1") for _ in range(5)] == [True, True, True, False, False]
+    assert col.calls == ["find_one_and_update"] * 5
+    assert rl.allow("2.2.2.2")  # IP lain punya counter sendiri
+
+
+def test_mongo_limiter_resets_next_window(app_module, monkeypatch):
+    app_module.col_chat_rl.delete_many({})
+    clock = _fixed_time(app_module, monkeypatch, 1_000_020.0)
+    rl = app_module.MongoRateLimiter(app_module.col_chat_rl, max_msgs=2, per_seconds=60)
+    assert [rl.allow("ip") for _ in range(3)] == [True, True, False]
+    clock["t"] += 60
+    assert rl.allow("ip")
+    doc = app_module.col_chat_rl.find_one({"_id": f"ip|{int(clock['t'] // 60)}"})
+    assert doc["count"] == 1 and "ts" in doc  # ts dipakai TTL index
+
+
+def _monotonic(app_module, monkeypatch, t):
+    clock = {"t": t}
+    monkeypatch.setattr(app_module.time, "monotonic", lambda: clock["t"])
+    return clock
+
+
+def test_memory_limiter_sliding_window(app_module, monkeypatch):
+    clock = _monotonic(app_module, monkeypatch, 1000.0)
+    rl = app_module.MemoryRateLimiter(max_msgs=3, per_seconds=60)
+    for _ in range(3):
+        assert rl.allow("ip")
+        clock["t"] += 10
+    assert not rl.allow("ip")  # 3 pesan dalam 30 detik terakhir
+    assert rl.allow("lain")
+    clock["t"] = 1000.0 + 60.5  # pesan pertama sudah keluar window
+    assert rl.allow("ip")
+    assert not rl.allow("ip")
+
+
+def test_memory_limiter_rejected_messages_do_not_count(app_module, monkeypatch):
+    clock = _monotonic(app_module, monkeypatch, 0.0)
+    rl = app_module.MemoryRateLimiter(max_msgs=1, per_seconds=10)
+    assert rl.allow("ip")
+    for _ in range(5):
+        clock["t"] += 1
+        assert not rl.allow("ip")
+    clock["t"] = 10.5
+    assert rl.allow("ip")
+
+
+def test_memory_limiter_sweeps_idle_ips(app_module, monkeypatch):
+    clock = _monotonic(app_module, monkeypatch, 0.0)
+    rl = app_module.MemoryRateLimiter(max_msgs=5, per_seconds=10, sweep_every=30)
+    for i in range(100):
+        rl.allow(f"10.0.0.{i}")
+    clock["t"] = 31.0
+    rl.allow("baru")
+    assert set(rl._hits) == {"baru"}
+
+
+def test_chat_send_returns_429_over_limit(app_module, client, monkeypatch):
+    monkeypatch.setattr(app_module, "rate_limiter", app_module.MemoryRateLimiter(2, 60))
+    codes = [client.post("/api/chat/send", json={"name": "a", "text": f"halo {i}"}).status_code for i in range(3)]
+    assert codes == [200, 200, 429]
@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+
+
+def _admin(client):
+    with client.session_transaction() as sess:
+        sess["is_admin"] = True
+    return client
+
+
+def _req(ts, i):
+    return {"_id": ObjectId(), "name": f"n{i}", "phone": "081234567890", "title": f"lagu {i}",
+            "status": "New", "created_at": ts, "updated_at": ts}
+
+
+def _delta_all(client, param, since, limit):
+    seen = []
+    for _ in range(20):
+        j = client.get("/api/admin/requests",
+                       query_string={param: since, "limit": limit, "fields": "title"}).get_json()
+        assert j["ok"]
+        seen += [it["title"] for it in j["items"]]
+        since = j["next_updated_since" if param == "updated_since" else "next_since"]
+        if not j["has_more"]:
+            return seen, since
+    raise AssertionError("delta sync tidak pernah selesai")
+
+
+def test_delta_pages_through_many_rows_with_same_timestamp(app_module, client):
+    app_module.col_requests.delete_many({})
+    ts = datetime(2026, 3, 1, 10, 0, 0, tzinfo=timezone.utc)
+    app_module.col_requests.insert_many([_req(ts, i) for i in range(7)])
+    _admin(client)
+    for param in ("updated_since", "since"):
+        seen, _ = _delta_all(client, param, "2026-03-01T09:00:00Z", limit=3)
+        assert sorted(seen) == [f"lagu {i}" for i in range(7)]
+
+
+def test_delta_sees_write_behind_insert_flushed_late(app_module, client):
+    app_module.col_requests.delete_many({})
+    _admin(client)
+    _, cursor = _delta_all(client, "updated_since", "2026-01-01T00:00:00Z", limit=50)
+
+    wb = app_module.WriteBehindQueue("test-req", app_module.col_requests, max_batch=100, flush_s=60,
+                                     max_queue=100, stamp_fields=("created_at", "updated_at"))
+    queued_at = datetime.now(timezone.utc) - timedelta(seconds=30)  # antre lama (mis. Mongo sempat mati)
+    doc = _req(queued_at, "telat")
+    with wb._cond:
+        wb._buf.append((0.0, doc))
+    assert wb.drain(5) == 0
+
+    seen, _ = _delta_all(client, "updated_since", cursor, limit=50)
+    assert seen == ["lagu telat"]
+
+
+def test_keyset_cursor_roundtrip(app_module):
+    ts = datetime(2026, 3, 1, 10, 0, 0, 123000, tzinfo=timezone.utc)
+    oid = ObjectId()
+    c = app_module._encode_keyset_cursor(ts, oid)
+    assert "=" not in c and "/" not in c and "+" not in c  # aman di query string
+    assert app_module._decode_keyset_cursor(c) == (ts, oid)
+    naive = ts.replace(tzinfo=None)  # seperti yang dibaca balik dari pymongo
+    assert app_module._decode_keyset_cursor(app_module._encode_keyset_cursor(naive, oid)) == (ts, oid)
+
+
+def test_list_pages_by_created_at_and_id_with_status_filter(app_module, client):
+    app_module.col_requests.delete_many({})
+    ts = datetime(2026, 3, 1, 10, 0, 0, tzinfo=timezone.utc)
+    docs = [_req(ts + timedelta(seconds=i // 3), i) for i in range(10)]  # tiap 3 dokumen waktunya sama
+    for d in docs[::2]:
+        d["status"] = "Done"
+    app_module.col_requests.insert_many(docs)
+    _admin(client)
+
+    def pages(params):
+        seen, cursor = [], None
+        for _ in range(20):
+            q = dict(params, limit=3, fields="title")
+            if cursor:
+                q["cursor"] = cursor
+            j = client.get("/api/admin/requests", query_string=q).get_json()
+            assert all(set(it) == {"_id", "title"} for it in j["items"])  # hanya field yang diminta
+            seen += [it["title"] for it in j["items"]]
+            cursor = j["next_cursor"]
+            if not cursor:
+                return seen
+        raise AssertionError("paging tidak selesai")
+
+    newest_first = [f"lagu {i}" for i in range(9, -1, -1)]
+    assert pages({}) == newest_first
+    assert pages({"status": "Done"}) == [t for t in newest_first if int(t.split()[1]) % 2 == 0]
+    assert client.get("/api/admin/requests", query_string={"cursor": "rusak!"}).status_code == 400
@@ -0,0 +1,19 @@
+import os
+
+
+def test_pages_load_socketio_client_with_sri(app_module, client):
+    with client.session_transaction() as sess:
+        sess["is_admin"] = True
+    for path in ("/radio", "/admin/chat"):
+        html = client.get(path).get_data(as_text=True)
+        assert f'integrity="{app_module.SOCKETIO_CLIENT_SRI}"' in html
+        assert "socket.io.min.js" in html
+
+
+def test_vendored_client_is_preferred(app_module, client, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module.app, "static_folder", str(tmp_path))
+    os.makedirs(tmp_path / "js")
+    (tmp_path / "js" / "socket.io.min.js").write_text("/* vendored */")
+    html = client.get("/radio").get_data(as_text=True)
+    assert "cdn.socket.io" not in html
+    assert "/static/js/socket.io.min.js" in html
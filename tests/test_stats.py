@@ -0,0 +1,55 @@
+import threading
+from datetime import datetime, timezone
+
+
+class _FakeResp:
+    def __init__(self, data):
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+def _icecast(listeners):
+    return {"icestats": {"source": {"listenurl": "http://x/stream", "mount": "/stream",
+                                    "listeners": listeners, "title": "Lagu"}}}
+
+
+def _relay(app_module, monkeypatch, listeners, connected):
+    monkeypatch.setattr(app_module, "STREAM_MODE", "relay")
+    monkeypatch.setattr(app_module.stream_relay, "_listeners", listeners)
+    ev = threading.Event()
+    if connected:
+        ev.set()
+    monkeypatch.setattr(app_module.stream_relay, "_connected", ev)
+
+
+def test_relay_mode_counts_relay_listeners_not_relay_connections(app_module, monkeypatch):
+    app_module.col_relays.delete_many({})
+    _relay(app_module, monkeypatch, listeners=3, connected=True)
+    # worker lain: relay tersambung dengan 4 listener
+    app_module.col_relays.insert_one({"_id": "worker-lain", "listeners": 4, "upstream": 1,
+                                      "at": datetime.now(timezone.utc)})
+    # Icecast: 2 koneksi relay + 1 listener langsung ke Icecast
+    monkeypatch.setattr(app_module.pyrequests, "get", lambda *a, **kw: _FakeResp(_icecast(3)))
+
+    poller = app_module.StatsPoller("http://x/status-json.xsl", interval=5, stale_after=30)
+    poller.poll_once()
+    payload, _, _ = poller.snapshot()
+    assert payload["listeners"] == 1 + 3 + 4
+
+
+def test_relay_presence_ignores_stale_workers(app_module, monkeypatch):
+    app_module.col_relays.delete_many({})
+    _relay(app_module, monkeypatch, listeners=2, connected=True)
+    old = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    app_module.col_relays.insert_one({"_id": "worker-mati", "listeners": 9, "upstream": 1, "at": old})
+    assert app_module.relay_listener_count(1) == 2
+
+
+def test_direct_mode_uses_icecast_count(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "STREAM_MODE", "direct")
+    monkeypatch.setattr(app_module.pyrequests, "get", lambda *a, **kw: _FakeResp(_icecast(5)))
+    poller = app_module.StatsPoller("http://x/status-json.xsl", interval=5, stale_after=30)
+    poller.poll_once()
+    assert poller.snapshot()[0]["listeners"] == 5
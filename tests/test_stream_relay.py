@@ -0,0 +1,90 @@
+import threading
+
+
+class _Upstream:
+    """Respon streaming palsu: chunk berikutnya baru dikirim setelah `release()`."""
+
+    def __init__(self):
+        self.ok = True
+        self.headers = {"content-type": "audio/mpeg"}
+        self.gate = threading.Semaphore(0)
+        self.waiting = threading.Semaphore(0)
+        self.closed = threading.Event()
+
+    def release(self):
+        self.gate.release()
+
+    def wait_pulled(self, timeout=5):
+        # pembaca sudah memproses chunk sebelumnya dan minta chunk berikutnya
+        assert self.waiting.acquire(timeout=timeout)
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        n = 0
+        while True:
+            self.waiting.release()
+            if not self.gate.acquire(timeout=5):
+                return
+            n += 1
+            yield bytes([n]) * 8
+
+    def close(self):
+        self.closed.set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _relay(app_module, monkeypatch, up, **kw):
+    connects = []
+
+    def get(*a, **k):
+        connects.append(1)
+        return up
+    monkeypatch.setattr(app_module.pyrequests, "get", get)
+    opts = dict(chunk_size=8, buffer_bytes=1024, burst_bytes=64, client_timeout=1.0, idle_s=0, icy=False)
+    opts.update(kw)
+    return app_module.StreamRelay("http://fake/stream", **opts), connects
+
+
+def test_listener_arriving_at_idle_stop_keeps_the_reader(app_module, monkeypatch):
+    up = _Upstream()
+    relay, _ = _relay(app_module, monkeypatch, up)
+
+    first = relay.subscribe(5)
+    up.wait_pulled()
+    up.release()
+    assert next(first) == b"\x01" * 8
+    up.wait_pulled()
+    first.close()  # listener terakhir pergi; idle_s=0 → pembaca berhenti di chunk berikutnya
+
+    second = relay.subscribe(5)  # datang tepat sebelum cek idle pembaca
+    up.release()
+    up.wait_pulled()  # chunk 2 sudah diproses (termasuk cek idle)
+    assert not up.closed.is_set()
+    assert b"\x02" * 8 in next(second)
+    second.close()
+
+
+def test_closing_unstarted_stream_releases_listener(app_module, monkeypatch):
+    up = _Upstream()
+    relay, _ = _relay(app_module, monkeypatch, up)
+    audio = relay.subscribe(5)
+    assert relay.listeners == 1
+    audio.close()  # client putus sebelum byte pertama dikirim
+    assert relay.listeners == 0
+
+
+def test_subscribe_returns_none_when_upstream_never_connects(app_module, monkeypatch):
+    def refuse(*a, **k):
+        raise app_module.pyrequests.exceptions.ConnectionError("mati")
+    monkeypatch.setattr(app_module.pyrequests, "get", refuse)
+    relay = app_module.StreamRelay("http://fake/stream", chunk_size=8, buffer_bytes=1024, burst_bytes=64,
+                                   client_timeout=1.0, idle_s=0, icy=False)
+    assert relay.subscribe(0.2) is None
+    assert relay.listeners == 0
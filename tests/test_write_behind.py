@@ -0,0 +1,33 @@
+import time
+
+
+def _wait_for(cond, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if cond():
+            return True
+        time.sleep(0.01)
+    return cond()
+
+
+def test_put_after_first_flush_is_written_within_interval(app_module):
+    col = app_module.db["wb_test_flush"]
+    q = app_module.WriteBehindQueue("test_flush", col, max_batch=500, flush_s=0.1, max_queue=100)
+
+    assert q.put({"n": 1})
+    assert _wait_for(lambda: col.count_documents({}) == 1, 1.0)
+
+    # antrean sudah kosong dan flusher sedang menunggu → put berikutnya harus membangunkannya
+    assert q.put({"n": 2})
+    assert _wait_for(lambda: col.count_documents({}) == 2, 1.0)
+    assert q.depth == 0
+
+
+def test_full_queue_rejects(app_module):
+    col = app_module.db["wb_test_full"]
+    q = app_module.WriteBehindQueue("test_full", col, max_batch=500, flush_s=60, max_queue=2)
+    q._thread = object()  # tanpa flusher: isi antrean tetap
+    assert q.put({"n": 1}) and q.put({"n": 2})
+    assert not q.put({"n": 3})
+    assert q.drain(1.0) == 0
+    assert col.count_documents({}) == 2